@@ -1,18 +1,32 @@
 import os
 import json
 import base64
+import hashlib
 import tempfile
+import mimetypes
 import random
 import string
 from datetime import datetime
-from flask import Flask, render_template, request, jsonify, send_file, redirect, url_for, session, flash
+from flask import Flask, render_template, request, jsonify, send_file, redirect, url_for, session, flash, Response, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
 from functools import wraps
 from dotenv import load_dotenv
-from google import genai
-from src.generate_paper import generate_paper
+from src.generate_paper import generate_paper, stream_paper, paper_output_path, claim_pooled_paper, PAPER_SOURCE
+from src.jobs import exam_jobs, grading_jobs
+from src.paper_pool import create_paper_pool
+from src.upload_cache import upload_cache
+from src.context_cache import context_cache
+from src.llm_metrics import llm_metrics, format_gauges, grade_content
+from src.llm_backend import get_backend, get_api_key, LLM_BACKEND
+from src.question_bank import metadata_from_filename
+from src.variants import apply_variant, make_variant, variant_seed
+from src.paper_cache import paper_cache
+from src.pdf_cache import pdf_cache
+from src.pdf_fonts import MissingFontError
+from src.render_pool import render_pool
+from src.answer_key import AnswerKey, answer_key_for, stored_answers
 from src.utils import *
 from pydantic import BaseModel
 from typing import List
@@ -29,30 +43,26 @@ class GradingResponse(BaseModel):
 
 load_dotenv() # Load environment variables from .env file
 
+# Importing this module only declares the app, its models and routes. Render
+# workers are spawned and re-import it as __mp_main__, so everything that
+# touches disk, the network or starts threads lives in create_app().
 app = Flask(__name__)
-app.secret_key = os.urandom(24)
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///users.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db = SQLAlchemy(app)
+db = SQLAlchemy()
 
-def get_api_key():
-    # Prefer environment variable, otherwise read from `apikey.txt`
-    key = os.getenv("GEMINI_API_KEY")
-    if key:
-        return key.strip()
-    try:
-        with open('apikey.txt', 'r') as f:
-            return f.read().strip()
-    except FileNotFoundError:
-        return None
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
 
-api_key = get_api_key()
-if not api_key:
-    raise RuntimeError("GEMINI_API_KEY not set and `apikey.txt` not found")
+# Answer sheets a student may have queued or being graded at once
+GRADING_MAX_ACTIVE_PER_USER = int(os.getenv("GRADING_MAX_ACTIVE_PER_USER", "2"))
+# Uploaded answer sheets wait here until their grading job has run
+GRADING_UPLOAD_DIR = os.getenv("GRADING_UPLOAD_DIR", os.path.join(app.instance_path, "grading_uploads"))
 
-client = genai.Client(api_key=api_key)
+# Online exams are streamed to the page question by question instead of waiting for the full paper
+STREAM_ONLINE_EXAMS = os.getenv("STREAM_ONLINE_EXAMS", "1") == "1"
 
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
+# Ready-made papers for popular configurations, kept topped up in the background once the server starts
+paper_pool = create_paper_pool(generate_paper, claim=claim_pooled_paper)
 
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -165,7 +175,6 @@ def exam_selection(exam_type):
 def generate_exam():
     exam_mode = request.form.get('exam_mode')
     exam_name = request.form.get('exam_name')
-    json_path = None
 
     if exam_name == 'SCHOOL':
         school_exam_type = request.form.get('school_exam_type')
@@ -181,7 +190,7 @@ def generate_exam():
         else:
             exam_mode = 'offline'
 
-        json_path = generate_paper(
+        paper_args = dict(
             name_of_the_exam=school_exam_type,
             subject=subject,
             grade=grade,
@@ -208,7 +217,7 @@ def generate_exam():
         else:
             exam_mode = 'offline'
 
-        json_path = generate_paper(
+        paper_args = dict(
             name_of_the_exam=exam_name, 
             difficulty_level=difficulty, 
             format_of_the_exam=exam_format
@@ -217,34 +226,181 @@ def generate_exam():
         session['difficulty'] = difficulty
         session['exam_format'] = exam_format
 
-    session['json_path'] = json_path
-    # Initialize answers_uploaded to False when a new exam is generated
-    session['answers_uploaded'] = False
-    
-    if not json_path:
-        flash('Could not generate the exam. Please check your inputs.', 'danger')
-        return redirect(url_for('exam_selection', exam_type=exam_name))
-
-    if exam_mode == 'online':
+    if paper_pool.enabled:
+        json_path = paper_pool.take(student=session['username'], **paper_args)
+        if json_path:
+            session['json_path'] = json_path
+            session.pop('stream_args', None)
+            session.pop('variant', None)
+            session['answers_uploaded'] = False
+            if exam_mode != 'online':
+                render_pool.submit(json_path)
+            return redirect(url_for('online_exam') if exam_mode == 'online' else url_for('offline_exam'))
+
+    if exam_mode == 'online' and STREAM_ONLINE_EXAMS and PAPER_SOURCE != 'bank':
+        # Generation starts on the job queue now; the online exam page follows it over /exam_stream
+        session['json_path'] = paper_output_path(
+            paper_args['name_of_the_exam'].upper(),
+            paper_args.get('difficulty_level'),
+            paper_args.get('format_of_the_exam'),
+            paper_args.get('subject'),
+            paper_args.get('grade'),
+            paper_args.get('board'),
+            paper_args.get('language')
+        )
+        session['stream_args'] = paper_args
+        session.pop('variant', None)
+        session['answers_uploaded'] = False
+        stream_exam_job(session['json_path'], paper_args)
         return redirect(url_for('online_exam'))
-    else:  # offline
-        return redirect(url_for('offline_exam'))
+
+    # Generation runs on the job queue; the browser polls until the paper is ready
+    job = exam_jobs.submit(
+        'generate_exam',
+        generate_paper if exam_mode == 'online' else generate_and_prerender,
+        owner=session['username'],
+        meta={
+            'success_url': url_for('online_exam') if exam_mode == 'online' else url_for('offline_exam'),
+            'failure_url': url_for('exam_selection', exam_type=exam_name),
+            'failure_message': 'Could not generate the exam. Please check your inputs.',
+            'sets_exam_session': True,
+        },
+        student=session['username'],
+        **paper_args
+    )
+    return redirect(url_for('job_view', job_id=job.id))
+
+def generate_and_prerender(**paper_args):
+    """Generates an offline paper and queues its PDFs on the render pool so the download is ready"""
+    json_path = generate_paper(**paper_args)
+    if json_path:
+        render_pool.submit(json_path)
+    return json_path
+
+@app.route('/jobs/<job_id>')
+@login_required
+def job_view(job_id):
+    """Show progress for a queued job and redirect once it is done"""
+    job = exam_jobs.get(job_id)
+    if not job or job.owner != session.get('username'):
+        flash('This job was not found or has expired.', 'warning')
+        return redirect(url_for('index'))
+
+    if job.status == 'failed' or (job.status == 'finished' and not job.result):
+        flash(job.meta.get('failure_message', 'The job failed.'), 'danger')
+        return redirect(job.meta.get('failure_url', url_for('index')))
+
+    if job.status == 'finished':
+        if job.meta.get('sets_exam_session'):
+            session['json_path'] = job.result
+            session.pop('stream_args', None)
+            session.pop('variant', None)
+            # Initialize answers_uploaded to False when a new exam is generated
+            session['answers_uploaded'] = False
+        if job.meta.get('success_message'):
+            flash(job.meta['success_message'], 'success')
+        return redirect(job.meta['success_url'])
+
+    return render_template('job_status.html', job=exam_jobs.status(job_id))
+
+@app.route('/jobs/<job_id>/status')
+@login_required
+def job_status(job_id):
+    """JSON status endpoint polled by the job page"""
+    job = exam_jobs.get(job_id)
+    if not job or job.owner != session.get('username'):
+        return jsonify({'error': 'not found'}), 404
+    return jsonify(exam_jobs.status(job_id))
+
+@app.route('/paper_pool/stats')
+@login_required
+def paper_pool_stats():
+    """Hit/miss and refill counters for the pre-generated paper pool (teachers only)"""
+    if session.get('role') != 'teacher':
+        return jsonify({'error': 'forbidden'}), 403
+    return jsonify(paper_pool.stats())
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus metrics for model calls, the paper pool, the upload, context, paper and PDF caches, PDF pre-rendering and exam and grading jobs"""
+    body = "\n".join([
+        llm_metrics.prometheus(),
+        format_gauges("paper_pool", paper_pool.stats()),
+        format_gauges("upload_cache", upload_cache.stats()),
+        format_gauges("context_cache", context_cache.stats()),
+        format_gauges("paper_cache", paper_cache.stats()),
+        format_gauges("pdf_cache", pdf_cache.stats()),
+        format_gauges("render_pool", render_pool.stats()),
+        format_gauges("exam_jobs", exam_jobs.stats()),
+        format_gauges("grading_jobs", grading_jobs.stats()),
+    ])
+    return Response(body + "\n", mimetype='text/plain; version=0.0.4')
 
 @app.route('/online_exam')
 @login_required
 def online_exam():
     """Display online exam with questions and options"""
     json_path = session.get('json_path')
+
+    if json_path and not os.path.exists(json_path) and session.get('stream_args'):
+        # Paper is still to be generated; questions arrive over /exam_stream
+        return render_template('online_exam.html', questions=[], stream_url=url_for('exam_stream'))
     
     if not json_path or not os.path.exists(json_path):
         flash('Exam session not found or expired. Please start a new exam.', 'warning')
         return redirect(url_for('index'))
     
-    with open(json_path, 'r') as f:
-        questions = json.load(f)
+    questions = apply_variant(paper_cache.questions(json_path), session.get('variant'))
     
     return render_template('online_exam.html', questions=questions)
 
+def stream_exam_job(json_path, paper_args):
+    """
+    The job streaming this paper into `json_path`. Generation runs once per
+    paper however often the exam page connects, and keeps running if it disconnects.
+    """
+    return exam_jobs.submit_stream(json_path, 'stream_exam', stream_paper, json_path,
+                                   owner=session['username'], **paper_args)
+
+@app.route('/exam_stream')
+@login_required
+def exam_stream():
+    """Server-sent events feed of questions for an online exam that is being generated"""
+    json_path = session.get('json_path')
+    paper_args = session.get('stream_args')
+    if not json_path or not paper_args:
+        return jsonify({'error': 'No exam is being generated.'}), 404
+
+    # EventSource sends back the id of the last question it received when it reconnects
+    try:
+        start = int(request.headers.get('Last-Event-ID', -1)) + 1
+    except ValueError:
+        start = 0
+    job = exam_jobs.find(json_path)
+    if job is None and os.path.exists(json_path):
+        # Generation finished before a restart or long ago: replay the saved paper
+        entries = list(enumerate(paper_cache.questions(json_path)))[start:]
+    else:
+        if job is None or job.status == 'failed':
+            job = stream_exam_job(json_path, paper_args)
+        entries = job.follow(start)
+
+    def events():
+        for entry in entries:
+            if entry is None:
+                yield ": keepalive\n\n"
+                continue
+            index, question = entry
+            yield f"id: {index}\nevent: question\ndata: {json.dumps(question)}\n\n"
+        if job is not None and job.status == 'failed':
+            app.logger.error(f"Failed to stream exam: {job.error}")
+            yield f"event: failed\ndata: {json.dumps({'error': 'Could not generate the exam. Please try again.'})}\n\n"
+        else:
+            yield "event: done\ndata: {}\n\n"
+
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/submit_exam', methods=['POST'])
 @login_required
 def submit_exam():
@@ -255,8 +411,13 @@ def submit_exam():
         flash('Exam session not found or expired. Please start a new exam.', 'warning')
         return redirect(url_for('index'))
     
-    with open(json_path, 'r') as f:
-        questions = json.load(f)
+    paper = paper_cache.get(json_path)
+    if session.get('variant'):
+        questions = apply_variant(paper.questions, session['variant'])
+        answer_key = AnswerKey(questions)
+    else:
+        questions = paper.questions
+        answer_key = answer_key_for(paper)
     
     user_answers = {}
     for q in questions:
@@ -272,7 +433,7 @@ def submit_exam():
         user_answer = user_answers.get(q_id, '')
         correct_answer = q['answer']
         
-        is_correct = user_answer.strip().lower() == correct_answer.strip().lower()
+        is_correct = answer_key.is_correct(q_id, user_answer)
         if is_correct:
             score += 1
         
@@ -305,6 +466,8 @@ def submit_exam():
                     flash('This assignment is closed. Submission not accepted.', 'danger')
                     return redirect(url_for('classroom_view', class_id=assignment.classroom_id))
             details = {'results': results}
+            if session.get('variant'):
+                details['variant'] = session['variant']
             existing = AssignmentSubmission.query.filter_by(assignment_id=assignment_id, user_id=user.id).first()
             is_late = bool(assignment and assignment.due_at and now > assignment.due_at and (assignment.late_policy or 'allow') != 'block')
             if existing:
@@ -348,8 +511,7 @@ def offline_exam():
         flash('Exam session not found or expired. Please start a new exam.', 'warning')
         return redirect(url_for('index'))
     
-    with open(json_path, 'r') as f:
-        questions = json.load(f)
+    questions = paper_cache.questions(json_path)
     
     answers_uploaded = session.get('answers_uploaded', False)
     
@@ -368,10 +530,16 @@ def download_question_paper():
         flash('Exam session not found or expired. Please start a new exam.', 'warning')
         return redirect(url_for('index'))
     
-    question_pdf_path, _ = extract_and_convert(json_path)
+    render_pool.wait(json_path, 'questions')
+    try:
+        question_pdf_path, etag = pdf_cache.get(json_path, 'questions')
+    except MissingFontError as e:
+        app.logger.error(f'Question paper PDF for {json_path} needs fonts that are not installed: {e}')
+        flash('This paper needs fonts that are not installed on the server, so its PDF cannot be made. Please contact your administrator.', 'danger')
+        return redirect(url_for('offline_exam'))
     
     if question_pdf_path and os.path.exists(question_pdf_path):
-        return send_file(question_pdf_path, as_attachment=True, download_name='question_paper.pdf')
+        return send_file(question_pdf_path, as_attachment=True, download_name='question_paper.pdf', etag=etag, conditional=True)
     else:
         flash('Could not generate question paper PDF.', 'danger')
         return redirect(url_for('offline_exam'))
@@ -391,10 +559,16 @@ def download_answer_sheet():
         flash('Please upload your answers first to download the answer sheet.', 'warning')
         return redirect(url_for('offline_exam'))
 
-    _, answer_pdf_path = extract_and_convert(json_path)
+    render_pool.wait(json_path, 'answers')
+    try:
+        answer_pdf_path, etag = pdf_cache.get(json_path, 'answers')
+    except MissingFontError as e:
+        app.logger.error(f'Answer sheet PDF for {json_path} needs fonts that are not installed: {e}')
+        flash('This paper needs fonts that are not installed on the server, so its PDF cannot be made. Please contact your administrator.', 'danger')
+        return redirect(url_for('offline_exam'))
     
     if answer_pdf_path and os.path.exists(answer_pdf_path):
-        return send_file(answer_pdf_path, as_attachment=True, download_name='answer_sheet.pdf')
+        return send_file(answer_pdf_path, as_attachment=True, download_name='answer_sheet.pdf', etag=etag, conditional=True)
     else:
         flash('Could not generate answer sheet PDF.', 'danger')
         return redirect(url_for('offline_exam'))
@@ -402,7 +576,7 @@ def download_answer_sheet():
 @app.route('/upload_answers', methods=['GET', 'POST'])
 @login_required
 def upload_answers():
-    """Handle upload of answer images/PDFs and process them with Gemini"""
+    """Queue an uploaded answer image/PDF for grading with Gemini"""
     if request.method == 'POST':
         if 'answer_file' not in request.files:
             return render_template('upload_answers.html', error="No file part")
@@ -412,101 +586,170 @@ def upload_answers():
         if file.filename == '':
             return render_template('upload_answers.html', error="No selected file")
         
-        if file and allowed_file(file.filename):
-            temp_dir = tempfile.mkdtemp()
-            filepath = os.path.join(temp_dir, secure_filename(file.filename))
-            file.save(filepath)
-            
-            try:
-                json_path = session.get('json_path')
-                with open(json_path, 'r') as f:
-                    questions = json.load(f)
-                
-                # Prepare content for Gemini
-                prompt = f"""
-                I have an exam with the following questions and correct answers:
-                {json.dumps([{'question_number': q['question_number'], 'question': q['question'], 'answer': q['answer']} for q in questions], indent=2)}
-                
-                The attached file contains the student's handwritten or typed answers.
-                Your task is to:
-                1. Extract the student's answer for each question.
-                2. Compare it with the correct answer.
-                3. Determine if the answer is correct (or partially correct for subjective questions).
-                4. Assign a score (1 for correct, 0 for incorrect).
-                
-                Return a JSON array with the structure:
-                [ {{"question_number": 1, "extracted_answer": "...", "correct_answer": "...", "is_correct": true/false, "explanation": "..."}} ]
-                
-                If you can't find an answer for a question, mark it as incorrect.
-                """
-                
-                contents = [prompt]
-                
-                # Check file type and prepare accordingly
-                mime_type = mimetypes.guess_type(filepath)[0]
-                
-                if mime_type == 'application/pdf':
-                     # Upload PDF to Gemini
-                    uploaded_file = client.files.upload(file=filepath)
-                    contents.append(uploaded_file)
-                else:
-                    # Handle Image
-                    with open(filepath, "rb") as img_file:
-                        image_bytes = img_file.read()
-                    
-                    image_parts = {
-                        "mime_type": mime_type if mime_type else "image/jpeg",
-                        "data": base64.b64encode(image_bytes).decode('utf-8')
-                    }
-                    contents.append(image_parts)
-                
-                # Use a capable model with structured output
-                response = client.models.generate_content(
-                    model="gemini-2.0-flash",
-                    contents=contents,
-                    config={
-                        'response_mime_type': 'application/json',
-                        'response_schema': GradingResponse
-                    }
-                )
-
-                try:
-                    # Parse the response using Pydantic
-                    grading_response = response.parsed
-                    results = [result.model_dump() for result in grading_response.results]
-                    
-                    score = sum(1 for r in results if r.get('is_correct', False))
-                    total = len(results)
-                    percentage = (score / total) * 100 if total > 0 else 0
-
-                    session['answers_uploaded'] = True
-                    
-                    return render_template('results.html', 
-                                          results=results, 
-                                          score=score, 
-                                          total=total, 
-                                          percentage=percentage,
-                                          is_uploaded=True)
-                except Exception as e:
-                    return render_template('upload_answers.html', 
-                                          error=f"Error parsing AI response: {str(e)}",
-                                          response_text=response.text)
-            
-            except Exception as e:
-                return render_template('upload_answers.html', error=f"Error processing file: {str(e)}")
-            
-            finally:
-                if os.path.exists(filepath):
-                    os.remove(filepath)
-                if os.path.exists(temp_dir):
-                    os.rmdir(temp_dir)
-        
-        else:
+        if not (file and allowed_file(file.filename)):
             return render_template('upload_answers.html', 
                                   error="File type not allowed. Please upload a PDF, JPG, JPEG, or PNG.")
+
+        json_path = session.get('json_path')
+        if not json_path or not os.path.exists(json_path):
+            flash('Exam session not found or expired. Please start a new exam.', 'warning')
+            return redirect(url_for('index'))
+
+        user = get_current_user()
+        data = file.read()
+        file_sha256 = hashlib.sha256(data).hexdigest()
+
+        # The same sheet for the same paper is graded once; re-uploads and refreshes get the stored result
+        existing = GradingJob.query.filter_by(user_id=user.id, json_path=json_path, file_sha256=file_sha256) \
+            .filter(GradingJob.status != 'failed').order_by(GradingJob.id.desc()).first()
+        if existing:
+            return redirect(url_for('grading_view', job_id=existing.id))
+
+        active = GradingJob.query.filter(GradingJob.user_id == user.id, GradingJob.status.in_(['queued', 'running'])).count()
+        if active >= GRADING_MAX_ACTIVE_PER_USER:
+            return render_template('upload_answers.html',
+                                  error=f"You already have {active} answer sheet(s) being graded. Please wait for them to finish.")
+
+        job = GradingJob(user_id=user.id, json_path=json_path, file_sha256=file_sha256)
+        db.session.add(job)
+        db.session.commit()
+        # Each job gets its own copy: a job deletes its sheet when it finishes, and other jobs may hold the same file
+        os.makedirs(GRADING_UPLOAD_DIR, exist_ok=True)
+        filepath = os.path.join(GRADING_UPLOAD_DIR, f"{job.id}_{secure_filename(file.filename)}")
+        with open(filepath, 'wb') as f:
+            f.write(data)
+        grading_jobs.submit('grade_answers', run_grading_job, job.id, filepath, owner=session['username'])
+        return redirect(url_for('grading_view', job_id=job.id))
     
     return render_template('upload_answers.html')
 
+def grading_contents(questions, filepath):
+    """Prompt and answer sheet for the grading call"""
+    prompt = f"""
+    I have an exam with the following questions and correct answers:
+    {json.dumps([{'question_number': q['question_number'], 'question': q['question'], 'answer': q['answer']} for q in questions], indent=2)}
+    
+    The attached file contains the student's handwritten or typed answers.
+    Your task is to:
+    1. Extract the student's answer for each question.
+    2. Compare it with the correct answer.
+    3. Determine if the answer is correct (or partially correct for subjective questions).
+    4. Assign a score (1 for correct, 0 for incorrect).
+    
+    Return a JSON array with the structure:
+    [ {{"question_number": 1, "extracted_answer": "...", "correct_answer": "...", "is_correct": true/false, "explanation": "..."}} ]
+    
+    If you can't find an answer for a question, mark it as incorrect.
+    """
+    
+    contents = [prompt]
+    
+    # Check file type and prepare accordingly
+    mime_type = mimetypes.guess_type(filepath)[0]
+    
+    if mime_type == 'application/pdf':
+         # Upload PDF to Gemini
+        uploaded_file = get_backend().upload(filepath)
+        contents.append(uploaded_file)
+    else:
+        # Handle Image
+        with open(filepath, "rb") as img_file:
+            image_bytes = img_file.read()
+        
+        image_parts = {
+            "mime_type": mime_type if mime_type else "image/jpeg",
+            "data": base64.b64encode(image_bytes).decode('utf-8')
+        }
+        contents.append(image_parts)
+    return contents
+
+def run_grading_job(job_id, filepath):
+    """Job body for upload_answers: grade the sheet and store the result on its GradingJob row."""
+    with app.app_context():
+        job = GradingJob.query.get(job_id)
+        job.status = 'running'
+        job.started_at = datetime.utcnow()
+        db.session.commit()
+        response = None
+        try:
+            questions = paper_cache.questions(job.json_path)
+            # Use a capable model with structured output
+            response = grade_content(
+                get_backend(), "upload_answers", metadata_from_filename(job.json_path)['exam'],
+                model="gemini-2.0-flash",
+                contents=grading_contents(questions, filepath),
+                config={
+                    'response_mime_type': 'application/json',
+                    'response_schema': GradingResponse
+                }
+            )
+            # Parse the response using Pydantic
+            results = [result.model_dump() for result in response.parsed.results]
+            job.score = sum(1 for r in results if r.get('is_correct', False))
+            job.total = len(results)
+            job.results_json = json.dumps(results)
+            job.status = 'finished'
+        except Exception as e:
+            app.logger.error(f'Grading job {job_id} failed: {e}')
+            job.error = f"Error processing file: {str(e)}" if response is None else f"Error parsing AI response: {str(e)}"
+            job.response_text = getattr(response, 'text', None)
+            job.status = 'failed'
+        finally:
+            job.finished_at = datetime.utcnow()
+            db.session.commit()
+            if os.path.exists(filepath):
+                os.remove(filepath)
+
+@app.route('/grading/<int:job_id>')
+@login_required
+def grading_view(job_id):
+    """Progress, then stored results, for a queued answer sheet; never triggers grading again"""
+    user = get_current_user()
+    job = GradingJob.query.get(job_id)
+    if not job or job.user_id != user.id:
+        flash('This grading job was not found.', 'warning')
+        return redirect(url_for('upload_answers'))
+
+    if job.status == 'failed':
+        return render_template('upload_answers.html', error=job.error, response_text=job.response_text)
+
+    if job.status == 'finished':
+        if job.json_path == session.get('json_path'):
+            session['answers_uploaded'] = True
+        results = json.loads(job.results_json or '[]')
+        percentage = (job.score / job.total) * 100 if job.total else 0
+        return render_template('results.html', 
+                              results=results, 
+                              score=job.score, 
+                              total=job.total, 
+                              percentage=percentage,
+                              is_uploaded=True)
+
+    return render_template('grading_status.html', job=grading_status_dict(job))
+
+@app.route('/grading/<int:job_id>/status')
+@login_required
+def grading_status(job_id):
+    """JSON status endpoint polled by the grading page"""
+    user = get_current_user()
+    job = GradingJob.query.get(job_id)
+    if not job or job.user_id != user.id:
+        return jsonify({'error': 'not found'}), 404
+    return jsonify(grading_status_dict(job))
+
+def grading_status_dict(job):
+    now = datetime.utcnow()
+    position = None
+    if job.status == 'queued':
+        position = GradingJob.query.filter(GradingJob.status == 'queued', GradingJob.id < job.id).count() + 1
+    return {
+        'id': job.id,
+        'status': job.status,
+        'queue_position': position,
+        'waited_seconds': round(((job.started_at or now) - job.created_at).total_seconds(), 1),
+        'elapsed_seconds': round(((job.finished_at or now) - job.started_at).total_seconds(), 1) if job.started_at else 0.0,
+    }
+
 # ----------------------
 # Classroom feature models and helpers
 # ----------------------
@@ -601,6 +844,24 @@ class Notification(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     read_at = db.Column(db.DateTime, nullable=True)
 
+
+class GradingJob(db.Model):
+    """An uploaded answer sheet queued for grading; the stored result is served on every later visit."""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    json_path = db.Column(db.String(255), nullable=False)
+    file_sha256 = db.Column(db.String(64), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # 'queued', 'running', 'finished' or 'failed'
+    score = db.Column(db.Integer, nullable=True)
+    total = db.Column(db.Integer, nullable=True)
+    results_json = db.Column(db.Text, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    response_text = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    __table_args__ = (db.Index('ix_grading_job_sheet', 'user_id', 'json_path', 'file_sha256'),)
+
 # Helper utilities
 
 def get_current_user():
@@ -984,7 +1245,7 @@ def create_assignment(class_id):
         board = request.form.get('board')
         chapters_str = request.form.get('chapters')
         chapters = [c.strip() for c in chapters_str.split(',')] if chapters_str else []
-        json_path = generate_paper(
+        paper_args = dict(
             name_of_the_exam=school_exam_type,
             subject=subject,
             grade=grade,
@@ -1001,7 +1262,7 @@ def create_assignment(class_id):
     else:
         difficulty = request.form.get('difficulty')
         exam_format = request.form.get('exam_format')
-        json_path = generate_paper(
+        paper_args = dict(
             name_of_the_exam=exam_name,
             difficulty_level=difficulty,
             format_of_the_exam=exam_format
@@ -1011,9 +1272,8 @@ def create_assignment(class_id):
             'difficulty': difficulty,
             'exam_format': exam_format
         }
-    if not json_path:
-        flash('Failed to generate paper for assignment.', 'danger')
-        return redirect(url_for('classroom_view', class_id=class_id))
+    # Per-student question and option order
+    config['shuffle'] = request.form.get('shuffle') == 'on'
     # Deadlines
     opens_at_str = request.form.get('opens_at', '').strip()
     due_at_str = request.form.get('due_at', '').strip()
@@ -1026,27 +1286,55 @@ def create_assignment(class_id):
     opens_at = parse_dt(opens_at_str)
     due_at = parse_dt(due_at_str)
 
-    assignment = Assignment(classroom_id=class_id, title=title, description=description, json_path=json_path, config_json=json.dumps(config), opens_at=opens_at, due_at=due_at, late_policy=late_policy)
-    db.session.add(assignment)
-    db.session.commit()
+    job = exam_jobs.submit(
+        'create_assignment',
+        generate_assignment,
+        owner=session['username'],
+        meta={
+            'success_url': url_for('classroom_view', class_id=class_id),
+            'success_message': 'Assignment created successfully.',
+            'failure_url': url_for('classroom_view', class_id=class_id),
+            'failure_message': 'Failed to generate paper for assignment.',
+        },
+        class_id=class_id,
+        title=title,
+        description=description,
+        paper_args=paper_args,
+        config=config,
+        opens_at=opens_at,
+        due_at=due_at,
+        late_policy=late_policy
+    )
+    return redirect(url_for('job_view', job_id=job.id))
+
+
+def generate_assignment(class_id, title, description, paper_args, config, opens_at, due_at, late_policy):
+    """Job body for create_assignment: generate the paper, then store the assignment and notify students."""
+    json_path = generate_paper(**paper_args)
+    if not json_path:
+        return None
 
-    # Notify students about new assignment
-    try:
-        student_mems = ClassroomMembership.query.filter_by(classroom_id=class_id, role='student').all()
-        payload = {
-            'class_id': class_id,
-            'assignment_id': assignment.id,
-            'title': title,
-            'due_at': due_at.isoformat() if due_at else None
-        }
-        for m in student_mems:
-            db.session.add(Notification(user_id=m.user_id, type='assignment_created', payload_json=json.dumps(payload)))
+    with app.app_context():
+        assignment = Assignment(classroom_id=class_id, title=title, description=description, json_path=json_path, config_json=json.dumps(config), opens_at=opens_at, due_at=due_at, late_policy=late_policy)
+        db.session.add(assignment)
         db.session.commit()
-    except Exception as e:
-        app.logger.error(f'Failed to create assignment notifications: {e}')
 
-    flash('Assignment created successfully.', 'success')
-    return redirect(url_for('classroom_view', class_id=class_id))
+        # Notify students about new assignment
+        try:
+            student_mems = ClassroomMembership.query.filter_by(classroom_id=class_id, role='student').all()
+            payload = {
+                'class_id': class_id,
+                'assignment_id': assignment.id,
+                'title': title,
+                'due_at': due_at.isoformat() if due_at else None
+            }
+            for m in student_mems:
+                db.session.add(Notification(user_id=m.user_id, type='assignment_created', payload_json=json.dumps(payload)))
+            db.session.commit()
+        except Exception as e:
+            app.logger.error(f'Failed to create assignment notifications: {e}')
+
+        return assignment.id
 
 
 @app.route('/classroom/<int:class_id>/assignments/<int:assignment_id>/start')
@@ -1067,6 +1355,13 @@ def start_assignment(class_id, assignment_id):
         return redirect(url_for('classroom_view', class_id=class_id))
 
     session['json_path'] = assignment.json_path
+    session.pop('stream_args', None)
+    session.pop('variant', None)
+    config = json.loads(assignment.config_json or '{}')
+    if config.get('shuffle') and os.path.exists(assignment.json_path):
+        # Each student gets their own question/option order, derived from a seed instead of a copied paper
+        questions = paper_cache.questions(assignment.json_path)
+        session['variant'] = make_variant(variant_seed(assignment.id, get_current_user().id), questions)
     session['assignment_id'] = assignment.id
     session['answers_uploaded'] = False
     session['late_start'] = bool(assignment.due_at and now > assignment.due_at and (assignment.late_policy or 'allow') != 'block')
@@ -1089,6 +1384,85 @@ def view_submissions(class_id, assignment_id):
     return render_template('submissions.html', classroom=classroom, assignment=assignment, submissions=subs, user_map=user_map)
 
 
+@app.route('/classroom/<int:class_id>/assignments/<int:assignment_id>/print_pack')
+@login_required
+def print_pack(class_id, assignment_id):
+    """Zip of every enrolled student's printable paper, with their name and (if shuffled) their variant"""
+    classroom, membership, redirect_resp = require_membership(class_id)
+    if redirect_resp:
+        return redirect_resp
+    if membership.role != 'teacher':
+        flash('Only teachers can download print packs.', 'danger')
+        return redirect(url_for('classroom_view', class_id=class_id))
+    assignment = Assignment.query.filter_by(id=assignment_id, classroom_id=class_id).first_or_404()
+    if not assignment.json_path or not os.path.exists(assignment.json_path):
+        flash('The paper for this assignment is no longer available.', 'warning')
+        return redirect(url_for('classroom_view', class_id=class_id))
+
+    config = json.loads(assignment.config_json or '{}')
+    questions = paper_cache.questions(assignment.json_path)
+    members = ClassroomMembership.query.filter_by(classroom_id=class_id, role='student').all()
+    users = User.query.filter(User.id.in_([m.user_id for m in members])).order_by(User.username).all() if members else []
+    if not users:
+        flash('No students are enrolled in this class yet.', 'info')
+        return redirect(url_for('classroom_view', class_id=class_id))
+
+    # Same seed as start_assignment, so a printed paper matches the student's online variant
+    students = [(
+        # Usernames can collide once sanitized (or sanitize to nothing), so the user id keeps entries apart
+        f"{u.id}_{secure_filename(u.username) or 'student'}",
+        f"{assignment.title} - Name: {u.username}",
+        make_variant(variant_seed(assignment.id, u.id), questions) if config.get('shuffle') else None,
+    ) for u in users]
+    include_answers = request.args.get('answers') == '1'
+    filename = secure_filename(f"{assignment.title}_print_pack.zip") or 'print_pack.zip'
+    return Response(
+        stream_with_context(render_pool.print_pack(assignment.json_path, students, include_answers=include_answers)),
+        mimetype='application/zip',
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
+
+@app.route('/classroom/<int:class_id>/assignments/<int:assignment_id>/regrade', methods=['POST'])
+@login_required
+def regrade_submissions(class_id, assignment_id):
+    """Re-grade every submission of an assignment against its paper's current answer key in one batch."""
+    classroom, membership, redirect_resp = require_membership(class_id)
+    if redirect_resp:
+        return redirect_resp
+    if membership.role != 'teacher':
+        flash('Only teachers can regrade submissions.', 'danger')
+        return redirect(url_for('classroom_view', class_id=class_id))
+    assignment = Assignment.query.filter_by(id=assignment_id, classroom_id=class_id).first_or_404()
+    if not assignment.json_path or not os.path.exists(assignment.json_path):
+        flash('The paper for this assignment is no longer available.', 'warning')
+        return redirect(url_for('view_submissions', class_id=class_id, assignment_id=assignment_id))
+
+    paper = paper_cache.get(assignment.json_path)
+    answer_key = answer_key_for(paper)
+    subs = AssignmentSubmission.query.filter_by(assignment_id=assignment.id).all()
+    details = [json.loads(s.details_json) if s.details_json else {} for s in subs]
+    graded = answer_key.grade_batch([stored_answers(paper.questions, d) for d in details])
+
+    changed = 0
+    for sub, detail, row, score in zip(subs, details, graded['correct'], graded['scores']):
+        verdicts = dict(zip(graded['question_numbers'], row))
+        variant_questions = apply_variant(paper.questions, detail.get('variant'))
+        originals = {str(q['question_number']): str(q.get('original_question_number', q['question_number'])) for q in variant_questions}
+        for result in detail.get('results', []):
+            result['is_correct'] = verdicts.get(originals.get(str(result['question_number'])), False)
+        if score != sub.score:
+            changed += 1
+        total = len(paper.questions)
+        sub.score = score
+        sub.total = total
+        sub.percentage = (score / total) * 100 if total > 0 else 0
+        sub.details_json = json.dumps(detail)
+    db.session.commit()
+    flash(f'Regraded {len(subs)} submission(s); {changed} score(s) changed.', 'success')
+    return redirect(url_for('view_submissions', class_id=class_id, assignment_id=assignment_id))
+
+
 
 
 # ----------------------
@@ -1274,13 +1648,65 @@ def ensure_submission_is_late_column():
     except Exception as e:
         app.logger.error(f"Failed to ensure is_late column: {e}")
 
-
-# Ensure tables are created on run
-if __name__ == '__main__':
+def ensure_grading_job_table():
+    try:
+        GradingJob.__table__.create(db.engine, checkfirst=True)
+        # Jobs that were queued or running when the process stopped will never finish
+        interrupted = db.session.execute(db.text("SELECT id FROM grading_job WHERE status IN ('queued', 'running')")).scalars().all()
+        db.session.execute(db.text("UPDATE grading_job SET status = 'failed', error = 'Grading was interrupted. Please upload your answers again.' WHERE status IN ('queued', 'running')"))
+        db.session.commit()
+        remove_grading_uploads(interrupted)
+    except Exception as e:
+        app.logger.error(f"Failed to ensure grading_job table: {e}")
+
+def remove_grading_uploads(job_ids):
+    """Deletes the uploaded sheets of jobs that will never run; a finished job removes its own"""
+    if not job_ids or not os.path.isdir(GRADING_UPLOAD_DIR):
+        return
+    prefixes = tuple(f"{job_id}_" for job_id in job_ids)
+    for name in os.listdir(GRADING_UPLOAD_DIR):
+        if name.startswith(prefixes):
+            try:
+                os.remove(os.path.join(GRADING_UPLOAD_DIR, name))
+            except OSError as e:
+                app.logger.error(f"Failed to remove interrupted answer sheet {name}: {e}")
+
+
+def create_app(start_pool=True):
+    """
+    Configures the app for serving: checks the model credentials, binds the
+    database, migrates and creates tables, and (unless `start_pool` is False)
+    starts the paper pool refiller. WSGI servers use it as the app factory
+    (`gunicorn 'app:create_app()'`).
+
+    The app must be served by a single process: exam jobs (src/jobs.py), the
+    paper pool and the session secret all live in process memory, so a second
+    worker would not find jobs started by the first. Scale with threads
+    (`gunicorn -w 1 --threads 8`) instead; a WEB_CONCURRENCY above 1 is
+    refused, and gunicorn.conf.py refuses more than one gunicorn worker.
+    """
+    if 'sqlalchemy' in app.extensions:
+        return app
+    if int(os.getenv("WEB_CONCURRENCY", "1")) > 1:
+        raise RuntimeError("WEB_CONCURRENCY is above 1, but exam jobs are kept in process memory; "
+                           "serve with one worker and use threads")
+    if LLM_BACKEND == "gemini" and not get_api_key():
+        raise RuntimeError("GEMINI_API_KEY not set and `apikey.txt` not found")
+    app.secret_key = os.urandom(24)
+    db.init_app(app)
+    # Ensure tables are created on run
     with app.app_context():
         ensure_user_role_column()
         ensure_assignment_deadline_columns()
         ensure_submission_is_late_column()
+        ensure_grading_job_table()
         db.create_all()
-    app.run(debug=True)
+    if start_pool:
+        paper_pool.start()
+    return app
+
+
+if __name__ == '__main__':
+    # The debug reloader runs this block in its file watcher and again in the serving child; only the child refills
+    create_app(start_pool=os.environ.get('WERKZEUG_RUN_MAIN') == 'true').run(debug=True)
 
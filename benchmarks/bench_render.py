@@ -0,0 +1,148 @@
+"""
+PDF rendering benchmark for extract_and_convert.
+
+Synthetic papers of 10, 90, 200 and 1000 questions are rendered in three
+shapes: plain questions, MCQs with four options, and MCQs with long
+solutions (solutions are not printed, so that shape measures the cost of
+carrying them through the JSON). Each case runs in a fresh interpreter, so
+peak RSS belongs to that case alone; the median of --runs is reported.
+Fonts are loaded from a per-case cache under the work directory and warmed
+before the clock starts, so cold font parsing never lands in one run only.
+
+Results are compared with a stored baseline and regressions beyond the
+tolerances are flagged (exit status 1). Baselines are machine specific, so
+none is committed: record one with --save-baseline on the machine you
+compare on. Checking without a baseline, or a case the baseline lacks, is
+an error (exit status 2) rather than a pass.
+
+    python benchmarks/bench_render.py --runs 3 [--sizes 10,200] [--save-baseline]
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+import tempfile
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(BASE_DIR, "benchmarks", "render_baseline.json")
+SIZES = [10, 90, 200, 1000]
+SHAPES = ["plain", "options", "long_solutions"]
+
+PROBE = r'''
+import os, sys, json, time, random, resource
+size, shape, work_dir = int(sys.argv[1]), sys.argv[2], sys.argv[3]
+rng = random.Random(size)
+words = ["force", "velocity", "mass", "energy", "reaction", "enzyme", "matrix", "integral", "field", "charge"]
+subjects = ["Physics", "Chemistry", "Biology", "Mathematics"]
+
+def sentence(n):
+    return " ".join(rng.choice(words) for _ in range(n)).capitalize() + "?"
+
+paper = []
+for i in range(1, size + 1):
+    question = {"question_number": i, "subject": subjects[(i - 1) * len(subjects) // size],
+                "question": sentence(rng.randint(12, 40)), "answer": "B"}
+    if shape != "plain":
+        question["options"] = [sentence(rng.randint(2, 8)) for _ in range(4)]
+    else:
+        question["answer"] = str(rng.randint(1, 999))
+    if shape == "long_solutions":
+        question["solution"] = " ".join(sentence(20) for _ in range(15))
+    paper.append(question)
+json_path = os.path.join(work_dir, f"bench_{size}_{shape}.json")
+with open(json_path, "w", encoding="utf-8") as f:
+    json.dump(paper, f)
+
+from src.utils import extract_and_convert
+from src.pdf_fonts import new_document, register_fonts
+# Parse the fonts before timing, so every run measures the same warm render whatever ran before it
+register_fonts(new_document())
+start = time.perf_counter()
+question_pdf, answer_pdf = extract_and_convert(json_path)
+wall = time.perf_counter() - start
+print(json.dumps({
+    "wall_seconds": wall,
+    "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "output_bytes": os.path.getsize(question_pdf) + os.path.getsize(answer_pdf),
+}))
+'''
+
+# Allowed growth over the baseline before a case is flagged
+TOLERANCES = {"wall_seconds": 0.25, "peak_rss_mb": 0.15, "output_bytes": 0.05}
+# Differences smaller than this are noise on small papers, whatever the percentage
+MIN_DELTAS = {"wall_seconds": 0.05, "peak_rss_mb": 2.0, "output_bytes": 1024}
+
+
+def run_case(size, shape, work_dir):
+    env = dict(os.environ)
+    env["PAPERS_DIR"] = os.path.join(work_dir, "PAPERS")
+    # Each case gets its own font metrics cache, never the server's in instance/
+    env["PDF_FONT_CACHE_DIR"] = os.path.join(work_dir, "font_cache", f"{size}_{shape}")
+    env["PYTHONPATH"] = BASE_DIR
+    out = subprocess.run([sys.executable, "-c", PROBE, str(size), shape, work_dir], cwd=BASE_DIR, env=env,
+                         capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def compare(results, baseline):
+    regressions = []
+    for case, metrics in results.items():
+        base = baseline.get(case)
+        if not base:
+            continue
+        for metric, tolerance in TOLERANCES.items():
+            if (base.get(metric) and metrics[metric] > base[metric] * (1 + tolerance)
+                    and metrics[metric] - base[metric] > MIN_DELTAS[metric]):
+                regressions.append(f"{case} {metric}: {metrics[metric]:.3f} vs baseline {base[metric]:.3f} "
+                                   f"(+{(metrics[metric] / base[metric] - 1) * 100:.0f}%, allowed +{tolerance * 100:.0f}%)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--sizes", default=",".join(str(s) for s in SIZES))
+    parser.add_argument("--shapes", default=",".join(SHAPES))
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline")
+    args = parser.parse_args()
+    if not args.save_baseline and not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to record one", file=sys.stderr)
+        return 2
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="bench_render_") as work_dir:
+        for size in [int(s) for s in args.sizes.split(",")]:
+            for shape in args.shapes.split(","):
+                samples = [run_case(size, shape, work_dir) for _ in range(args.runs)]
+                case = f"{size}q/{shape}"
+                results[case] = {key: statistics.median(s[key] for s in samples) for key in samples[0]}
+                r = results[case]
+                print(f"  {case:<22} {r['wall_seconds'] * 1000:9.1f} ms {r['peak_rss_mb']:8.1f} MB RSS "
+                      f"{r['output_bytes'] / 1024:9.1f} KB")
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    unchecked = [case for case in results if not baseline.get(case)]
+    for case in unchecked:
+        print(f"NOT IN BASELINE {case}; record it with --save-baseline", file=sys.stderr)
+    regressions = compare(results, baseline)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    if regressions:
+        return 1
+    if unchecked:
+        return 2
+    print("No regressions against the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
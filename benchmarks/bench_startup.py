@@ -0,0 +1,75 @@
+"""
+Cold-start benchmark: importing the app, the first request it serves and
+creating the model client.
+
+Each measurement runs in a fresh interpreter so nothing is cached between runs.
+"eager" is the old behaviour (client created while importing the app); "lazy"
+is what a worker pays now before serving its first non-model request
+(the first request includes create_app()).
+Pass --output to append the medians to a JSON lines file so they can be
+tracked over time. Each run uses a fresh database in a temporary directory,
+never instance/users.db.
+
+    python benchmarks/bench_startup.py --runs 5 [--output benchmarks/startup_history.jsonl]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import tempfile
+import subprocess
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = r'''
+import json, sys, time
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+app.app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///" + sys.argv[1]
+app.create_app().test_client().get("/login")
+t1b = time.perf_counter()
+from src.llm_backend import get_backend
+get_backend()
+t2 = time.perf_counter()
+get_backend()
+t3 = time.perf_counter()
+print(json.dumps({"import_app": t1 - t0, "first_request": t1b - t1, "first_client": t2 - t1b,
+                  "cached_client": t3 - t2}))
+'''
+
+
+def run_probe():
+    env = dict(os.environ)
+    env.setdefault("GEMINI_API_KEY", "benchmark-key")
+    env.setdefault("PAPER_POOL_SIZE", "0")
+    with tempfile.TemporaryDirectory(prefix="bench_startup_") as work_dir:
+        db_path = os.path.join(work_dir, "users.db")
+        out = subprocess.run([sys.executable, "-c", PROBE, db_path], cwd=BASE_DIR, env=env,
+                             capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--output", help="Append the medians as one JSON line to this file")
+    args = parser.parse_args()
+
+    samples = [run_probe() for _ in range(args.runs)]
+    median = {key: statistics.median(s[key] for s in samples) for key in samples[0]}
+    print(f"Median of {args.runs} cold starts ({os.getenv('LLM_BACKEND', 'gemini')} backend):")
+    print(f"  import app (lazy client)      {median['import_app'] * 1000:8.1f} ms")
+    print(f"  first request (/login)        {median['first_request'] * 1000:8.1f} ms")
+    print(f"  first get_backend()           {median['first_client'] * 1000:8.1f} ms")
+    print(f"  import app + client (eager)   {(median['import_app'] + median['first_client']) * 1000:8.1f} ms")
+    print(f"  later get_backend() calls     {median['cached_client'] * 1e6:8.1f} us")
+    if args.output:
+        with open(args.output, "a", encoding="utf-8") as f:
+            f.write(json.dumps(dict(median, timestamp=time.time(), runs=args.runs)) + "\n")
+
+
+if __name__ == "__main__":
+    main()
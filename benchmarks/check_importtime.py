@@ -0,0 +1,61 @@
+"""
+Import-time regression check for the Flask app.
+
+Runs `python -X importtime -c "import app"` in a fresh interpreter and fails
+(exit code 1) when a deferred heavy dependency is imported at startup again,
+or when importing the app takes longer than the budget.
+
+    python benchmarks/check_importtime.py [--budget-ms 900] [--top 15]
+"""
+import os
+import sys
+import argparse
+import subprocess
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Only imported by the code paths that use them (model calls, PDF reading/rendering)
+DEFERRED_MODULES = ("google.genai", "PyPDF2", "fpdf", "httpx")
+DEFAULT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "900"))
+
+
+def import_times():
+    """
+    Returns {module: (self_us, cumulative_us)} for `import app`.
+    """
+    env = dict(os.environ)
+    env.setdefault("GEMINI_API_KEY", "benchmark-key")
+    env.setdefault("PAPER_POOL_SIZE", "0")
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app"], cwd=BASE_DIR, env=env,
+                            capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=15, help="Show the slowest top-level imports")
+    args = parser.parse_args()
+
+    times = import_times()
+    total_ms = times["app"][1] / 1000
+    failures = [f"{module} is imported at startup" for module in DEFERRED_MODULES if module in times]
+    if total_ms > args.budget_ms:
+        failures.append(f"import app took {total_ms:.0f} ms (budget {args.budget_ms:.0f} ms)")
+
+    print(f"import app: {total_ms:.0f} ms (budget {args.budget_ms:.0f} ms)")
+    for name, (_, cumulative) in sorted(times.items(), key=lambda item: -item[1][1])[1:args.top + 1]:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,13 @@
+# gunicorn reads this file from the working directory.
+# Exam jobs, the paper pool and the session secret are kept in process memory
+# (see create_app in app.py), so the app is served by one worker; scale with threads.
+import os
+
+workers = 1
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+
+
+def on_starting(server):
+    if server.cfg.workers != 1:
+        raise RuntimeError(f"{server.cfg.workers} workers requested, but exam jobs are kept in process memory; "
+                           "serve with -w 1 and use --threads")
@@ -0,0 +1,157 @@
+import os
+import re
+from typing import Dict, List, Optional
+from src.variants import OPTION_LETTERS, letter_index, apply_variant
+
+# Absolute tolerance for numerical answers (JEE numerical answers are rounded to two decimals)
+ANSWER_NUMERIC_TOLERANCE = float(os.getenv("ANSWER_NUMERIC_TOLERANCE", "0.01"))
+NUMBER = re.compile(r'^[-+]?(\d+(\.\d*)?|\.\d+)([eE][-+]?\d+)?$')
+
+
+def normalize(answer) -> str:
+    return " ".join(str(answer if answer is not None else "").strip().lower().split())
+
+
+def parse_number(answer) -> Optional[float]:
+    text = normalize(answer).replace(",", "")
+    return float(text) if NUMBER.match(text) else None
+
+
+def submitted_answer(submission: Dict, question_number: str):
+    # Answer sheets key questions by string, older exports by int
+    if question_number in submission:
+        return submission[question_number]
+    return submission.get(int(question_number)) if question_number.isdigit() else None
+
+
+class CompiledQuestion:
+    __slots__ = ('question_number', 'number', 'answer', 'accepted', 'value')
+
+    def __init__(self, question: dict):
+        self.question_number = question.get('question_number')
+        self.number = str(self.question_number)
+        self.answer = question.get('answer', '')
+        self.accepted = {normalize(self.answer)}
+        self.value = None
+        options = question.get('options') or []
+        if options:
+            normalized_options = [normalize(o) for o in options]
+            index = letter_index(self.answer, len(options))
+            if index is None and normalize(self.answer) in normalized_options:
+                index = normalized_options.index(normalize(self.answer))
+            if index is not None:
+                # The correct option's text and the usual ways of writing its letter
+                letter = OPTION_LETTERS[index].lower()
+                self.accepted |= {normalized_options[index], letter, f"({letter})", f"{letter}.", f"({letter}).",
+                                  f"option {letter}", f"option ({letter})"}
+        else:
+            self.value = parse_number(self.answer)
+
+    def is_correct(self, submitted, tolerance: float) -> bool:
+        text = normalize(submitted)
+        if not text:
+            return False
+        if text in self.accepted:
+            return True
+        if self.value is not None:
+            number = parse_number(text)
+            return number is not None and abs(number - self.value) <= tolerance
+        return False
+
+
+class AnswerKey:
+    """
+    A paper's answers compiled once: normalized answers, option letter/text
+    equivalence for MCQs and numeric tolerance for numerical answers.
+    """
+
+    def __init__(self, questions: List[dict], tolerance: float = ANSWER_NUMERIC_TOLERANCE):
+        self.tolerance = tolerance
+        self.questions = [CompiledQuestion(q) for q in questions]
+        self.by_number = {q.number: q for q in self.questions}
+
+    def is_correct(self, question_number, submitted) -> bool:
+        compiled = self.by_number.get(str(question_number))
+        return compiled is not None and compiled.is_correct(submitted, self.tolerance)
+
+    def grade(self, submission: Dict) -> dict:
+        """
+        Grades one submission mapping question_number (str or int) to the submitted answer.
+
+        Returns:
+            dict: 'score', 'total' and per-question 'results'.
+        """
+        results = []
+        for q in self.questions:
+            submitted = submitted_answer(submission, q.number)
+            results.append({
+                'question_number': q.question_number,
+                'correct_answer': q.answer,
+                'submitted_answer': submitted,
+                'is_correct': q.is_correct(submitted, self.tolerance),
+            })
+        return {'score': sum(r['is_correct'] for r in results), 'total': len(results), 'results': results}
+
+    def grade_batch(self, submissions: List[Dict]) -> dict:
+        """
+        Grades a whole class's submissions column by column.
+
+        Each question is graded once per distinct answer in the class (a
+        class typically picks among a handful of answers), and the results
+        come back as arrays.
+
+        Returns:
+            dict: 'correct' (one list of booleans per submission, in question
+            order), 'scores' (per submission) and 'question_accuracy' (per question).
+        """
+        correct = [[False] * len(self.questions) for _ in submissions]
+        accuracy = []
+        for column, q in enumerate(self.questions):
+            verdicts = {}
+            hits = 0
+            for row, submission in enumerate(submissions):
+                submitted = normalize(submitted_answer(submission, q.number))
+                verdict = verdicts.get(submitted)
+                if verdict is None:
+                    verdict = verdicts[submitted] = q.is_correct(submitted, self.tolerance)
+                correct[row][column] = verdict
+                hits += verdict
+            accuracy.append(hits / len(submissions) if submissions else 0.0)
+        return {
+            'question_numbers': [q.number for q in self.questions],
+            'correct': correct,
+            'scores': [sum(row) for row in correct],
+            'question_accuracy': accuracy,
+        }
+
+
+def answer_key_for(paper) -> AnswerKey:
+    """
+    Returns the compiled key for a cached Paper, compiling it on first use.
+    """
+    key = getattr(paper, 'answer_key', None)
+    if key is None:
+        key = paper.answer_key = AnswerKey(paper.questions)
+    return key
+
+
+def stored_answers(questions: List[dict], details: dict) -> Dict[str, str]:
+    """
+    Recovers a stored assignment submission's answers keyed by the master
+    paper's question numbers, undoing the student's variant.
+    """
+    variant_questions = apply_variant(questions, details.get('variant'))
+    by_number = {str(q.get('question_number')): q for q in variant_questions}
+    answers = {}
+    for result in details.get('results', []):
+        question = by_number.get(str(result.get('question_number')))
+        if question is None:
+            continue
+        answer = result.get('user_answer', '')
+        options = question.get('options') or []
+        index = letter_index(answer, len(options))
+        if index is not None:
+            # Letters refer to the student's option order, the text does not
+            answer = options[index]
+        answers[str(question.get('original_question_number', question.get('question_number')))] = answer
+    return answers
@@ -0,0 +1,244 @@
+import os
+import re
+import json
+import hashlib
+import threading
+from typing import List, Optional
+from src.upload_cache import file_sha256
+from src.text_store import text_store
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BOOKS_DIR = os.path.join(BASE_DIR, "CONTENT", "BOOKS")
+# Chapter -> page range index for the books in BOOK_MAPPINGS; runtime data, so it lives under instance/
+BOOK_INDEX_PATH = os.getenv("BOOK_INDEX_PATH", os.path.join(BASE_DIR, "instance", "book_page_index.json"))
+BOOK_SLICES_DIR = os.getenv("BOOK_SLICES_DIR", os.path.join(BASE_DIR, "instance", "book_slices"))
+# Only the top of a page is checked for a chapter heading
+HEADING_LINES = 6
+
+_lock = threading.Lock()
+# Book digests keyed by (path, mtime, size), and the parsed index with the file stat it was read at
+_digests = {}
+_index = None
+_index_stat = None
+
+
+def normalize_title(title: str) -> str:
+    return re.sub(r'[^a-z0-9]+', ' ', title.lower()).strip()
+
+
+def titles_match(chapter: str, text: str) -> bool:
+    chapter_norm = normalize_title(chapter)
+    text_norm = normalize_title(text)
+    if not chapter_norm or not text_norm:
+        return False
+    return chapter_norm == text_norm or chapter_norm in text_norm or (len(text_norm) > 8 and text_norm in chapter_norm)
+
+
+def heading_matches(chapter: str, line: str) -> bool:
+    """
+    Stricter match for heading detection: the line must start with the chapter
+    title (optionally after "Chapter"/a chapter number) and be followed by
+    nothing, a page number (running headers) or a few characters.
+    """
+    line_norm = re.sub(r'^(chapter|unit|lesson)?\s*\d*\s*', '', normalize_title(line))
+    chapter_norm = normalize_title(chapter)
+    if not chapter_norm or not line_norm.startswith(chapter_norm):
+        return False
+    remainder = line_norm[len(chapter_norm):].strip()
+    return not remainder or remainder[0].isdigit() or len(remainder) <= 12
+
+
+def load_index() -> dict:
+    try:
+        with open(BOOK_INDEX_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_index(index: dict):
+    os.makedirs(os.path.dirname(BOOK_INDEX_PATH) or ".", exist_ok=True)
+    tmp_path = f"{BOOK_INDEX_PATH}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, BOOK_INDEX_PATH)
+
+
+def _index_file_stat():
+    try:
+        stat = os.stat(BOOK_INDEX_PATH)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _cached_index() -> dict:
+    # Re-read only when the file changed, e.g. after a hand correction; call with _lock held
+    global _index, _index_stat
+    stat = _index_file_stat()
+    if _index is None or stat != _index_stat:
+        _index = load_index()
+        _index_stat = stat
+    return _index
+
+
+def _digest(pdf_path: str) -> str:
+    # Hashing a whole textbook on every paper generation is skipped while the file on disk is unchanged
+    stat = os.stat(pdf_path)
+    key = (os.path.abspath(pdf_path), stat.st_mtime_ns, stat.st_size)
+    digest = _digests.get(key)
+    if digest is None:
+        digest = file_sha256(pdf_path)
+        _digests[key] = digest
+    return digest
+
+
+def _outline_starts(reader, chapters: List[str]) -> dict:
+    """
+    Finds chapter start pages from the PDF outline (bookmarks).
+    """
+    starts = {}
+
+    def walk(entries):
+        for entry in entries:
+            if isinstance(entry, list):
+                walk(entry)
+                continue
+            try:
+                page = reader.get_destination_page_number(entry)
+            except Exception:
+                continue
+            for chapter in chapters:
+                if chapter not in starts and titles_match(chapter, entry.title or ''):
+                    starts[chapter] = page
+                    break
+
+    try:
+        walk(reader.outline)
+    except Exception as e:
+        print(f"Could not read outline: {e}")
+    return starts
+
+
+def _heading_starts(pdf_path: str, page_count: int, chapters: List[str], known: dict) -> dict:
+    """
+    Finds chapter start pages by looking for chapter titles at the top of each page.
+
+    Chapters are assumed to appear in book order, so a chapter is only searched
+    for between the start pages of its neighbours in `known` (and after the
+    previous heading hit).
+    """
+    starts = {}
+    lower = -1
+    for i, chapter in enumerate(chapters):
+        if chapter in known:
+            lower = known[chapter]
+            continue
+        upper = next((known[c] for c in chapters[i + 1:] if c in known), page_count)
+        # One pass over the range, so the PDF is opened at most once per chapter
+        pages = text_store.iter_pages(pdf_path, lower + 1, upper)
+        for page_number, text in enumerate(pages, start=lower + 1):
+            top = [line for line in text.splitlines() if line.strip()][:HEADING_LINES]
+            if any(heading_matches(chapter, line) for line in top):
+                starts[chapter] = page_number
+                lower = page_number
+                break
+    return starts
+
+
+def build_chapter_index(pdf_path: str, chapters: List[str]) -> dict:
+    """
+    Builds the chapter -> [first_page, last_page] index (0-based, inclusive) for a book.
+
+    Outline entries are used when present; remaining chapters are located by
+    heading detection. The stored index is plain JSON and can be corrected by
+    hand for books whose headings are not detected reliably.
+    """
+    from PyPDF2 import PdfReader
+    reader = PdfReader(pdf_path)
+    page_count = len(reader.pages)
+    starts = _outline_starts(reader, chapters)
+    if len(starts) < len(chapters):
+        starts.update(_heading_starts(pdf_path, page_count, chapters, starts))
+
+    ordered = sorted(starts.items(), key=lambda item: item[1])
+    ranges = {}
+    for i, (chapter, first) in enumerate(ordered):
+        last = ordered[i + 1][1] - 1 if i + 1 < len(ordered) else page_count - 1
+        ranges[chapter] = [first, max(first, last)]
+    print(f"Indexed {len(ranges)}/{len(chapters)} chapters in {os.path.basename(pdf_path)}")
+    return {'sha256': _digest(pdf_path), 'pages': page_count, 'chapters': ranges}
+
+
+def get_chapter_index(pdf_path: str, chapters: List[str]) -> dict:
+    """
+    Returns the stored index for a book, rebuilding it when the PDF has changed.
+    The book is only re-hashed, and the index file only re-read, when they change on disk.
+    """
+    global _index_stat
+    key = os.path.relpath(pdf_path, BOOKS_DIR).replace(os.sep, '/')
+    digest = _digest(pdf_path)
+    with _lock:
+        index = _cached_index()
+        entry = index.get(key)
+        if entry is None or entry.get('sha256') != digest:
+            entry = build_chapter_index(pdf_path, chapters)
+            index[key] = entry
+            save_index(index)
+            _index_stat = _index_file_stat()
+    return entry
+
+
+def slice_book(pdf_path: str, selected: List[str], all_chapters: List[str]) -> Optional[str]:
+    """
+    Returns a PDF containing only the pages of the selected chapters.
+
+    Slices are cached per (book content, chapter set). Returns None when any
+    selected chapter is not in the index, so the caller can fall back to the
+    whole book.
+    """
+    if not selected:
+        return None
+    entry = get_chapter_index(pdf_path, all_chapters)
+    ranges = entry['chapters']
+    if any(chapter not in ranges for chapter in selected):
+        print(f"Chapter index incomplete for {os.path.basename(pdf_path)}; uploading the whole book")
+        return None
+
+    chapter_set = sorted(set(selected))
+    slice_key = hashlib.sha1(json.dumps([entry['sha256'], chapter_set]).encode('utf-8')).hexdigest()
+    slice_path = os.path.join(BOOK_SLICES_DIR, f"{slice_key}.pdf")
+    if os.path.exists(slice_path):
+        return slice_path
+
+    pages = sorted({p for chapter in chapter_set for p in range(ranges[chapter][0], ranges[chapter][1] + 1)})
+    from PyPDF2 import PdfReader, PdfWriter
+    reader = PdfReader(pdf_path)
+    writer = PdfWriter()
+    for page_number in pages:
+        writer.add_page(reader.pages[page_number])
+    os.makedirs(BOOK_SLICES_DIR, exist_ok=True)
+    # Unique per writer, so concurrent requests for the same slice never share a tmp file
+    tmp_path = f"{slice_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            writer.write(f)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, slice_path)
+    print(f"Sliced {len(pages)}/{entry['pages']} pages of {os.path.basename(pdf_path)} for {len(chapter_set)} chapter(s)")
+    return slice_path
+
+
+if __name__ == "__main__":
+    # Build the index for every mapped book that is present on disk
+    from src.utils import BOOK_MAPPINGS
+    for board, grades in BOOK_MAPPINGS.items():
+        for grade, languages in grades.items():
+            for language, subjects in languages.items():
+                for subject, details in subjects.items():
+                    book_path = os.path.join(BOOKS_DIR, board, grade, details['filename'])
+                    if os.path.exists(book_path):
+                        get_chapter_index(book_path, details['chapters'])
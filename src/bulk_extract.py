@@ -0,0 +1,122 @@
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from PyPDF2 import PdfReader
+from src.text_store import text_store
+
+DEFAULT_WORKERS = os.cpu_count() or 2
+DEFAULT_CHUNK_PAGES = 16
+
+# Each worker keeps the last opened book so consecutive chunks of the same PDF
+# don't re-parse its cross-reference table.
+_reader_cache = {}
+
+
+def extract_range(pdf_path, page_numbers):
+    """
+    Worker: extracts text for the given pages of one PDF.
+
+    Returns:
+        list: (page_no, text) pairs.
+    """
+    reader = _reader_cache.get(pdf_path)
+    if reader is None:
+        _reader_cache.clear()
+        reader = _reader_cache[pdf_path] = PdfReader(pdf_path)
+    pages = []
+    for page_no in page_numbers:
+        try:
+            pages.append((page_no, reader.pages[page_no].extract_text() or ""))
+        except Exception as e:
+            print(f"Error extracting page {page_no} of {pdf_path}: {e}")
+            pages.append((page_no, ""))
+    return pages
+
+
+def find_pdfs(paths):
+    for path in paths:
+        if os.path.isfile(path) and path.lower().endswith(".pdf"):
+            yield os.path.abspath(path)
+        elif os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for filename in sorted(files):
+                    if filename.lower().endswith(".pdf"):
+                        yield os.path.abspath(os.path.join(root, filename))
+
+
+def plan_chunks(pdf_paths, chunk_pages):
+    """
+    Yields (pdf_path, digest, page_numbers) chunks covering every page not yet in the text store.
+    """
+    for pdf_path in pdf_paths:
+        try:
+            digest, page_count = text_store.document(pdf_path)
+        except Exception as e:
+            print(f"Skipping {pdf_path}: {e}")
+            continue
+        missing = text_store.missing_pages(digest, page_count)
+        for i in range(0, len(missing), chunk_pages):
+            yield pdf_path, digest, missing[i:i + chunk_pages]
+
+
+def bulk_extract(paths, workers=DEFAULT_WORKERS, chunk_pages=DEFAULT_CHUNK_PAGES):
+    """
+    Extracts every missing page of the PDFs under `paths` into the text store.
+
+    Page ranges are fanned out across a process pool. At most two chunks per
+    worker are in flight, and results are written to the store as they come
+    back, so memory stays bounded however large the books are.
+
+    Returns:
+        int: Number of pages extracted.
+    """
+    chunks = plan_chunks(find_pdfs(paths), chunk_pages)
+    max_in_flight = workers * 2
+    in_flight = {}
+    done_pages = 0
+    started = time.perf_counter()
+    last_report = started
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        while True:
+            while len(in_flight) < max_in_flight:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                pdf_path, digest, page_numbers = chunk
+                in_flight[executor.submit(extract_range, pdf_path, page_numbers)] = digest
+            if not in_flight:
+                break
+
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                digest = in_flight.pop(future)
+                try:
+                    pages = future.result()
+                except Exception as e:
+                    print(f"Chunk failed: {e}")
+                    continue
+                text_store.store_pages(digest, pages)
+                done_pages += len(pages)
+
+            now = time.perf_counter()
+            if now - last_report >= 2:
+                print(f"{done_pages} pages extracted, {done_pages / (now - started):.1f} pages/sec")
+                last_report = now
+
+    elapsed = time.perf_counter() - started
+    rate = done_pages / elapsed if elapsed > 0 else 0.0
+    print(f"Done: {done_pages} pages in {elapsed:.1f}s ({rate:.1f} pages/sec, {workers} workers)")
+    return done_pages
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extract text from content library PDFs into the text store.")
+    parser.add_argument("paths", nargs="+", help="PDF files or directories, e.g. CONTENT/BOOKS/TSBIE/10")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--chunk-pages", type=int, default=DEFAULT_CHUNK_PAGES)
+    args = parser.parse_args()
+    bulk_extract(args.paths, workers=args.workers, chunk_pages=args.chunk_pages)
+    sys.exit(0)
@@ -0,0 +1,253 @@
+import os
+import json
+import time
+import uuid
+import hashlib
+import threading
+import weakref
+from types import SimpleNamespace
+from datetime import datetime, timedelta, timezone
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONTEXT_CACHE_PATH = os.getenv("CONTEXT_CACHE_PATH", os.path.join(BASE_DIR, "instance", "context_cache.json"))
+CONTEXT_CACHE_ENABLED = os.getenv("CONTEXT_CACHE", "1") == "1"
+# Lifetime requested for each cached-content entry; reuse extends it again
+CONTEXT_CACHE_TTL = int(os.getenv("CONTEXT_CACHE_TTL_SECONDS", "3600"))
+# An entry is extended on use once less than this much of its TTL is left
+CONTEXT_CACHE_REFRESH_MARGIN = int(os.getenv("CONTEXT_CACHE_REFRESH_MARGIN_SECONDS", "900"))
+# Entries unused for this long are deleted so we stop paying for their storage
+CONTEXT_CACHE_IDLE = int(os.getenv("CONTEXT_CACHE_IDLE_SECONDS", "1800"))
+CONTEXT_CACHE_MAX_ENTRIES = int(os.getenv("CONTEXT_CACHE_MAX_ENTRIES", "50"))
+# Content the API refused to cache (e.g. below the minimum token count) is not retried for this long
+CONTEXT_CACHE_FAILURE_BACKOFF = int(os.getenv("CONTEXT_CACHE_FAILURE_BACKOFF_SECONDS", "3600"))
+
+
+def _utcnow():
+    return datetime.now(timezone.utc)
+
+
+class LocalCacheAPI:
+    """
+    In-memory stand-in for `client.caches` used by the stub backend and in tests.
+    Mirrors the create/get/update/delete calls the context cache relies on.
+    Its entries only exist in this process (see `persistent`).
+    """
+
+    def __init__(self, persistent=False):
+        self.persistent = persistent
+        self.caches = {}
+        self.create_calls = 0
+
+    def create(self, model, config=None):
+        self.create_calls += 1
+        config = config or {}
+        name = f"cachedContents/{uuid.uuid4().hex[:12]}"
+        ttl = int(str(config.get('ttl', '3600s')).rstrip('s'))
+        self.caches[name] = {
+            'name': name,
+            'model': model,
+            'contents': config.get('contents'),
+            'expire_time': _utcnow() + timedelta(seconds=ttl),
+        }
+        return self.get(name)
+
+    def get(self, name, config=None):
+        if name not in self.caches or self.caches[name]['expire_time'] < _utcnow():
+            raise KeyError(f"Cached content {name} not found")
+        entry = self.caches[name]
+        return SimpleNamespace(name=name, model=entry['model'], expire_time=entry['expire_time'])
+
+    def update(self, name, config=None):
+        ttl = int(str((config or {}).get('ttl', '3600s')).rstrip('s'))
+        self.caches[name]['expire_time'] = _utcnow() + timedelta(seconds=ttl)
+        return self.get(name)
+
+    def delete(self, name, config=None):
+        self.caches.pop(name, None)
+
+
+def split_context(contents):
+    """
+    Splits request contents into the uploaded book files (cacheable) and the prompt parts.
+    """
+    if isinstance(contents, str):
+        return [], [contents]
+    files = [part for part in contents if getattr(part, 'uri', None)]
+    prompt = [part for part in contents if not getattr(part, 'uri', None)]
+    return files, prompt
+
+
+class ContextCache:
+    """
+    Cached-content entries for textbook context, keyed by model and the
+    uploaded book files (one upload per book, or per book slice for a
+    chapter set).
+
+    A repeat generation from the same book references the cached entry and
+    only sends the prompt. Entries are extended while they are used and
+    deleted once idle; if the API refuses to cache some content the request
+    simply goes out with the files inline. Entries from a non-persistent
+    caches API (the stub backend's) are kept in memory per API and never
+    written to the registry.
+    """
+
+    def __init__(self, registry_path=CONTEXT_CACHE_PATH, ttl=CONTEXT_CACHE_TTL,
+                 refresh_margin=CONTEXT_CACHE_REFRESH_MARGIN, idle=CONTEXT_CACHE_IDLE,
+                 max_entries=CONTEXT_CACHE_MAX_ENTRIES, enabled=CONTEXT_CACHE_ENABLED):
+        self.registry_path = registry_path
+        self.ttl = ttl
+        self.refresh_margin = refresh_margin
+        self.idle = idle
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._failures = {}
+        self._entries = self._load()
+        self._local = weakref.WeakKeyDictionary()
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.create_failures = 0
+        self.evictions = 0
+
+    def _load(self):
+        try:
+            with open(self.registry_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.registry_path) or ".", exist_ok=True)
+        tmp_path = f"{self.registry_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._entries, f, indent=2)
+        os.replace(tmp_path, self.registry_path)
+
+    def _registry(self, caches_api):
+        if getattr(caches_api, 'persistent', True):
+            return self._entries
+        return self._local.setdefault(caches_api, {})
+
+    @staticmethod
+    def cache_key(model, files):
+        names = sorted(f.name or f.uri for f in files)
+        return hashlib.sha1(json.dumps([model, names]).encode('utf-8')).hexdigest()
+
+    def _evict(self, caches_api):
+        """
+        Deletes entries that are idle or already expired, then the least recently
+        used ones beyond max_entries. Must be called with the lock held.
+        """
+        entries = self._registry(caches_api)
+        now = time.time()
+        expired = [key for key, entry in entries.items()
+                   if now - entry['last_used'] > self.idle or entry['expires_at'] <= now]
+        by_use = sorted((key for key in entries if key not in expired), key=lambda k: entries[k]['last_used'])
+        expired += by_use[:max(0, len(by_use) - self.max_entries)]
+        for key in expired:
+            entry = entries.pop(key)
+            self.evictions += 1
+            if entry['expires_at'] > now:
+                try:
+                    caches_api.delete(name=entry['name'])
+                except Exception as e:
+                    print(f"Could not delete cached content {entry['name']}: {e}")
+        if expired and entries is self._entries:
+            self._save()
+
+    def _extend(self, caches_api, entry):
+        try:
+            caches_api.update(name=entry['name'], config={'ttl': f"{self.ttl}s"})
+        except Exception as e:
+            print(f"Could not extend cached content {entry['name']}: {e}")
+            return False
+        entry['expires_at'] = time.time() + self.ttl
+        self.refreshes += 1
+        return True
+
+    def get_or_create(self, caches_api, model, files):
+        """
+        Returns the name of a cached-content entry holding `files`, or None when caching is unavailable.
+        """
+        key = self.cache_key(model, files)
+        with self._lock:
+            entries = self._registry(caches_api)
+            self._evict(caches_api)
+            if time.time() - self._failures.get(key, 0) < CONTEXT_CACHE_FAILURE_BACKOFF:
+                return None
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                entry = entries.get(key)
+                now = time.time()
+                if entry and entry['expires_at'] - now > 60:
+                    if entry['expires_at'] - now < self.refresh_margin and not self._extend(caches_api, entry):
+                        entries.pop(key)
+                    else:
+                        entry['last_used'] = now
+                        self.hits += 1
+                        if entries is self._entries:
+                            self._save()
+                        return entry['name']
+
+            try:
+                cached = caches_api.create(model=model, config={
+                    'contents': files,
+                    'ttl': f"{self.ttl}s",
+                    'display_name': f"book-context-{key[:12]}",
+                })
+            except Exception as e:
+                print(f"Context caching unavailable for this content, sending it inline: {e}")
+                with self._lock:
+                    self.create_failures += 1
+                    self._failures[key] = time.time()
+                return None
+
+            with self._lock:
+                self.misses += 1
+                now = time.time()
+                entries[key] = {
+                    'name': cached.name,
+                    'model': model,
+                    'files': sorted(f.name or f.uri for f in files),
+                    'expires_at': now + self.ttl,
+                    'last_used': now,
+                }
+                if entries is self._entries:
+                    self._save()
+            print(f"Created cached content {cached.name} for {len(files)} file(s)")
+            return cached.name
+
+    def apply(self, backend, model, contents):
+        """
+        Moves the book files of a request into cached content when possible.
+
+        Returns:
+            tuple: (contents, extra_config) where extra_config carries
+            'cached_content' when the files are served from the cache.
+        """
+        files, prompt = split_context(contents)
+        if not self.enabled or not files:
+            return contents, {}
+        name = self.get_or_create(backend.caches, model, files)
+        if name is None:
+            return contents, {}
+        return prompt, {'cached_content': name}
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'refreshes': self.refreshes,
+            'create_failures': self.create_failures,
+            'evictions': self.evictions,
+            'entries': len(self._entries) + sum(len(entries) for entries in self._local.values()),
+        }
+
+
+context_cache = ContextCache()
@@ -1,16 +1,21 @@
 import os
 import re
 import json
+import time
 from typing import List, Optional
-from google import genai
 from pydantic import BaseModel
 from datetime import datetime
-from fpdf import FPDF
-from PyPDF2 import PdfReader
-from google.genai import types
-import httpx
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import pathlib
 from dotenv import load_dotenv
+from src.upload_cache import upload_cache
+from src.json_stream import JSONArrayStreamParser
+from src.question_bank import question_bank
+from src.book_index import slice_book
+from src.llm_metrics import generate_content, generate_content_stream, grade_content
+from src.llm_backend import get_backend
+from src.context_cache import context_cache
+from src.storage import paper_json_path
 
 load_dotenv() # Load environment variables from .env file
 
@@ -91,29 +96,27 @@ It should have a total of 200 questions, with 50 questions from each subject (Ph
         - MCQs (with four options, one correct)
 '''
 
-def get_api_key():
-    key = os.getenv("GEMINI_API_KEY")
-    if key:
-        return key.strip()
-    # Try reading from apikey.txt in the project root
-    try:
-        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        key_path = os.path.join(base_dir, 'apikey.txt')
-        with open(key_path, 'r') as f:
-            return f.read().strip()
-    except FileNotFoundError:
-        return None
-
-api_key = get_api_key()
-
-if not api_key:
-    # Fallback or raise a clearer error if you prefer, 
-    # but the client init will raise if None is passed.
-    print("WARNING: GEMINI_API_KEY not found in env or apikey.txt")
-
-client = genai.Client(api_key=api_key)
-print("API KEY LOADED")
-
+exam_contexts = {
+    "JEE_MAINS": jee_mains_context,
+    "JEE_ADVANCED": jee_advanced_context,
+    "NEET_UG": neet_ug_context,
+}
+
+# Subject split used when a full-length paper is generated as concurrent shards
+SHARD_PLANS = {
+    "JEE_MAINS": [("Physics", 30), ("Chemistry", 30), ("Mathematics", 30)],
+    "JEE_ADVANCED": [("Physics", 18), ("Chemistry", 18), ("Mathematics", 18)],
+    "NEET_UG": [("Physics", 50), ("Chemistry", 50), ("Botany", 50), ("Zoology", 50)],
+}
+SHARDED_GENERATION = os.getenv("SHARDED_GENERATION", "0") == "1"
+SHARD_BLOCK_SIZE = int(os.getenv("SHARD_BLOCK_SIZE", "25"))
+SHARD_WORKERS = int(os.getenv("SHARD_WORKERS", "4"))
+SHARD_MAX_RETRIES = int(os.getenv("SHARD_MAX_RETRIES", "2"))
+
+# 'llm' generates every paper with the model; 'bank' assembles papers from the local question bank
+PAPER_SOURCE = os.getenv("PAPER_SOURCE", "llm")
+# Question counts asked for by the school prompts, used when assembling school papers from the bank
+SCHOOL_QUESTION_COUNTS = {"SCHOOL_QUIZ": 20, "SCHOOL_TEST": 10}
 
 def clean_text(text):
     print("Cleaning Text")
@@ -127,41 +130,220 @@ def clean_text(text):
     text = re.sub(r'[^\x00-\x7F]+', '', text)
     return text
 
-def load_papers(directory: str) -> List[str]:
-    papers = []
+def paper_output_path(exam_upper: str, difficulty_level: Optional[str] = None, format_of_the_exam: Optional[str] = None, subject: Optional[str] = None, grade: Optional[str] = None, board: Optional[str] = None, language: Optional[str] = None) -> str:
+    """
+    Builds a unique JSON output path for a generated paper in its dated shard, creating the directory.
+    """
+    # Build a unique filename
+    ts = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    if exam_upper in ["SCHOOL_QUIZ", "SCHOOL_TEST"]:
+        # The question bank reads grade, board and language back from the name (see metadata_from_filename)
+        base_name = f"{exam_upper}_{subject}_{grade}_{board}_{(language or 'ENG').upper()}_{ts}.json"
+    else:
+        safe_difficulty = str(difficulty_level)
+        safe_format = str(format_of_the_exam)
+        base_name = f"{exam_upper}_{safe_difficulty}_{safe_format}_{ts}.json"
+    
+    return paper_json_path(exam_upper, base_name)
+
+def save_paper(text: str, exam_upper: str, difficulty_level: Optional[str] = None, format_of_the_exam: Optional[str] = None, subject: Optional[str] = None, grade: Optional[str] = None, board: Optional[str] = None, language: Optional[str] = None) -> str:
+    filepath = paper_output_path(exam_upper, difficulty_level, format_of_the_exam, subject, grade, board, language)
+
+    # Write generated paper to JSON file
+    with open(filepath, 'w', encoding='utf-8') as f:
+        f.write(text)
+    return filepath
+
+def plan_shards(exam_upper: str, block_size: int = SHARD_BLOCK_SIZE) -> List[dict]:
+    """
+    Splits a full-length paper into per-subject blocks of at most `block_size` questions.
+
+    Returns:
+        list: Shards as dicts with subject, count and the first/last question numbers.
+    """
+    shards = []
+    next_number = 1
+    for subject, total in SHARD_PLANS[exam_upper]:
+        remaining = total
+        while remaining > 0:
+            count = min(block_size, remaining)
+            shards.append({
+                'index': len(shards),
+                'subject': subject,
+                'count': count,
+                'first': next_number,
+                'last': next_number + count - 1,
+            })
+            next_number += count
+            remaining -= count
+    return shards
+
+def generate_shard(exam_upper: str, shard: dict, difficulty_level: Optional[str] = None, format_of_the_exam: Optional[str] = None) -> List[dict]:
+    prompt = (
+        "You are an expert in creating high-quality exam papers for competitive exams like "
+        f"{exam_upper}.\n"
+        f"Generate a paper with {difficulty_level} difficulty level and format {format_of_the_exam}.\n"
+        f"{exam_contexts[exam_upper]}\n"
+        f"This request covers only part of the paper: generate exactly {shard['count']} {shard['subject']} "
+        f"questions, numbered {shard['first']} to {shard['last']}. Do not generate questions for any other subject."
+    )
+    response = generate_content(
+        get_backend(), "generate_shard", exam_upper,
+        model=model,
+        contents=prompt,
+        config={
+            "response_mime_type": "application/json",
+            "response_schema": list[PaperFormatForMCQ],
+        },
+    )
+    questions = json.loads(response.text)
+    if not isinstance(questions, list) or not questions:
+        raise ValueError(f"Shard {shard['index']} returned no questions")
+    check_shard(shard, questions)
+    return questions
+
+def check_shard(shard: dict, questions: List[dict]):
+    """
+    Raises ValueError unless a shard returned exactly its count of questions,
+    numbered first..last (or 1..count, since the merge renumbers them anyway),
+    so a short or over-long shard is retried instead of leaving gaps or
+    duplicate numbers in the paper.
+    """
+    if len(questions) != shard['count']:
+        raise ValueError(f"Shard {shard['index']} returned {len(questions)} questions, expected {shard['count']}")
     try:
-        for filename in os.listdir(directory):
-            file_path = os.path.join(directory, filename)
-            if filename.endswith(".txt"):
-                try:
-                    with open(file_path, "r", encoding="utf-8") as file:
-                        papers.append(file.read())
-                except Exception as e:
-                    print(f"Error reading text file {filename}: {e}")
-            elif filename.endswith(".pdf"):
+        numbers = sorted(int(q['question_number']) for q in questions)
+    except (KeyError, TypeError, ValueError):
+        raise ValueError(f"Shard {shard['index']} returned questions without valid question numbers")
+    if numbers not in (list(range(shard['first'], shard['last'] + 1)), list(range(1, shard['count'] + 1))):
+        raise ValueError(f"Shard {shard['index']} numbered its questions {numbers[0]}-{numbers[-1]} "
+                         f"with gaps or repeats, expected {shard['first']}-{shard['last']}")
+
+def generate_sharded_paper(exam_upper: str, difficulty_level: Optional[str] = None, format_of_the_exam: Optional[str] = None, max_retries: int = SHARD_MAX_RETRIES) -> Optional[List[dict]]:
+    """
+    Generates a full-length competitive paper as concurrent per-subject shards.
+
+    Only shards that fail, or return the wrong number of questions, are
+    retried. The merged paper is tagged with each question's subject and
+    renumbered so question_number runs continuously.
+
+    Returns:
+        list: The merged questions, or None if a shard still fails after retries.
+    """
+    shards = plan_shards(exam_upper)
+    results = {}
+    latencies = {}
+    pending = shards
+
+    def timed_shard(shard):
+        # Timed from when a worker picks the shard up, so time queued behind other shards is not counted
+        started = time.perf_counter()
+        try:
+            return generate_shard(exam_upper, shard, difficulty_level, format_of_the_exam)
+        finally:
+            latencies.setdefault(shard['index'], []).append(time.perf_counter() - started)
+
+    for attempt in range(max_retries + 1):
+        with ThreadPoolExecutor(max_workers=SHARD_WORKERS) as executor:
+            futures = {executor.submit(timed_shard, shard): shard for shard in pending}
+            failed = []
+            for future in as_completed(futures):
+                shard = futures[future]
                 try:
-                    reader = PdfReader(file_path)
-                    text = ""
-                    for page in reader.pages:
-                        page_text = page.extract_text() or ""
-                        text += page_text
-                    papers.append(text)
+                    results[shard['index']] = future.result()
                 except Exception as e:
-                    print(f"Error reading PDF {filename}: {e}")
-        print(f"Loaded {len(papers)} papers")
-        return papers
-    except Exception as e:
-        print(f"Error loading papers: {e}")
-        return []
+                    print(f"Shard {shard['index']} ({shard['subject']} Q{shard['first']}-{shard['last']}) failed on attempt {attempt + 1}: {e}")
+                    failed.append(shard)
+        pending = failed
+        if not pending:
+            break
+
+    for shard in shards:
+        attempts = latencies.get(shard['index'], [])
+        print(f"Shard {shard['index']} {shard['subject']} Q{shard['first']}-{shard['last']}: "
+              f"{len(attempts)} attempt(s), " + ", ".join(f"{t:.2f}s" for t in attempts))
+
+    if pending:
+        print(f"Sharded generation for {exam_upper} failed: {len(pending)} shard(s) did not complete")
+        return None
 
-def generate_paper(name_of_the_exam: str, difficulty_level: Optional[str] = None, format_of_the_exam: Optional[str] = None, subject: Optional[str] = None, grade: Optional[str] = None, board: Optional[str] = None, chapters: Optional[List[str]] = None, language: str = 'ENG'):
+    paper = []
+    for shard in shards:
+        for question in results[shard['index']]:
+            question['question_number'] = len(paper) + 1
+            question['subject'] = shard['subject']
+            paper.append(question)
+    return paper
+
+def attach_book_context(content: list, subject: Optional[str], grade: Optional[str], board: Optional[str], chapters: Optional[List[str]], language: Optional[str]) -> list:
     """
-    Generates a paper based on the provided parameters.
+    Appends the textbook context for a school paper to `content`.
+
+    Mapped books (see BOOK_MAPPINGS) are uploaded as a single PDF with an instruction
+    to focus on the selected chapters; otherwise each chapter PDF is uploaded.
     """
-    print("Generating paper for:", name_of_the_exam)
-    response = None
-    exam_upper = name_of_the_exam.upper()
+    chapters = chapters or []
+
+    # Check if this is a mapped book
+    from src.utils import BOOK_MAPPINGS
+    mapped_book = None
+    if board in BOOK_MAPPINGS and str(grade) in BOOK_MAPPINGS[board]:
+         # Ensure language is provided, default to 'ENG'
+        lang_key = language if language else 'ENG'
+        if lang_key in BOOK_MAPPINGS[board][str(grade)]:
+            if subject in BOOK_MAPPINGS[board][str(grade)][lang_key]:
+                mapped_book = BOOK_MAPPINGS[board][str(grade)][lang_key][subject]
+
+    if mapped_book:
+        # It's a mapped book (single PDF)
+        base_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "CONTENT", "BOOKS")
+        pdf_path = os.path.join(base_dir, board, str(grade), mapped_book['filename'])
+        print(f"Using mapped book: {pdf_path}")
+        
+        if os.path.exists(pdf_path):
+            # Upload only the selected chapters' pages when the book's chapter index allows it
+            try:
+                sliced_path = slice_book(pdf_path, chapters, mapped_book['chapters'])
+            except Exception as e:
+                print(f"Could not slice {pdf_path}: {e}")
+                sliced_path = None
+            chapter_file = pathlib.Path(sliced_path or pdf_path)
+            uploaded_file = upload_cache.upload(get_backend().files, chapter_file)
+            content.append(uploaded_file)
+            # Add specific instruction to focus on selected chapters
+            content.append(f"Focus strictly on the following chapters: {', '.join(chapters)}")
+        else:
+            print(f"Mapped file not found: {pdf_path}")
+    else:
+        # Legacy/Folder structure logic
+        # Construct path: CONTENT/BOOKS/Board/Grade/Language/Subject
+        base_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "CONTENT", "BOOKS")
+        lang_dir = language if language else 'ENG'
+        context_dir = os.path.join(base_dir, board, str(grade), lang_dir, subject)
+        
+        print(f"Looking for context in: {context_dir}")
+        
+        if os.path.exists(context_dir):
+            for chapter in chapters:
+                pdf_path = os.path.join(context_dir, chapter)
+                print(f"Resolved PDF path: {pdf_path}")
+                if os.path.exists(pdf_path):
+                    chapter_file = pathlib.Path(pdf_path)
+                    uploaded_file = upload_cache.upload(get_backend().files, chapter_file)
+                    content.append(uploaded_file)
+                else:
+                    print(f"File not found: {pdf_path}")
+        else:
+            print(f"Context directory not found: {context_dir}")
+    return content
+
+def build_paper_request(exam_upper: str, difficulty_level: Optional[str] = None, format_of_the_exam: Optional[str] = None, subject: Optional[str] = None, grade: Optional[str] = None, board: Optional[str] = None, chapters: Optional[List[str]] = None, language: str = 'ENG'):
+    """
+    Builds the model contents and response schema for a paper.
 
+    Returns:
+        tuple: (contents, response_schema), or (None, None) for an unknown exam type.
+    """
     if exam_upper == "JEE_MAINS":
         JEE_MAINS_PROMPT = f'''
             You are an expert in creating high-quality exam papers for competitive exams like
@@ -169,38 +351,19 @@ def generate_paper(name_of_the_exam: str, difficulty_level: Optional[str] = None
                              Generate a paper with {difficulty_level} difficulty level and format {format_of_the_exam}
                              {jee_mains_context}
             '''
-        response = client.models.generate_content(
-            model=model,
-            contents=[JEE_MAINS_PROMPT, jee_mains_context],
-            config={
-                "response_mime_type": "application/json",
-                "response_schema": list[PaperFormatForMCQ],
-            },
-        )
+        return [JEE_MAINS_PROMPT, jee_mains_context], list[PaperFormatForMCQ]
     elif exam_upper == "JEE_ADVANCED":
-        response = client.models.generate_content(
-            model=model,
-            contents="You are an expert in creating high-quality exam papers for competitive exams like "
-                     f"{exam_upper}.\n"
-                     f"Generate a paper with {difficulty_level} difficulty level and format {format_of_the_exam}.\n"
-                     f"{jee_advanced_context}",
-            config={
-                "response_mime_type": "application/json",
-                "response_schema": list[PaperFormatForMCQ],
-            },
-        )
+        contents = ("You are an expert in creating high-quality exam papers for competitive exams like "
+                    f"{exam_upper}.\n"
+                    f"Generate a paper with {difficulty_level} difficulty level and format {format_of_the_exam}.\n"
+                    f"{jee_advanced_context}")
+        return contents, list[PaperFormatForMCQ]
     elif exam_upper == "NEET_UG":
-        response = client.models.generate_content(
-            model=model,
-            contents="You are an expert in creating high-quality exam papers for competitive exams like "
-                     f"{exam_upper}.\n"
-                     f"Generate a paper with {difficulty_level} difficulty level and format {format_of_the_exam}.\n"
-                     f"{neet_ug_context}",
-            config={
-                "response_mime_type": "application/json",
-                "response_schema": list[PaperFormatForMCQ],
-            },
-        )
+        contents = ("You are an expert in creating high-quality exam papers for competitive exams like "
+                    f"{exam_upper}.\n"
+                    f"Generate a paper with {difficulty_level} difficulty level and format {format_of_the_exam}.\n"
+                    f"{neet_ug_context}")
+        return contents, list[PaperFormatForMCQ]
     elif exam_upper == "SCHOOL_QUIZ":
         prompt = '''
         You are an intelligent AI whose main job is to generate test for school students,
@@ -213,62 +376,7 @@ def generate_paper(name_of_the_exam: str, difficulty_level: Optional[str] = None
 
         content = [prompt,
                    f"You are generating a school quiz for {subject} grade {grade} board {board}"]
-        
-        # Check if this is a mapped book
-        from src.utils import BOOK_MAPPINGS
-        mapped_book = None
-        if board in BOOK_MAPPINGS and str(grade) in BOOK_MAPPINGS[board]:
-             # Ensure language is provided, default to 'ENG'
-            lang_key = language if language else 'ENG'
-            if lang_key in BOOK_MAPPINGS[board][str(grade)]:
-                if subject in BOOK_MAPPINGS[board][str(grade)][lang_key]:
-                    mapped_book = BOOK_MAPPINGS[board][str(grade)][lang_key][subject]
-
-        if mapped_book:
-            # It's a mapped book (single PDF)
-            base_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "CONTENT", "BOOKS")
-            pdf_path = os.path.join(base_dir, board, str(grade), mapped_book['filename'])
-            print(f"Using mapped book: {pdf_path}")
-            
-            if os.path.exists(pdf_path):
-                chapter_file = pathlib.Path(pdf_path)
-                uploaded_file = client.files.upload(file=chapter_file)
-                content.append(uploaded_file)
-                # Add specific instruction to focus on selected chapters
-                content.append(f"Focus strictly on the following chapters: {', '.join(chapters)}")
-            else:
-                print(f"Mapped file not found: {pdf_path}")
-        else:
-            # Legacy/Folder structure logic
-            # Construct path: CONTENT/BOOKS/Board/Grade/Language/Subject
-            base_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "CONTENT", "BOOKS")
-            lang_dir = language if language else 'ENG'
-            context_dir = os.path.join(base_dir, board, str(grade), lang_dir, subject)
-            
-            print(f"Looking for context in: {context_dir}")
-            
-            if os.path.exists(context_dir):
-                for chapter in chapters:
-                    pdf_path = os.path.join(context_dir, chapter)
-                    print(f"Resolved PDF path: {pdf_path}")
-                    if os.path.exists(pdf_path):
-                        chapter_file = pathlib.Path(pdf_path)
-                        uploaded_file = client.files.upload(file=chapter_file)
-                        content.append(uploaded_file)
-                    else:
-                        print(f"File not found: {pdf_path}")
-            else:
-                print(f"Context directory not found: {context_dir}")
-
-        response = client.models.generate_content(
-                model=model,
-                contents= content,
-                config={
-                    "response_mime_type": "application/json",
-                    "response_schema": list[SchoolQuizFormat],
-                },
-            )
-            
+        return attach_book_context(content, subject, grade, board, chapters, language), list[SchoolQuizFormat]
     elif exam_upper == "SCHOOL_TEST":
         prompt = '''
         You are an intelligent AI whose main job is to generate test for school students,
@@ -282,92 +390,196 @@ def generate_paper(name_of_the_exam: str, difficulty_level: Optional[str] = None
 
         content = [prompt,
                    f"You are generating a school test for {subject} grade {grade} board {board}"]
-        
-        # Check if this is a mapped book
-        from src.utils import BOOK_MAPPINGS
-        mapped_book = None
-        if board in BOOK_MAPPINGS and str(grade) in BOOK_MAPPINGS[board]:
-            lang_key = language if language else 'ENG'
-            if lang_key in BOOK_MAPPINGS[board][str(grade)]:
-                if subject in BOOK_MAPPINGS[board][str(grade)][lang_key]:
-                    mapped_book = BOOK_MAPPINGS[board][str(grade)][lang_key][subject]
-
-        if mapped_book:
-            # It's a mapped book (single PDF)
-            base_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "CONTENT", "BOOKS")
-            pdf_path = os.path.join(base_dir, board, str(grade), mapped_book['filename'])
-            print(f"Using mapped book: {pdf_path}")
-            
-            if os.path.exists(pdf_path):
-                chapter_file = pathlib.Path(pdf_path)
-                uploaded_file = client.files.upload(file=chapter_file)
-                content.append(uploaded_file)
-                content.append(f"Focus strictly on the following chapters: {', '.join(chapters)}")
-            else:
-                print(f"Mapped file not found: {pdf_path}")
-        else:
-            # Legacy/Folder structure logic
-            base_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "CONTENT", "BOOKS")
-            lang_dir = language if language else 'ENG'
-            context_dir = os.path.join(base_dir, board, str(grade), lang_dir, subject)
-            
-            print(f"Looking for context in: {context_dir}")
-
-            if os.path.exists(context_dir):
-                for chapter in chapters:
-                    pdf_path = os.path.join(context_dir, chapter)
-                    print(f"Resolved PDF path: {pdf_path}")
-                    if os.path.exists(pdf_path):
-                        chapter_file = pathlib.Path(pdf_path)
-                        uploaded_file = client.files.upload(file=chapter_file)
-                        content.append(uploaded_file)
-                    else:
-                        print(f"File not found: {pdf_path}")
-            else:
-                print(f"Context directory not found: {context_dir}")
-
-        response = client.models.generate_content(
-                model=model,
-                contents= content,
-                config={
-                    "response_mime_type": "application/json",
-                    "response_schema": list[SchoolTestFormat],
-                },
-            )
-
-    if response is None:
+        return attach_book_context(content, subject, grade, board, chapters, language), list[SchoolTestFormat]
+    return None, None
+
+def index_paper(filepath: str, exam_upper: str, subject: Optional[str] = None, chapters: Optional[List[str]] = None, difficulty_level: Optional[str] = None, grade: Optional[str] = None, board: Optional[str] = None, language: Optional[str] = None):
+    """
+    Adds a freshly generated paper to the question bank; failures never block generation.
+    """
+    try:
+        added = question_bank.ingest_paper(filepath, exam=exam_upper, subject=subject, chapters=chapters,
+                                           difficulty=difficulty_level, subject_plan=SHARD_PLANS.get(exam_upper),
+                                           grade=grade, board=board, language=language)
+        print(f"Question bank: indexed {added} new questions from {os.path.basename(filepath)}")
+    except Exception as e:
+        print(f"Error indexing {filepath} into the question bank: {e}")
+
+def bank_buckets(exam_upper: str, subject: Optional[str] = None, chapters: Optional[List[str]] = None) -> List[dict]:
+    """
+    Question counts per subject (competitive papers) or per chapter (school papers).
+    """
+    if exam_upper in SHARD_PLANS:
+        return [{'subject': name, 'count': count} for name, count in SHARD_PLANS[exam_upper]]
+    total = SCHOOL_QUESTION_COUNTS.get(exam_upper)
+    if total is None:
+        return []
+    if not chapters:
+        return [{'subject': subject, 'count': total}]
+    per_chapter, extra = divmod(total, len(chapters))
+    buckets = []
+    for i, chapter in enumerate(chapters):
+        count = per_chapter + (1 if i < extra else 0)
+        if count:
+            buckets.append({'subject': subject, 'chapter': chapter, 'count': count})
+    return buckets
+
+def top_up_bucket(exam_upper: str, bucket: dict, difficulty_level: Optional[str] = None, format_of_the_exam: Optional[str] = None, subject: Optional[str] = None, grade: Optional[str] = None, board: Optional[str] = None, chapters: Optional[List[str]] = None, language: str = 'ENG'):
+    """
+    Calls the model for a bucket the bank could not fill; the new questions are banked.
+    """
+    print(f"Question bank: topping up {bucket} with the model")
+    if exam_upper in SHARD_PLANS:
+        shard = {'index': 0, 'subject': bucket['subject'], 'count': bucket['missing'], 'first': 1, 'last': bucket['missing']}
+        questions = generate_shard(exam_upper, shard, difficulty_level, format_of_the_exam)
+        question_bank.add_questions(questions, exam_upper, subject=bucket['subject'], difficulty=difficulty_level)
+    else:
+        bucket_chapters = [bucket['chapter']] if bucket.get('chapter') else chapters
+        contents, response_schema = build_paper_request(exam_upper, subject=subject, grade=grade, board=board, chapters=bucket_chapters, language=language)
+        if contents is None:
+            return
+        # The school prompts ask for a full paper; only the missing questions are needed
+        contents = list(contents) + [f"Generate exactly {bucket['missing']} questions, not the number asked for above."]
+        contents, cache_config = context_cache.apply(get_backend(), model, contents)
+        response = generate_content(
+            get_backend(), "top_up_bucket", exam_upper,
+            model=model,
+            contents=contents,
+            config={
+                "response_mime_type": "application/json",
+                "response_schema": response_schema,
+                **cache_config,
+            },
+        )
+        question_bank.add_questions(json.loads(response.text), exam_upper, subject=subject, chapter=bucket.get('chapter'),
+                                    grade=grade, board=board, language=language)
+
+def assemble_from_bank(exam_upper: str, difficulty_level: Optional[str] = None, format_of_the_exam: Optional[str] = None, subject: Optional[str] = None, grade: Optional[str] = None, board: Optional[str] = None, chapters: Optional[List[str]] = None, language: str = 'ENG', student: Optional[str] = None) -> Optional[str]:
+    """
+    Builds a paper from the question bank, calling the model only for sparse buckets.
+
+    When `student` is given, questions they have already been served are skipped.
+    """
+    buckets = bank_buckets(exam_upper, subject, chapters)
+    if not buckets:
+        print(f"Could not assemble paper from the question bank for exam type: {exam_upper}")
+        return None
+    if exam_upper in SHARD_PLANS:
+        filters = {'difficulty': difficulty_level}
+    else:
+        # A school paper never mixes grades, boards or languages
+        filters = {'grade': grade, 'board': board, 'language': language}
+
+    paper, shortfall = question_bank.assemble(exam_upper, buckets, student=student, **filters)
+    if shortfall:
+        for bucket in shortfall:
+            try:
+                top_up_bucket(exam_upper, bucket, difficulty_level, format_of_the_exam, subject, grade, board, chapters, language)
+            except Exception as e:
+                print(f"Question bank top-up failed for {bucket}: {e}")
+        paper, shortfall = question_bank.assemble(exam_upper, buckets, student=student, **filters)
+        if shortfall:
+            print(f"Question bank could not fill {shortfall} for {exam_upper}")
+            return None
+
+    return save_paper(json.dumps(paper, indent=2), exam_upper, difficulty_level, format_of_the_exam, subject, grade, board, language)
+
+def claim_pooled_paper(filepath: str, student: str) -> bool:
+    """
+    Whether a pre-generated paper may be handed to `student`. With the bank
+    as the source a paper must not repeat questions they have been served,
+    and its questions are recorded as served when it is handed out.
+    """
+    if PAPER_SOURCE != 'bank':
+        return True
+    with open(filepath, 'r', encoding='utf-8') as f:
+        return question_bank.claim(json.load(f), student)
+
+def generate_paper(name_of_the_exam: str, difficulty_level: Optional[str] = None, format_of_the_exam: Optional[str] = None, subject: Optional[str] = None, grade: Optional[str] = None, board: Optional[str] = None, chapters: Optional[List[str]] = None, language: str = 'ENG', sharded: Optional[bool] = None, source: Optional[str] = None, student: Optional[str] = None):
+    """
+    Generates a paper based on the provided parameters.
+
+    Full-length competitive papers are generated as concurrent shards when
+    `sharded` is set (defaults to the SHARDED_GENERATION setting). With
+    source='bank' (defaults to PAPER_SOURCE) the paper is assembled from the
+    local question bank instead, without repeats for `student`.
+    """
+    print("Generating paper for:", name_of_the_exam)
+    exam_upper = name_of_the_exam.upper()
+
+    if source is None:
+        source = PAPER_SOURCE
+    if source == 'bank':
+        return assemble_from_bank(exam_upper, difficulty_level, format_of_the_exam, subject, grade, board, chapters, language, student)
+
+    if sharded is None:
+        sharded = SHARDED_GENERATION
+    if sharded and exam_upper in SHARD_PLANS:
+        paper = generate_sharded_paper(exam_upper, difficulty_level, format_of_the_exam)
+        if paper is None:
+            return None
+        filepath = save_paper(json.dumps(paper, indent=2), exam_upper, difficulty_level, format_of_the_exam)
+        index_paper(filepath, exam_upper, difficulty_level=difficulty_level)
+        return filepath
+
+    contents, response_schema = build_paper_request(exam_upper, difficulty_level, format_of_the_exam, subject, grade, board, chapters, language)
+    if contents is None:
         print(f"Could not generate paper for exam type: {name_of_the_exam}. Check parameters.")
         return None
 
-    # Determine output directory structure
-    base_output_dir = os.path.join("GENERATED_PAPERS", "JSON")
-    exam_dir_map = {
-        "JEE_MAINS": "MAINS",
-        "JEE_ADVANCED": "ADVANCED",
-        "NEET_UG": "NEET",
-        "SCHOOL_QUIZ": os.path.join("SCHOOL", "QUIZ"),
-        "SCHOOL_TEST": os.path.join("SCHOOL", "TEST"),
-    }
-    sub_dir = exam_dir_map.get(exam_upper, "MISC")
-    output_dir = os.path.join(base_output_dir, sub_dir)
-    os.makedirs(output_dir, exist_ok=True)
+    # Book context is served from cached content when possible, so repeats only send the prompt
+    contents, cache_config = context_cache.apply(get_backend(), model, contents)
+    response = generate_content(
+        get_backend(), "generate_paper", exam_upper,
+        model=model,
+        contents=contents,
+        config={
+            "response_mime_type": "application/json",
+            "response_schema": response_schema,
+            **cache_config,
+        },
+    )
+    filepath = save_paper(str(response.text), exam_upper, difficulty_level, format_of_the_exam, subject, grade, board, language)
+    index_paper(filepath, exam_upper, subject, chapters, difficulty_level, grade, board, language)
+    return filepath
 
-    # Build a unique filename
-    ts = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-    if exam_upper in ["SCHOOL_QUIZ", "SCHOOL_TEST"]:
-        base_name = f"{exam_upper}_{subject}_{grade}_{board}_{ts}.json"
-    else:
-        safe_difficulty = str(difficulty_level)
-        safe_format = str(format_of_the_exam)
-        base_name = f"{exam_upper}_{safe_difficulty}_{safe_format}_{ts}.json"
-    
-    filepath = os.path.join(output_dir, base_name)
+def stream_paper(filepath: str, name_of_the_exam: str, difficulty_level: Optional[str] = None, format_of_the_exam: Optional[str] = None, subject: Optional[str] = None, grade: Optional[str] = None, board: Optional[str] = None, chapters: Optional[List[str]] = None, language: str = 'ENG'):
+    """
+    Generates a paper with the streaming API and yields each question as soon as it is parsed.
 
-    # Write generated paper to JSON file
+    The complete paper is written to `filepath` once the stream ends, so the
+    regular online_exam/submit_exam flow can use it afterwards.
+
+    Yields:
+        dict: One question (SchoolQuizFormat/PaperFormatForMCQ fields) at a time.
+    """
+    print("Streaming paper for:", name_of_the_exam)
+    exam_upper = name_of_the_exam.upper()
+    contents, response_schema = build_paper_request(exam_upper, difficulty_level, format_of_the_exam, subject, grade, board, chapters, language)
+    if contents is None:
+        raise ValueError(f"Could not generate paper for exam type: {name_of_the_exam}. Check parameters.")
+
+    contents, cache_config = context_cache.apply(get_backend(), model, contents)
+    parser = JSONArrayStreamParser()
+    questions = []
+    for chunk in generate_content_stream(
+        get_backend(), "stream_paper", exam_upper,
+        model=model,
+        contents=contents,
+        config={
+            "response_mime_type": "application/json",
+            "response_schema": response_schema,
+            **cache_config,
+        },
+    ):
+        for question in parser.feed(chunk.text or ""):
+            questions.append(question)
+            yield question
+
+    os.makedirs(os.path.dirname(filepath) or ".", exist_ok=True)
     with open(filepath, 'w', encoding='utf-8') as f:
-        text = str(response.text)
-        f.write(text)
-    return filepath
+        json.dump(questions, f, indent=2)
+    index_paper(filepath, exam_upper, subject, chapters, difficulty_level, grade, board, language)
 
 
 def offline_scoring(actual_solution: str, users_solution: str):
@@ -375,12 +587,13 @@ def offline_scoring(actual_solution: str, users_solution: str):
         "I want you to look at actual score sheet and then compare it with the sheet "
         "uploaded by the student and give your response accordingly."
     )
-    user_solution = client.files.upload(file=users_solution)
-    actual_solution = client.files.upload(file=actual_solution)
+    user_solution = get_backend().upload(users_solution)
+    actual_solution = get_backend().upload(actual_solution)
 
     contents = [prompt, actual_solution, user_solution]
 
-    response = client.models.generate_content(
+    response = grade_content(
+        get_backend(), "offline_scoring",
         model= "gemini-2.5-flash-lite",
         contents=contents,
         config={
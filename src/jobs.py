@@ -0,0 +1,174 @@
+import os
+import uuid
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+EXAM_WORKERS = int(os.getenv("EXAM_WORKERS", "4"))
+# Grading of uploaded answer sheets gets its own pool so a class uploading at once cannot starve paper generation
+GRADING_WORKERS = int(os.getenv("GRADING_WORKERS", "4"))
+# Finished jobs are kept around long enough for the browser to pick up the result.
+JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", "3600"))
+
+
+class Job:
+    def __init__(self, kind, owner=None, meta=None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.owner = owner
+        self.meta = meta or {}
+        self.status = 'queued'  # 'queued', 'running', 'finished' or 'failed'
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        # Items published so far by a streaming job (see JobQueue.submit_stream)
+        self.items = []
+        self._changed = threading.Condition()
+
+    @property
+    def done(self):
+        return self.status in ('finished', 'failed')
+
+    def publish(self, item):
+        with self._changed:
+            self.items.append(item)
+            self._changed.notify_all()
+
+    def set_status(self, status):
+        with self._changed:
+            self.status = status
+            self._changed.notify_all()
+
+    def follow(self, start=0, heartbeat_seconds=15):
+        """
+        Yields (index, item) for published items from `start` on as they
+        arrive, until the job is done. Yields None when nothing arrived for
+        `heartbeat_seconds`, so a streaming response can keep its connection alive.
+        """
+        index = start
+        while True:
+            with self._changed:
+                if index >= len(self.items) and not self.done:
+                    self._changed.wait(heartbeat_seconds)
+                new = self.items[index:]
+                done = self.done
+            for item in new:
+                yield index, item
+                index += 1
+            if done:
+                return
+            if not new:
+                yield None
+
+    def to_dict(self, position=None):
+        now = time.time()
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'queue_position': position,
+            'waited_seconds': round((self.started_at or now) - self.created_at, 1),
+            'elapsed_seconds': round((self.finished_at or now) - self.started_at, 1) if self.started_at else 0.0,
+            'error': self.error,
+        }
+
+
+class JobQueue:
+    """
+    Runs slow work (paper generation) on a bounded thread pool so web
+    workers can return immediately and let the browser poll for status.
+    """
+
+    def __init__(self, max_workers=EXAM_WORKERS, retention_seconds=JOB_RETENTION_SECONDS):
+        self.retention_seconds = retention_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="exam-job")
+        self._jobs = {}
+        self._keys = {}
+        self._pending = []
+        self._lock = threading.Lock()
+
+    def submit(self, kind, fn, *args, owner=None, meta=None, **kwargs):
+        """
+        Queues `fn(*args, **kwargs)` and returns the Job tracking it.
+        """
+        job = Job(kind, owner=owner, meta=meta)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+            self._pending.append(job.id)
+        self._executor.submit(self._run, job, fn, args, kwargs, False)
+        return job
+
+    def submit_stream(self, key, kind, fn, *args, owner=None, meta=None, **kwargs):
+        """
+        Queues the generator `fn(*args, **kwargs)`, publishing each item it
+        yields on the job (see Job.follow). Only one job runs per `key`: while
+        a job for it is queued, running or finished, that job is returned
+        instead of starting another; a failed one is replaced.
+        """
+        with self._lock:
+            self._prune()
+            job = self._keys.get(key)
+            if job is not None and job.status != 'failed':
+                return job
+            job = Job(kind, owner=owner, meta=meta)
+            self._jobs[job.id] = job
+            self._keys[key] = job
+            self._pending.append(job.id)
+        self._executor.submit(self._run, job, fn, args, kwargs, True)
+        return job
+
+    def find(self, key):
+        with self._lock:
+            return self._keys.get(key)
+
+    def _run(self, job, fn, args, kwargs, stream):
+        with self._lock:
+            self._pending.remove(job.id)
+        job.set_status('running')
+        job.started_at = time.time()
+        try:
+            if stream:
+                for item in fn(*args, **kwargs):
+                    job.publish(item)
+                job.result = len(job.items)
+            else:
+                job.result = fn(*args, **kwargs)
+            status = 'finished'
+        except Exception as e:
+            print(f"Job {job.id} ({job.kind}) failed: {e}")
+            job.error = str(e)
+            status = 'failed'
+        job.finished_at = time.time()
+        job.set_status(status)
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def status(self, job_id):
+        job = self.get(job_id)
+        if job is None:
+            return None
+        with self._lock:
+            position = self._pending.index(job.id) + 1 if job.id in self._pending else None
+        return job.to_dict(position)
+
+    def stats(self):
+        with self._lock:
+            counts = {'queued': 0, 'running': 0, 'finished': 0, 'failed': 0}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+        return counts
+
+    def _prune(self):
+        cutoff = time.time() - self.retention_seconds
+        expired = [job_id for job_id, job in self._jobs.items() if job.done and job.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+        self._keys = {key: job for key, job in self._keys.items() if job.id in self._jobs}
+
+
+exam_jobs = JobQueue()
+grading_jobs = JobQueue(max_workers=GRADING_WORKERS)
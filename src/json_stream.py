@@ -0,0 +1,63 @@
+import json
+
+
+class JSONArrayStreamParser:
+    """
+    Incremental parser for a streamed top-level JSON array of objects.
+
+    Text is fed in arbitrary chunks (as it arrives from the streaming API) and
+    every object is returned as soon as its closing brace has been seen.
+    """
+
+    def __init__(self):
+        self._buffer = []
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._started = False
+
+    def feed(self, text):
+        """
+        Consumes the next chunk of text.
+
+        Args:
+            text (str): The next piece of the JSON document.
+
+        Returns:
+            list: Objects completed by this chunk, in order.
+        """
+        completed = []
+        for ch in text:
+            if not self._started:
+                if ch == '[':
+                    self._started = True
+                continue
+
+            if self._depth > 0:
+                self._buffer.append(ch)
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == '\\':
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+
+            if ch == '"':
+                self._in_string = True
+            elif ch in '{[':
+                if self._depth == 0:
+                    self._buffer = [ch]
+                self._depth += 1
+            elif ch in '}]':
+                if self._depth == 0:
+                    # Closing bracket of the top-level array
+                    self._started = False
+                    continue
+                self._depth -= 1
+                if self._depth == 0:
+                    completed.append(json.loads(''.join(self._buffer)))
+                    self._buffer = []
+        return completed
@@ -0,0 +1,343 @@
+import os
+import re
+import json
+import math
+import time
+import random
+import hashlib
+import threading
+import typing
+from types import SimpleNamespace
+from pydantic import BaseModel
+from src.upload_cache import LocalFileAPI
+from src.context_cache import LocalCacheAPI
+
+# 'gemini' calls the real API; 'stub' serves deterministic local responses for load tests
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini").lower()
+# Stub latency distribution: "fixed:<ms>", "uniform:<lo_ms>:<hi_ms>" or "lognormal:<median_ms>:<sigma>"
+LLM_STUB_LATENCY = os.getenv("LLM_STUB_LATENCY", "lognormal:2000:0.5")
+# Fraction of stub calls that fail with a transient error
+LLM_STUB_ERROR_RATE = float(os.getenv("LLM_STUB_ERROR_RATE", "0"))
+LLM_STUB_SEED = int(os.getenv("LLM_STUB_SEED", "0"))
+# Connection pool shared by every model call in a process
+LLM_HTTP_MAX_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "32"))
+LLM_HTTP_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_HTTP_KEEPALIVE_CONNECTIONS", "16"))
+LLM_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY_SECONDS", "60"))
+# Items returned for a list schema when the prompt does not say how many questions it wants
+LLM_STUB_DEFAULT_ITEMS = int(os.getenv("LLM_STUB_DEFAULT_ITEMS", "10"))
+
+
+def get_api_key():
+    key = os.getenv("GEMINI_API_KEY")
+    if key:
+        return key.strip()
+    # Try reading from apikey.txt in the project root
+    try:
+        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        with open(os.path.join(base_dir, 'apikey.txt'), 'r') as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+class LLMBackend:
+    """
+    Interface for the model calls the app makes.
+
+    `generate` and `generate_stream` produce papers, `grade` scores student
+    answers and `upload` makes a file usable in `contents`. `files` and
+    `caches` are the file and cached-content APIs the upload and context
+    caches work against. Responses expose `.text`,
+    `.parsed` and `.usage_metadata` like google-genai responses.
+
+    `timeout` (seconds) bounds the HTTP request, so a call abandoned at its
+    deadline does not keep running; for a stream it bounds each read.
+    """
+
+    name = None
+
+    @property
+    def files(self):
+        raise NotImplementedError
+
+    @property
+    def caches(self):
+        raise NotImplementedError
+
+    def generate(self, model, contents, config=None, timeout=None):
+        raise NotImplementedError
+
+    def generate_stream(self, model, contents, config=None, timeout=None):
+        raise NotImplementedError
+
+    def grade(self, model, contents, config=None, timeout=None):
+        return self.generate(model, contents, config, timeout=timeout)
+
+    def upload(self, file):
+        return self.files.upload(file=file)
+
+
+def http2_available():
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class GeminiBackend(LLMBackend):
+    """
+    google-genai client with one keep-alive connection pool for all calls.
+    HTTP/2 needs h2, which requirements.txt pins through httpx[http2]; an
+    install without it falls back to HTTP/1.1 on the same pool.
+    """
+
+    name = "gemini"
+
+    def __init__(self, api_key=None):
+        import httpx
+        from google import genai
+        from google.genai import types
+        http_options = types.HttpOptions(client_args={
+            'limits': httpx.Limits(
+                max_connections=LLM_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_HTTP_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=LLM_HTTP_KEEPALIVE_EXPIRY,
+            ),
+            'http2': http2_available(),
+        })
+        self.client = genai.Client(api_key=api_key or get_api_key(), http_options=http_options)
+
+    @property
+    def files(self):
+        return self.client.files
+
+    @property
+    def caches(self):
+        return self.client.caches
+
+    @staticmethod
+    def _with_timeout(config, timeout):
+        if timeout is None:
+            return config
+        from google.genai import types
+        http_options = types.HttpOptions(timeout=max(1000, int(timeout * 1000)))
+        if config is None or isinstance(config, dict):
+            return dict(config or {}, http_options=http_options)
+        return config.model_copy(update={'http_options': http_options})
+
+    def generate(self, model, contents, config=None, timeout=None):
+        return self.client.models.generate_content(model=model, contents=contents,
+                                                   config=self._with_timeout(config, timeout))
+
+    def generate_stream(self, model, contents, config=None, timeout=None):
+        return self.client.models.generate_content_stream(model=model, contents=contents,
+                                                          config=self._with_timeout(config, timeout))
+
+
+class StubBackendError(Exception):
+    """Transient failure injected by the stub backend (stands in for a 503)."""
+    code = 503
+
+
+def parse_latency(spec):
+    kind, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(":") if v]
+    if kind == "fixed":
+        return lambda rng: values[0] / 1000
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1]) / 1000
+    if kind == "lognormal":
+        return lambda rng: rng.lognormvariate(math.log(values[0]), values[1]) / 1000
+    raise ValueError(f"Unknown LLM_STUB_LATENCY distribution: {spec}")
+
+
+def _prompt_text(contents):
+    if isinstance(contents, str):
+        return contents
+    return "\n".join(part for part in contents if isinstance(part, str))
+
+
+def requested_items(prompt):
+    """
+    How many list items a prompt asks for: one per question_number in a grading
+    prompt, the "exactly N" of a shard prompt, otherwise the "N questions" it mentions.
+    """
+    numbered = set(re.findall(r'"question_number":\s*"?(\d+)', prompt))
+    if numbered:
+        return len(numbered)
+    exact = re.search(r'exactly (\d+)', prompt)
+    if exact:
+        return int(exact.group(1))
+    counts = [int(n) for n in re.findall(r'(\d+)\s+(?:[A-Za-z]+\s+)?questions', prompt)]
+    return max(counts) if counts else LLM_STUB_DEFAULT_ITEMS
+
+
+def stub_value(annotation, field, index, rng, items):
+    """
+    Builds a deterministic value of the given type for field `field` of item `index`.
+    Lists of models (e.g. GradingResponse.results) get `items` entries.
+    """
+    origin = typing.get_origin(annotation)
+    args = [a for a in typing.get_args(annotation) if a is not type(None)]
+    if origin is typing.Union:
+        return stub_value(args[0], field, index, rng, items)
+    if origin is list:
+        item_type = args[0] if args else str
+        if field == "options":
+            return [f"Option {letter} for question {index}" for letter in "ABCD"]
+        if isinstance(item_type, type) and issubclass(item_type, BaseModel):
+            return [stub_model(item_type, i, rng, items) for i in range(1, items + 1)]
+        return [stub_value(item_type, field, i, rng, items) for i in range(1, 4)]
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return stub_model(annotation, index, rng, items)
+    if annotation is bool:
+        return rng.random() < 0.5
+    if annotation is int:
+        return index if field == "question_number" else rng.randint(0, 4)
+    if annotation is float:
+        return round(rng.uniform(0, 100), 2)
+    if field == "question_number":
+        return str(index)
+    return f"Stub {field} {index}"
+
+
+def stub_model(model_cls, index, rng, items):
+    values = {name: stub_value(info.annotation, name, index, rng, items)
+              for name, info in model_cls.model_fields.items()}
+    if values.get("options") and "answer" in values:
+        values["answer"] = rng.choice(values["options"])
+    return model_cls(**values)
+
+
+def stub_payload(schema, prompt, rng):
+    """
+    Returns (parsed, text) for a response schema: a model, a list of models or None.
+    """
+    items = requested_items(prompt)
+    if typing.get_origin(schema) is list:
+        item_cls = typing.get_args(schema)[0]
+        parsed = [stub_model(item_cls, i, rng, items) for i in range(1, items + 1)]
+        return parsed, json.dumps([item.model_dump() for item in parsed])
+    if isinstance(schema, type) and issubclass(schema, BaseModel):
+        parsed = stub_model(schema, 1, rng, items)
+        return parsed, parsed.model_dump_json()
+    return None, json.dumps({"text": "stub response"})
+
+
+class StubBackend(LLMBackend):
+    """
+    Deterministic local backend for load tests and offline runs.
+
+    Responses are schema-valid instances of the requested response_schema,
+    seeded by the prompt so the same request always gets the same paper.
+    Latency and transient errors are drawn from configurable distributions
+    with a fixed seed, so runs are repeatable.
+    """
+
+    name = "stub"
+
+    def __init__(self, latency=LLM_STUB_LATENCY, error_rate=LLM_STUB_ERROR_RATE, seed=LLM_STUB_SEED):
+        self.latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._files = LocalFileAPI()
+        self._caches = LocalCacheAPI()
+        self.calls = 0
+        self.errors = 0
+
+    @property
+    def files(self):
+        return self._files
+
+    @property
+    def caches(self):
+        return self._caches
+
+    def _draw(self):
+        with self._lock:
+            self.calls += 1
+            delay = self.latency(self._rng)
+            failed = self._rng.random() < self.error_rate
+            if failed:
+                self.errors += 1
+        return delay, failed
+
+    def _respond(self, contents, config):
+        prompt = _prompt_text(contents)
+        schema = (config or {}).get("response_schema")
+        rng = random.Random(hashlib.sha1(prompt.encode("utf-8")).hexdigest())
+        parsed, text = stub_payload(schema, prompt, rng)
+        usage = SimpleNamespace(prompt_token_count=len(prompt) // 4, candidates_token_count=len(text) // 4)
+        return parsed, text, usage
+
+    def generate(self, model, contents, config=None, timeout=None):
+        delay, failed = self._draw()
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            raise TimeoutError("stub request timed out")
+        time.sleep(delay)
+        if failed:
+            raise StubBackendError("503 UNAVAILABLE (injected by stub backend)")
+        parsed, text, usage = self._respond(contents, config)
+        return SimpleNamespace(text=text, parsed=parsed, usage_metadata=usage)
+
+    def generate_stream(self, model, contents, config=None, timeout=None):
+        delay, failed = self._draw()
+        parsed, text, usage = self._respond(contents, config)
+        chunks = [text[i:i + 256] for i in range(0, len(text), 256)] or [""]
+        for i, chunk in enumerate(chunks):
+            if timeout is not None and delay / len(chunks) > timeout:
+                time.sleep(timeout)
+                raise TimeoutError("stub stream read timed out")
+            time.sleep(delay / len(chunks))
+            if failed and i == len(chunks) // 2:
+                raise StubBackendError("503 UNAVAILABLE mid-stream (injected by stub backend)")
+            yield SimpleNamespace(text=chunk, usage_metadata=usage if i == len(chunks) - 1 else None)
+
+
+BACKENDS = {
+    "gemini": GeminiBackend,
+    "stub": StubBackend,
+}
+
+
+def create_backend(name=LLM_BACKEND):
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown LLM_BACKEND '{name}', expected one of {sorted(BACKENDS)}")
+    return BACKENDS[name]()
+
+
+_backend = None
+_backend_pid = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """
+    Returns the process-wide backend, creating it on first use.
+
+    Nothing connects at import time. Each process gets its own instance, so
+    workers forked from a preloaded app never share the parent's connection
+    pool.
+    """
+    global _backend, _backend_pid
+    pid = os.getpid()
+    if _backend is None or _backend_pid != pid:
+        with _backend_lock:
+            if _backend is None or _backend_pid != pid:
+                _backend = create_backend()
+                _backend_pid = pid
+                print(f"LLM backend ready: {_backend.name} (pid {pid})")
+    return _backend
+
+
+def _reset_after_fork():
+    global _backend, _backend_pid, _backend_lock
+    _backend = None
+    _backend_pid = None
+    _backend_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,310 @@
+import os
+import json
+import time
+import queue
+import threading
+from bisect import bisect_left
+from collections import defaultdict, deque
+from src.llm_policy import policy_for, call_with_policy, is_transient, backoff_delay, time_left, DeadlineExceeded
+
+# Latency histogram bucket upper bounds, in seconds
+LATENCY_BUCKETS = (0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300)
+# Recent latencies kept per exam type for p50/p95/p99
+LLM_LATENCY_SAMPLES = int(os.getenv("LLM_LATENCY_SAMPLES", "1000"))
+# USD per million (prompt, output) tokens; override with LLM_PRICES='{"model": [in, out]}'
+LLM_PRICES = {
+    "gemini-2.5-flash-lite": (0.10, 0.40),
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.0-flash": (0.10, 0.40),
+}
+LLM_PRICES.update({m: tuple(p) for m, p in json.loads(os.getenv("LLM_PRICES", "{}")).items()})
+
+
+def usage_tokens(response):
+    """
+    Returns (prompt_tokens, output_tokens) from a response's usage_metadata, 0 when missing.
+    """
+    usage = getattr(response, 'usage_metadata', None)
+    if usage is None:
+        return 0, 0
+    return (getattr(usage, 'prompt_token_count', None) or 0,
+            getattr(usage, 'candidates_token_count', None) or 0)
+
+
+def call_cost(model, prompt_tokens, output_tokens):
+    prompt_price, output_price = LLM_PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * prompt_price + output_tokens * output_price) / 1e6
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(q * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{k}="{str(v)}"' for k, v in labels.items()) + "}"
+
+
+def format_gauges(prefix, stats):
+    """
+    Renders the numeric values of a stats() dict as Prometheus gauges.
+    """
+    lines = []
+    for name, value in stats.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        lines.append(f"# TYPE {prefix}_{name} gauge")
+        lines.append(f"{prefix}_{name} {value}")
+    return "\n".join(lines)
+
+
+class LLMMetrics:
+    """
+    Latency, token and cost accounting for model calls.
+
+    Every call is labelled with the model, the calling route (the code path
+    that made the call) and the exam type. Histograms and counters are kept
+    per label set; the most recent latencies per exam type back the
+    p50/p95/p99 summary.
+    """
+
+    def __init__(self, sample_size=LLM_LATENCY_SAMPLES):
+        self._lock = threading.Lock()
+        self._requests = defaultdict(int)
+        self._buckets = defaultdict(lambda: [0] * (len(LATENCY_BUCKETS) + 1))
+        self._latency_sum = defaultdict(float)
+        self._prompt_tokens = defaultdict(int)
+        self._output_tokens = defaultdict(int)
+        self._cost = defaultdict(float)
+        self._samples = defaultdict(lambda: deque(maxlen=sample_size))
+        self._events = defaultdict(int)
+
+    def observe(self, model, route, exam, latency, prompt_tokens=0, output_tokens=0, error=None):
+        exam = (exam or 'unknown').upper()
+        key = (model, route, exam)
+        cost = call_cost(model, prompt_tokens, output_tokens)
+        with self._lock:
+            self._requests[key + ('error' if error else 'ok',)] += 1
+            self._buckets[key][bisect_left(LATENCY_BUCKETS, latency)] += 1
+            self._latency_sum[key] += latency
+            self._prompt_tokens[key] += prompt_tokens
+            self._output_tokens[key] += output_tokens
+            self._cost[key] += cost
+            self._samples[exam].append(latency)
+        status = f"error={error}" if error else "ok"
+        print(f"LLM call route={route} exam={exam} model={model} latency={latency:.2f}s "
+              f"prompt_tokens={prompt_tokens} output_tokens={output_tokens} cost=${cost:.5f} {status}")
+
+    def count_event(self, exam, event):
+        """
+        Counts a call policy event ('retry', 'hedge', 'hedge_win', 'deadline_exceeded') for an exam type.
+        """
+        with self._lock:
+            self._events[((exam or 'unknown').upper(), event)] += 1
+
+    def events(self):
+        with self._lock:
+            return dict(self._events)
+
+    def hedge_after(self, exam, min_samples):
+        """
+        The p95 latency for an exam type, or None until enough calls have been seen.
+        """
+        summary = self.percentiles().get((exam or 'unknown').upper())
+        if not summary or summary['count'] < min_samples:
+            return None
+        return summary['p95']
+
+    def percentiles(self):
+        """
+        Returns {exam: {'count', 'p50', 'p95', 'p99'}} over the recent latency samples.
+        """
+        with self._lock:
+            samples = {exam: sorted(values) for exam, values in self._samples.items()}
+        return {
+            exam: {
+                'count': len(values),
+                'p50': percentile(values, 0.50),
+                'p95': percentile(values, 0.95),
+                'p99': percentile(values, 0.99),
+            }
+            for exam, values in samples.items()
+        }
+
+    def prometheus(self):
+        """
+        Renders all LLM metrics in the Prometheus text exposition format.
+        """
+        with self._lock:
+            requests = dict(self._requests)
+            buckets = {key: list(counts) for key, counts in self._buckets.items()}
+            latency_sum = dict(self._latency_sum)
+            prompt_tokens = dict(self._prompt_tokens)
+            output_tokens = dict(self._output_tokens)
+            cost = dict(self._cost)
+            events = dict(self._events)
+
+        lines = ["# HELP llm_requests_total Model calls by model, route, exam and status.",
+                 "# TYPE llm_requests_total counter"]
+        for (model, route, exam, status), count in sorted(requests.items()):
+            lines.append(f"llm_requests_total{_labels(model=model, route=route, exam=exam, status=status)} {count}")
+
+        lines += ["# HELP llm_request_latency_seconds Model call latency.",
+                  "# TYPE llm_request_latency_seconds histogram"]
+        for key, counts in sorted(buckets.items()):
+            model, route, exam = key
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), counts):
+                cumulative += count
+                lines.append(f"llm_request_latency_seconds_bucket"
+                             f"{_labels(model=model, route=route, exam=exam, le=bound)} {cumulative}")
+            lines.append(f"llm_request_latency_seconds_sum{_labels(model=model, route=route, exam=exam)} {latency_sum[key]:.6f}")
+            lines.append(f"llm_request_latency_seconds_count{_labels(model=model, route=route, exam=exam)} {cumulative}")
+
+        for name, values, kind in (("llm_prompt_tokens_total", prompt_tokens, "counter"),
+                                   ("llm_output_tokens_total", output_tokens, "counter"),
+                                   ("llm_cost_usd_total", cost, "counter")):
+            lines.append(f"# TYPE {name} {kind}")
+            for (model, route, exam), value in sorted(values.items()):
+                lines.append(f"{name}{_labels(model=model, route=route, exam=exam)} {value}")
+
+        lines += ["# HELP llm_call_events_total Retries, hedged requests, hedge wins and deadline misses per exam type.",
+                  "# TYPE llm_call_events_total counter"]
+        for (exam, event), count in sorted(events.items()):
+            lines.append(f"llm_call_events_total{_labels(exam=exam, event=event)} {count}")
+
+        lines += ["# HELP llm_exam_latency_seconds Recent model call latency quantiles per exam type.",
+                  "# TYPE llm_exam_latency_seconds summary"]
+        for exam, summary in sorted(self.percentiles().items()):
+            for q in ('p50', 'p95', 'p99'):
+                quantile = f"0.{q[1:]}"
+                lines.append(f"llm_exam_latency_seconds{_labels(exam=exam, quantile=quantile)} {summary[q]:.6f}")
+            lines.append(f"llm_exam_latency_seconds_count{_labels(exam=exam)} {summary['count']}")
+        return "\n".join(lines)
+
+
+llm_metrics = LLMMetrics()
+
+
+def _observed(call, route, exam, model, contents, config, timeout):
+    started = time.perf_counter()
+    try:
+        response = call(model, contents, config, timeout=timeout)
+    except Exception as e:
+        llm_metrics.observe(model, route, exam, time.perf_counter() - started, error=type(e).__name__)
+        raise
+    llm_metrics.observe(model, route, exam, time.perf_counter() - started, *usage_tokens(response))
+    return response
+
+
+def _call(call, route, exam, model, contents, config):
+    policy = policy_for(exam)
+    return call_with_policy(
+        lambda timeout: _observed(call, route, exam, model, contents, config, timeout),
+        policy,
+        hedge_after=llm_metrics.hedge_after(exam, policy['hedge_min_samples']),
+        on_event=lambda event: llm_metrics.count_event(exam, event),
+    )
+
+
+def generate_content(backend, route, exam=None, model=None, contents=None, config=None):
+    """
+    `backend.generate(...)` under the exam type's call policy, with every attempt
+    recorded under `route`/`exam`.
+    """
+    return _call(backend.generate, route, exam, model, contents, config)
+
+
+def grade_content(backend, route, exam=None, model=None, contents=None, config=None):
+    """
+    `backend.grade(...)` under the exam type's call policy, with every attempt
+    recorded under `route`/`exam`.
+    """
+    return _call(backend.grade, route, exam, model, contents, config)
+
+
+def _read_stream(open_stream, deadline):
+    """
+    Yields the chunks of `open_stream()`, read on a separate thread so the
+    deadline holds even while a read is stalled: the caller gets
+    DeadlineExceeded on time, and the reader stops at its next chunk or when
+    the stream's HTTP read timeout (the time left) fires.
+    """
+    chunks = queue.Queue()
+    stop = threading.Event()
+
+    def reader():
+        try:
+            for chunk in open_stream():
+                if stop.is_set():
+                    return
+                chunks.put((chunk, None))
+            chunks.put((None, None))
+        except Exception as e:
+            chunks.put((None, e))
+
+    threading.Thread(target=reader, name="llm-stream", daemon=True).start()
+    try:
+        while True:
+            try:
+                chunk, error = chunks.get(timeout=time_left(deadline))
+            except queue.Empty:
+                raise DeadlineExceeded("Model stream exceeded its deadline")
+            if error is not None:
+                raise error
+            if chunk is None:
+                return
+            yield chunk
+    finally:
+        stop.set()
+
+
+def generate_content_stream(backend, route, exam=None, model=None, contents=None, config=None):
+    """
+    Streaming counterpart of generate_content; each attempt is recorded once its stream ends.
+
+    A stream is only retried if it fails before its first chunk. The deadline
+    is enforced while waiting for each chunk, so a stalled stream fails at the
+    deadline, and the request's HTTP timeout is the time left. Streams are not
+    hedged. Usage is read from the last chunk that carries usage_metadata.
+    """
+    policy = policy_for(exam)
+    deadline = time.monotonic() + policy['deadline'] if policy['deadline'] else None
+    attempt = 0
+    while True:
+        started = time.perf_counter()
+        tokens = (0, 0)
+        yielded = False
+        try:
+            timeout = time_left(deadline)
+            if deadline is None:
+                stream = backend.generate_stream(model, contents, config)
+            else:
+                stream = _read_stream(lambda: backend.generate_stream(model, contents, config, timeout=timeout),
+                                      deadline)
+            for chunk in stream:
+                if getattr(chunk, 'usage_metadata', None) is not None:
+                    tokens = usage_tokens(chunk)
+                yielded = True
+                yield chunk
+        except Exception as e:
+            llm_metrics.observe(model, route, exam, time.perf_counter() - started, *tokens, error=type(e).__name__)
+            if deadline is not None and time.monotonic() >= deadline:
+                llm_metrics.count_event(exam, "deadline_exceeded")
+                if isinstance(e, DeadlineExceeded):
+                    raise
+                raise DeadlineExceeded(f"Model stream exceeded its deadline: {e}") from e
+            if yielded or attempt >= policy['retries'] or not is_transient(e):
+                raise
+            delay = backoff_delay(policy, attempt)
+            if deadline is not None and time.monotonic() + delay >= deadline:
+                raise
+            attempt += 1
+            llm_metrics.count_event(exam, "retry")
+            print(f"Transient model error ({e}); retrying stream {attempt}/{policy['retries']} in {delay:.1f}s")
+            time.sleep(delay)
+            continue
+        llm_metrics.observe(model, route, exam, time.perf_counter() - started, *tokens)
+        return
@@ -0,0 +1,172 @@
+import os
+import json
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+# Defaults for every model call; full-length competitive papers get longer deadlines below
+DEFAULT_POLICY = {
+    "deadline": 180,          # seconds for the whole call, retries included (0 disables)
+    "retries": 2,             # extra attempts after a transient error
+    "backoff": 1.0,           # first retry delay in seconds, doubled per attempt with jitter
+    "max_backoff": 20.0,
+    "hedge": False,           # fire a duplicate request once the first one passes the p95 latency
+    "hedge_after": None,      # fixed hedge delay in seconds instead of the observed p95
+    "hedge_min_samples": 20,  # p95 is only trusted after this many calls for the exam type
+}
+EXAM_POLICIES = {
+    "JEE_MAINS": {"deadline": 300},
+    "JEE_ADVANCED": {"deadline": 300},
+    "NEET_UG": {"deadline": 420},
+}
+# JSON overrides per exam type, e.g. '{"default": {"retries": 3}, "NEET_UG": {"hedge": true}}'
+EXAM_POLICIES_OVERRIDE = json.loads(os.getenv("LLM_CALL_POLICY", "{}"))
+# Threads that run hedged model calls; every call carries an HTTP timeout, so none outlives its deadline
+LLM_CALL_THREADS = int(os.getenv("LLM_CALL_THREADS", "32"))
+
+TRANSIENT_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+class DeadlineExceeded(TimeoutError):
+    """A model call did not finish within its exam type's deadline."""
+
+
+def _get_executor():
+    # Pool threads do not survive a fork, so a forked worker builds its own pool
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=LLM_CALL_THREADS, thread_name_prefix="llm-call")
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def policy_for(exam):
+    exam = (exam or '').upper()
+    policy = dict(DEFAULT_POLICY)
+    policy.update(EXAM_POLICIES_OVERRIDE.get("default", {}))
+    policy.update(EXAM_POLICIES.get(exam, {}))
+    policy.update(EXAM_POLICIES_OVERRIDE.get(exam, {}))
+    return policy
+
+
+def is_transient(exc):
+    """
+    Rate limits, server errors, timeouts and dropped connections are worth retrying;
+    bad requests and our own deadline are not.
+    """
+    import httpx
+    if isinstance(exc, DeadlineExceeded):
+        return False
+    code = getattr(exc, 'code', None)
+    if isinstance(code, int):
+        return code in TRANSIENT_STATUS_CODES
+    return isinstance(exc, (TimeoutError, ConnectionError, httpx.TransportError))
+
+
+def backoff_delay(policy, attempt):
+    delay = min(policy["max_backoff"], policy["backoff"] * (2 ** attempt))
+    return delay * random.uniform(0.5, 1.0)
+
+
+def time_left(deadline):
+    """
+    Seconds until `deadline` (a time.monotonic() value), None without one.
+
+    Raises:
+        DeadlineExceeded: The deadline has already passed.
+    """
+    if deadline is None:
+        return None
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise DeadlineExceeded("Model call exceeded its deadline")
+    return remaining
+
+
+def _attempt(fn, deadline, hedge_after, on_event):
+    """
+    Runs one attempt under the deadline, hedging it with a duplicate call when
+    the first has not answered after `hedge_after` seconds.
+
+    Without hedging the call runs in the caller's thread with the time left as
+    its HTTP timeout. Hedged calls run on the pool; each gets the time left
+    when it starts, so a call that waited in the queue past the deadline never
+    reaches the API and one that is running ends at the deadline.
+    """
+    if hedge_after is None:
+        return fn(time_left(deadline))
+    run = lambda: fn(time_left(deadline))
+    futures = [_get_executor().submit(run)]
+    if deadline is None or time.monotonic() + hedge_after < deadline:
+        done, _ = wait(futures, timeout=hedge_after)
+        if not done:
+            on_event("hedge")
+            futures.append(_get_executor().submit(run))
+    hedged = len(futures) > 1
+    last_error = None
+    while futures:
+        # The calls time out at the deadline themselves; the grace only covers their unwinding
+        timeout = None if deadline is None else max(0.0, deadline - time.monotonic()) + 1.0
+        done, _ = wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+        if not done:
+            raise DeadlineExceeded("Model call exceeded its deadline")
+        for future in done:
+            is_hedge = hedged and future is futures[-1]
+            futures.remove(future)
+            if future.exception() is None:
+                if is_hedge:
+                    on_event("hedge_win")
+                return future.result()
+            last_error = future.exception()
+    raise last_error
+
+
+def call_with_policy(fn, policy, hedge_after=None, on_event=None):
+    """
+    Calls `fn(timeout)` with the policy's deadline, transient-error retries and optional hedging.
+
+    Args:
+        fn: Callable making one model call; `timeout` is the seconds left before the deadline
+            (None without one) and must be passed on as the request's HTTP timeout.
+        policy (dict): Result of policy_for(exam).
+        hedge_after (float): Observed p95 latency to hedge after; ignored unless policy['hedge'].
+        on_event: Called with 'retry', 'hedge', 'hedge_win' or 'deadline_exceeded'.
+
+    Returns:
+        The first successful response.
+    """
+    on_event = on_event or (lambda event: None)
+    deadline = time.monotonic() + policy["deadline"] if policy["deadline"] else None
+    if policy["hedge"]:
+        hedge_after = policy["hedge_after"] if policy["hedge_after"] is not None else hedge_after
+    else:
+        hedge_after = None
+
+    attempt = 0
+    while True:
+        try:
+            return _attempt(fn, deadline, hedge_after, on_event)
+        except DeadlineExceeded:
+            on_event("deadline_exceeded")
+            raise
+        except Exception as e:
+            if deadline is not None and time.monotonic() >= deadline:
+                # The HTTP timeout fired because the deadline was reached
+                on_event("deadline_exceeded")
+                raise DeadlineExceeded(f"Model call exceeded its deadline: {e}") from e
+            if attempt >= policy["retries"] or not is_transient(e):
+                raise
+            delay = backoff_delay(policy, attempt)
+            if deadline is not None and time.monotonic() + delay >= deadline:
+                on_event("deadline_exceeded")
+                raise DeadlineExceeded(f"No time left to retry after: {e}") from e
+            attempt += 1
+            on_event("retry")
+            print(f"Transient model error ({e}); retry {attempt}/{policy['retries']} in {delay:.1f}s")
+            time.sleep(delay)
@@ -0,0 +1,90 @@
+import os
+import json
+import threading
+from collections import OrderedDict
+
+# Cap on the JSON size (bytes on disk) of the papers kept parsed in memory
+PAPER_CACHE_MAX_BYTES = int(os.getenv("PAPER_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+
+class Paper:
+    """
+    A parsed paper. Lookups by question number go through its compiled
+    answer key (src.answer_key.answer_key_for), which is attached on first use.
+
+    Instances are shared between requests, so callers must treat the
+    questions as read-only (apply_variant copies what it changes).
+    """
+
+    def __init__(self, questions, size):
+        self.questions = questions
+        self.size = size
+
+
+class PaperCache:
+    """
+    LRU cache of parsed paper JSON files keyed by (path, mtime, size).
+
+    A file rewritten in place (e.g. a streamed paper being completed) gets a
+    new key, so stale parses are never served. The least recently used
+    papers are dropped once the cached JSON exceeds `max_bytes`.
+    """
+
+    def __init__(self, max_bytes=PAPER_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._papers = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, path) -> Paper:
+        """
+        Returns the parsed paper at `path`, reading it only when it is not cached or has changed.
+
+        Raises:
+            FileNotFoundError: If the paper does not exist.
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        key = (path, stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            paper = self._papers.get(key)
+            if paper is not None:
+                self._papers.move_to_end(key)
+                self.hits += 1
+                return paper
+
+        with open(path, 'r', encoding='utf-8') as f:
+            paper = Paper(json.load(f), stat.st_size)
+
+        with self._lock:
+            self.misses += 1
+            for old_key in [k for k in self._papers if k[0] == path and k != key]:
+                self._bytes -= self._papers.pop(old_key).size
+            if key not in self._papers:
+                self._papers[key] = paper
+                self._bytes += paper.size
+            while self._bytes > self.max_bytes and len(self._papers) > 1:
+                _, evicted = self._papers.popitem(last=False)
+                self._bytes -= evicted.size
+                self.evictions += 1
+        return paper
+
+    def questions(self, path):
+        return self.get(path).questions
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'entries': len(self._papers),
+            'bytes': self._bytes,
+        }
+
+
+paper_cache = PaperCache()
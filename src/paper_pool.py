@@ -0,0 +1,220 @@
+import os
+import json
+import time
+import threading
+from collections import deque, Counter
+
+# Unused papers kept ready per hot configuration (0 disables the pool)
+PAPER_POOL_SIZE = int(os.getenv("PAPER_POOL_SIZE", "2"))
+# Pooled papers older than this are discarded so students don't keep getting stale papers
+PAPER_POOL_MAX_AGE = int(os.getenv("PAPER_POOL_MAX_AGE_SECONDS", str(24 * 3600)))
+# A configuration becomes hot once it has been requested this many times
+PAPER_POOL_HOT_THRESHOLD = int(os.getenv("PAPER_POOL_HOT_THRESHOLD", "3"))
+PAPER_POOL_REFILL_INTERVAL = int(os.getenv("PAPER_POOL_REFILL_INTERVAL_SECONDS", "30"))
+# Request counts halve every this many seconds, so a configuration that stops being requested cools down (0 never decays)
+PAPER_POOL_DECAY_SECONDS = int(os.getenv("PAPER_POOL_DECAY_SECONDS", "3600"))
+# JSON list of generate_paper argument dicts that are always kept warm, e.g.
+# [{"name_of_the_exam": "NEET_UG", "difficulty_level": "medium", "format_of_the_exam": "MCQ"}]
+PAPER_POOL_PRESETS = os.getenv("PAPER_POOL_PRESETS", "").strip() or "[]"
+
+SCHOOL_EXAMS = ("SCHOOL_QUIZ", "SCHOOL_TEST")
+
+
+def normalize_paper_args(name_of_the_exam, difficulty_level=None, format_of_the_exam=None, subject=None,
+                         grade=None, board=None, chapters=None, language='ENG', **_):
+    """
+    Normalizes generate_paper arguments so equivalent requests share one pool key.
+    Fields that generate_paper ignores for the exam type are dropped.
+    """
+    exam_upper = name_of_the_exam.upper()
+    if exam_upper in SCHOOL_EXAMS:
+        return {
+            'name_of_the_exam': exam_upper,
+            'subject': (subject or '').upper(),
+            'grade': str(grade or ''),
+            'board': (board or '').upper(),
+            'chapters': sorted(c.strip() for c in (chapters or []) if c and c.strip()),
+            'language': (language or 'ENG').upper(),
+        }
+    return {
+        'name_of_the_exam': exam_upper,
+        'difficulty_level': (difficulty_level or '').lower(),
+        'format_of_the_exam': (format_of_the_exam or '').upper(),
+    }
+
+
+def pool_key(**paper_args):
+    return json.dumps(normalize_paper_args(**paper_args), sort_keys=True)
+
+
+class PaperPool:
+    """
+    Keeps pre-generated papers for popular exam configurations.
+
+    `take` hands out a ready paper instantly when one is available. Misses are
+    counted per configuration, and a background refiller keeps `size` unused
+    papers for every configuration that is requested often enough. Counts
+    decay with a half-life of `decay_seconds`; presets stay hot.
+
+    `claim(path, student)` decides whether a pooled paper may go to a
+    student (e.g. it repeats no question they have seen) and records it;
+    papers a student cannot take stay in the pool for others.
+    """
+
+    def __init__(self, generate, size=PAPER_POOL_SIZE, max_age=PAPER_POOL_MAX_AGE,
+                 hot_threshold=PAPER_POOL_HOT_THRESHOLD, refill_interval=PAPER_POOL_REFILL_INTERVAL, presets=None,
+                 decay_seconds=PAPER_POOL_DECAY_SECONDS, claim=None):
+        self.generate = generate
+        self.claim = claim
+        self.size = size
+        self.max_age = max_age
+        self.hot_threshold = hot_threshold
+        self.refill_interval = refill_interval
+        self.decay_seconds = decay_seconds
+        self._decayed_at = time.time()
+        self._presets = set()
+        self._papers = {}
+        self._args = {}
+        self._requests = Counter()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.hits = 0
+        self.misses = 0
+        self.refills = 0
+        self.refill_failures = 0
+        self.evictions = 0
+        for paper_args in presets or []:
+            key = pool_key(**paper_args)
+            self._args[key] = normalize_paper_args(**paper_args)
+            self._requests[key] = max(self._requests[key], hot_threshold)
+            self._presets.add(key)
+
+    @property
+    def enabled(self):
+        return self.size > 0
+
+    def take(self, student=None, **paper_args):
+        """
+        Returns the path of a pooled paper for these arguments, or None on a
+        miss. With `student`, only a paper `claim` accepts for them is returned.
+        """
+        key = pool_key(**paper_args)
+        with self._lock:
+            self._requests[key] += 1
+            self._args.setdefault(key, normalize_paper_args(**paper_args))
+            self._evict_expired(key)
+            papers = self._papers.get(key)
+            skipped = []
+            try:
+                while papers:
+                    entry = papers.popleft()
+                    if not os.path.exists(entry[0]):
+                        continue
+                    if student and self.claim and not self.claim(entry[0], student):
+                        skipped.append(entry)
+                        continue
+                    self.hits += 1
+                    return entry[0]
+                self.misses += 1
+                return None
+            finally:
+                if skipped:
+                    papers.extendleft(reversed(skipped))
+
+    def add(self, path, **paper_args):
+        key = pool_key(**paper_args)
+        with self._lock:
+            self._args.setdefault(key, normalize_paper_args(**paper_args))
+            self._papers.setdefault(key, deque()).append((path, time.time()))
+
+    def hot_keys(self):
+        with self._lock:
+            return [key for key, count in self._requests.items() if count >= self.hot_threshold]
+
+    def _evict_expired(self, key):
+        papers = self._papers.get(key)
+        cutoff = time.time() - self.max_age
+        while papers and papers[0][1] < cutoff:
+            path, _ = papers.popleft()
+            self.evictions += 1
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def decay(self, now=None):
+        """
+        Halves the request counts once per elapsed half-life and forgets
+        configurations whose count reaches zero (presets are kept).
+        """
+        if self.decay_seconds <= 0:
+            return
+        now = time.time() if now is None else now
+        with self._lock:
+            periods = int((now - self._decayed_at) // self.decay_seconds)
+            if periods <= 0:
+                return
+            self._decayed_at += periods * self.decay_seconds
+            for key in list(self._requests):
+                if key in self._presets:
+                    continue
+                count = self._requests[key] >> periods
+                if count:
+                    self._requests[key] = count
+                else:
+                    del self._requests[key]
+
+    def refill_once(self):
+        """
+        Evicts aged papers and tops every hot configuration back up to `size`.
+        """
+        self.decay()
+        for key in self.hot_keys():
+            with self._lock:
+                self._evict_expired(key)
+                missing = self.size - len(self._papers.get(key, ()))
+                paper_args = dict(self._args[key])
+            for _ in range(missing):
+                try:
+                    path = self.generate(**paper_args)
+                except Exception as e:
+                    path = None
+                    print(f"Paper pool refill failed for {key}: {e}")
+                if not path:
+                    self.refill_failures += 1
+                    break
+                self.refills += 1
+                self.add(path, **paper_args)
+
+    def _run(self):
+        while True:
+            try:
+                self.refill_once()
+            except Exception as e:
+                print(f"Paper pool refiller error: {e}")
+            time.sleep(self.refill_interval)
+
+    def start(self):
+        if not self.enabled or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="paper-pool-refiller", daemon=True)
+        self._thread.start()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        with self._lock:
+            ready = {key: len(papers) for key, papers in self._papers.items() if papers}
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'refills': self.refills,
+            'refill_failures': self.refill_failures,
+            'evictions': self.evictions,
+            'hot_keys': len(self.hot_keys()),
+            'ready': ready,
+        }
+
+
+def create_paper_pool(generate, claim=None):
+    return PaperPool(generate, presets=json.loads(PAPER_POOL_PRESETS), claim=claim)
@@ -0,0 +1,150 @@
+import os
+import time
+import hashlib
+import threading
+from src.paper_cache import paper_cache
+from src.utils import render_question_paper, render_answer_sheet
+from src.pdf_fonts import unicode_available
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR", os.path.join(BASE_DIR, "instance", "pdf_cache"))
+# Least recently rendered PDFs are deleted once the cache grows past this
+PDF_CACHE_MAX_BYTES = int(os.getenv("PDF_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+# Bump when the PDF layout changes so cached renders are not served; Unicode and ASCII renders are kept apart
+PDF_RENDER_VERSION = "3u" if unicode_available() else "2"
+
+RENDERERS = {
+    'questions': render_question_paper,
+    'answers': render_answer_sheet,
+}
+
+
+class PDFCache:
+    """
+    Rendered question papers and answer sheets on disk, keyed by the paper's
+    content hash and the document kind.
+
+    Only the requested document is rendered, on first request; the content
+    hash doubles as the ETag so repeat downloads can be answered with a 304.
+    """
+
+    def __init__(self, cache_dir=PDF_CACHE_DIR, max_bytes=PDF_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._digests = {}
+        self._bytes = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.render_seconds = 0.0
+
+    def content_hash(self, json_path):
+        """
+        sha256 of the paper JSON, remembered per (path, mtime, size) so it is computed once per version.
+        """
+        path = os.path.abspath(json_path)
+        stat = os.stat(path)
+        key = (path, stat.st_mtime_ns, stat.st_size)
+        digest = self._digests.get(key)
+        if digest is None:
+            with open(path, 'rb') as f:
+                digest = hashlib.sha256(f.read()).hexdigest()
+            self._digests[key] = digest
+        return digest
+
+    def etag(self, json_path, kind):
+        return f"{self.content_hash(json_path)[:32]}-{kind}-v{PDF_RENDER_VERSION}"
+
+    def artifact_path(self, digest, kind):
+        return os.path.join(self.cache_dir, digest[:2], f"{digest}_{kind}_v{PDF_RENDER_VERSION}.pdf")
+
+    def get(self, json_path, kind):
+        """
+        Returns (pdf_path, etag) for the paper's `kind` document ('questions' or 'answers'), rendering it if needed.
+        """
+        if kind not in RENDERERS:
+            raise ValueError(f"Unknown document kind: {kind}")
+        digest = self.content_hash(json_path)
+        path = self.artifact_path(digest, kind)
+        etag = self.etag(json_path, kind)
+        if os.path.exists(path):
+            self.hits += 1
+            return path, etag
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault((digest, kind), threading.Lock())
+        try:
+            with key_lock:
+                if os.path.exists(path):
+                    self.hits += 1
+                    return path, etag
+                self.render(paper_cache.questions(json_path), kind, path)
+                self.misses += 1
+        finally:
+            with self._lock:
+                self._key_locks.pop((digest, kind), None)
+        return path, etag
+
+    def render(self, questions, kind, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        started = time.perf_counter()
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            RENDERERS[kind](questions, tmp_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        os.replace(tmp_path, path)
+        elapsed = time.perf_counter() - started
+        self.render_seconds += elapsed
+        print(f"Rendered {kind} PDF for {len(questions)} questions in {elapsed:.2f}s")
+        self.account(os.path.getsize(path))
+
+    def _scan(self):
+        files = []
+        for directory, _, names in os.walk(self.cache_dir):
+            for name in names:
+                if name.endswith(".pdf"):
+                    full = os.path.join(directory, name)
+                    stat = os.stat(full)
+                    files.append((stat.st_mtime, stat.st_size, full))
+        return files
+
+    def account(self, size):
+        """
+        Counts a newly written PDF of `size` bytes against the cache budget,
+        evicting the least recently rendered files once it is exceeded.
+        """
+        with self._lock:
+            if self._bytes is None:
+                self._bytes = sum(size for _, size, _ in self._scan())
+            else:
+                self._bytes += size
+            if self._bytes <= self.max_bytes:
+                return
+            for _, size, full in sorted(self._scan()):
+                if self._bytes <= self.max_bytes:
+                    break
+                try:
+                    os.remove(full)
+                except OSError:
+                    continue
+                self._bytes -= size
+                self.evictions += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'render_seconds': self.render_seconds,
+            'bytes': self._bytes or 0,
+        }
+
+
+pdf_cache = PDFCache()
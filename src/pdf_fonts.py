@@ -0,0 +1,164 @@
+import os
+import re
+import threading
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Drop Noto Sans TTFs here (NotoSans-Regular/Bold, NotoSansTelugu-Regular, NotoSansDevanagari-Regular)
+PDF_FONT_DIR = os.getenv("PDF_FONT_DIR", os.path.join(BASE_DIR, "CONTENT", "FONTS"))
+# Parsed font metrics are pickled here so a new process does not re-parse the TTFs
+PDF_FONT_CACHE_DIR = os.getenv("PDF_FONT_CACHE_DIR", os.path.join(BASE_DIR, "instance", "font_cache"))
+PDF_UNICODE = os.getenv("PDF_UNICODE", "1") == "1"
+SYSTEM_FONT_DIRS = ["/usr/share/fonts/truetype/noto", "/usr/share/fonts/noto", "/usr/share/fonts/truetype/dejavu"]
+
+# First file found wins; DejaVu covers Latin, Greek and math symbols where Noto is not installed
+FONT_FILES = {
+    'sans': ["NotoSans-Regular.ttf", "DejaVuSans.ttf"],
+    'sansb': ["NotoSans-Bold.ttf", "DejaVuSans-Bold.ttf"],
+    'telugu': ["NotoSansTelugu-Regular.ttf"],
+    'devanagari': ["NotoSansDevanagari-Regular.ttf"],
+}
+SCRIPTS = [
+    ('telugu', re.compile('[ఀ-౿]')),
+    ('devanagari', re.compile('[ऀ-ॿ]')),
+]
+
+
+class MissingFontError(RuntimeError):
+    """A paper has Telugu or Hindi text that cannot be rendered with the installed fonts."""
+
+
+_lock = threading.Lock()
+_font_paths = None
+_font_entries = {}
+_parsed_fonts = {}
+
+
+def font_paths() -> dict:
+    """
+    Family -> TTF path for every family whose font file can be found.
+    """
+    global _font_paths
+    if _font_paths is None:
+        found = {}
+        for family, names in FONT_FILES.items():
+            for name in names:
+                path = next((os.path.join(d, name) for d in [PDF_FONT_DIR] + SYSTEM_FONT_DIRS
+                             if os.path.exists(os.path.join(d, name))), None)
+                if path:
+                    found[family] = path
+                    break
+        _font_paths = found
+    return _font_paths
+
+
+def unicode_available() -> bool:
+    return PDF_UNICODE and 'sans' in font_paths()
+
+
+def shaping_available() -> bool:
+    """
+    Telugu and Devanagari need their conjuncts and vowel signs shaped, which
+    only fpdf2 (with uharfbuzz) does; fpdf 1.7 would draw them as loose glyphs.
+    """
+    import fpdf
+    if fpdf.__version__.startswith("1."):
+        return False
+    try:
+        import uharfbuzz  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def new_document():
+    from fpdf import FPDF
+    return FPDF()
+
+
+def _fpdf2_font(pdf, family: str, path: str):
+    """
+    A document's copy of an fpdf2 font. The TTF is parsed (cmap, widths,
+    glyph ids) once per process; each document gets a copy sharing the
+    read-only tables, with its own glyph subset and its own handle on the
+    file, since fpdf2 subsets that handle in place on output.
+    """
+    import copy
+    from fontTools import ttLib
+    from fpdf.fonts import TTFFont, SubsetMap
+
+    with _lock:
+        parsed = _parsed_fonts.get(family)
+        if parsed is None:
+            parsed = _parsed_fonts[family] = TTFFont(pdf, path, family, '')
+    # A shallow copy: widths and glyph ids are plain ints, so copying their dicts is enough
+    font = copy.copy(parsed)
+    font.i = len(pdf.fonts) + 1
+    font.cw = copy.copy(parsed.cw)
+    font.glyph_ids = dict(parsed.glyph_ids)
+    font.ttfont = ttLib.TTFont(path, recalcTimestamp=False, fontNumber=0, lazy=True)
+    font.subset = SubsetMap(font)
+    font.missing_glyphs = []
+    font.biggest_size_pt = 0
+    return font
+
+
+def register_fonts(pdf) -> bool:
+    """
+    Adds the Unicode fonts to an FPDF document. The fonts are parsed once per
+    process; later documents only copy them. With fpdf2 the script fonts are
+    fallbacks of Sans and text is shaped, so a line mixing Telugu or Hindi
+    with Latin and math keeps every glyph. fpdf 1.7, on older installs, only
+    renders Latin, Greek and math.
+
+    Returns:
+        bool: False when no TTF font is available (callers fall back to core fonts and ASCII text).
+    """
+    if not unicode_available():
+        return False
+    import fpdf
+    if not fpdf.__version__.startswith("1."):
+        for family, path in font_paths().items():
+            pdf.fonts[family] = _fpdf2_font(pdf, family, path)
+        scripts = [family for family, _ in SCRIPTS if family in font_paths()]
+        if scripts:
+            pdf.set_fallback_fonts(scripts)
+            if shaping_available():
+                pdf.set_text_shaping(True)
+        return True
+    with _lock:
+        if not _font_entries:
+            from fpdf import FPDF
+            # fpdf 1.7's own metrics cache, so a new process does not re-parse the TTFs
+            fpdf.fpdf.FPDF_CACHE_MODE = 2
+            fpdf.fpdf.FPDF_CACHE_DIR = PDF_FONT_CACHE_DIR
+            os.makedirs(PDF_FONT_CACHE_DIR, exist_ok=True)
+            parsed = FPDF()
+            for family, path in font_paths().items():
+                parsed.add_font(family, '', path, uni=True)
+                _font_entries[family] = (parsed.fonts[family], parsed.font_files[family], path)
+    for family, (entry, font_file, path) in _font_entries.items():
+        pdf.fonts[family] = dict(entry, i=len(pdf.fonts) + 1, subset=list(entry['subset']))
+        pdf.font_files[family] = dict(font_file)
+        pdf.font_files[path] = {'type': "TTF"}
+    return True
+
+
+def family_for(text: str, bold: bool = False) -> str:
+    """
+    The family to set for `text`: Sans (or its bold). Telugu and Hindi runs
+    inside the text are drawn with their script fonts as Sans's fallbacks.
+
+    Raises:
+        MissingFontError: The text has Telugu or Hindi but the script's Noto
+            font is not installed, or the fpdf in use cannot shape it.
+    """
+    available = font_paths()
+    for family, pattern in SCRIPTS:
+        if pattern.search(text):
+            if family not in available:
+                raise MissingFontError(f"{FONT_FILES[family][0]} is needed to render {family.title()} text; "
+                                       f"put it in {PDF_FONT_DIR} (PDF_FONT_DIR)")
+            if not shaping_available():
+                raise MissingFontError(f"{family.title()} text needs fpdf2 with uharfbuzz to be shaped; "
+                                       "fpdf 1.7 would render it garbled")
+    return 'sansb' if bold and 'sansb' in available else 'sans'
@@ -0,0 +1,439 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from contextlib import contextmanager
+from typing import List, Optional
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+QUESTION_BANK_PATH = os.getenv("QUESTION_BANK_PATH", os.path.join(BASE_DIR, "instance", "question_bank.db"))
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS questions (
+    id INTEGER PRIMARY KEY,
+    content_hash TEXT UNIQUE NOT NULL,
+    exam TEXT NOT NULL,
+    subject TEXT NOT NULL DEFAULT '',
+    chapter TEXT NOT NULL DEFAULT '',
+    difficulty TEXT NOT NULL DEFAULT '',
+    grade TEXT NOT NULL DEFAULT '',
+    board TEXT NOT NULL DEFAULT '',
+    language TEXT NOT NULL DEFAULT '',
+    qtype TEXT NOT NULL,
+    question TEXT NOT NULL,
+    options_json TEXT,
+    answer TEXT NOT NULL,
+    solution TEXT NOT NULL DEFAULT '',
+    source_path TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_questions_bucket ON questions (exam, subject, chapter, difficulty, qtype);
+CREATE VIRTUAL TABLE IF NOT EXISTS questions_fts USING fts5(
+    question, solution, content='questions', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS questions_ai AFTER INSERT ON questions BEGIN
+    INSERT INTO questions_fts (rowid, question, solution) VALUES (new.id, new.question, new.solution);
+END;
+CREATE TRIGGER IF NOT EXISTS questions_ad AFTER DELETE ON questions BEGIN
+    INSERT INTO questions_fts (questions_fts, rowid, question, solution) VALUES ('delete', old.id, old.question, old.solution);
+END;
+CREATE TABLE IF NOT EXISTS served (
+    student TEXT NOT NULL,
+    question_id INTEGER NOT NULL,
+    served_at REAL NOT NULL,
+    PRIMARY KEY (student, question_id)
+);
+CREATE TABLE IF NOT EXISTS ingested_files (
+    path TEXT PRIMARY KEY,
+    mtime REAL NOT NULL
+);
+'''
+
+# Columns added after the first release, with the school papers' own index; added to older databases on open
+SCHOOL_COLUMNS = ("grade", "board", "language")
+SCHOOL_INDEX = "CREATE INDEX IF NOT EXISTS idx_questions_school ON questions (exam, subject, grade, board, language, chapter)"
+
+# Exam names encoded at the start of generated paper filenames
+EXAM_PREFIXES = ("SCHOOL_QUIZ", "SCHOOL_TEST", "JEE_MAINS", "JEE_ADVANCED", "NEET_UG")
+# Book languages; school filenames carry one after the board (older ones have none)
+LANGUAGES = ("ENG", "HIN", "TEL")
+
+
+def question_type(question: dict) -> str:
+    if question.get('options'):
+        return 'mcq'
+    if re.fullmatch(r'\s*-?\d+(\.\d+)?\s*', str(question.get('answer', ''))):
+        return 'numerical'
+    return 'subjective'
+
+
+def question_hash(question: dict) -> str:
+    normalized = ' '.join(str(question.get('question', '')).lower().split())
+    options = '|'.join(' '.join(str(o).lower().split()) for o in question.get('options') or [])
+    return hashlib.sha1(f"{normalized}\n{options}".encode('utf-8')).hexdigest()
+
+
+def label_subjects(questions: List[dict], subject_plan) -> List[dict]:
+    """
+    Fills in missing subjects from the exam's section plan, e.g.
+    [("Physics", 50), ("Chemistry", 50), ...], by question number. Papers
+    generated in one call have no subject field but follow the plan's order;
+    a paper whose length does not match the plan is left as it is.
+    """
+    if not subject_plan or len(questions) != sum(count for _, count in subject_plan):
+        return questions
+    ranges = []
+    first = 1
+    for subject, count in subject_plan:
+        ranges.append((first, first + count - 1, subject))
+        first += count
+    labeled = []
+    for position, question in enumerate(questions, 1):
+        if not question.get('subject'):
+            try:
+                number = int(question.get('question_number', position))
+            except (TypeError, ValueError):
+                number = position
+            subject = next((name for lo, hi, name in ranges if lo <= number <= hi), None)
+            if subject:
+                question = dict(question, subject=subject)
+        labeled.append(question)
+    return labeled
+
+
+def metadata_from_filename(path: str) -> dict:
+    """
+    Recovers exam metadata from a generated paper filename, e.g.
+    SCHOOL_QUIZ_BIOLOGY_9_TSBIE_TEL_<ts>.json or NEET_UG_medium_MCQ_<ts>.json.
+    School papers named before the language was added have no language.
+    """
+    name = os.path.splitext(os.path.basename(path))[0]
+    for exam in EXAM_PREFIXES:
+        if name.startswith(exam + "_"):
+            rest = name[len(exam) + 1:].split("_")
+            if exam.startswith("SCHOOL"):
+                # Subject names may contain underscores (e.g. SOCIAL_SCIENCE); grade, board and language follow
+                fields = rest[:-3] if len(rest) > 3 else rest
+                language = fields.pop() if len(fields) > 3 and fields[-1] in LANGUAGES else ''
+                if len(fields) > 2:
+                    subject, grade, board = "_".join(fields[:-2]), fields[-2], fields[-1]
+                else:
+                    subject, grade, board = (fields[0] if fields else ''), '', ''
+                return {'exam': exam, 'subject': subject, 'grade': grade, 'board': board, 'language': language}
+            return {'exam': exam, 'difficulty': rest[0] if rest else ''}
+    return {'exam': 'MISC'}
+
+
+class QuestionBank:
+    """
+    SQLite-backed bank of every generated question, indexed by exam, subject,
+    chapter, difficulty and type with full-text search over question text.
+    """
+
+    def __init__(self, path=QUESTION_BANK_PATH):
+        self.path = path
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    def _connect(self):
+        # The database is created on first use, not when the module is imported
+        if not self._schema_ready:
+            with self._schema_lock:
+                if not self._schema_ready:
+                    os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                    conn = sqlite3.connect(self.path, timeout=30)
+                    with conn:
+                        conn.executescript(SCHEMA)
+                        self._migrate(conn)
+                    conn.close()
+                    self._schema_ready = True
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    @staticmethod
+    def _migrate(conn):
+        """
+        Adds the grade/board/language columns to a bank created before them.
+        Existing school questions get them from their source paper's filename.
+        """
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(questions)")}
+        missing = [column for column in SCHOOL_COLUMNS if column not in columns]
+        for column in missing:
+            conn.execute(f"ALTER TABLE questions ADD COLUMN {column} TEXT NOT NULL DEFAULT ''")
+        if missing:
+            rows = conn.execute("SELECT id, source_path FROM questions "
+                                "WHERE exam LIKE 'SCHOOL%' AND source_path IS NOT NULL").fetchall()
+            updates = []
+            for question_id, source_path in rows:
+                meta = metadata_from_filename(source_path)
+                updates.append((meta.get('grade', ''), meta.get('board', '').upper(),
+                                meta.get('language', '').upper(), question_id))
+            conn.executemany("UPDATE questions SET grade = ?, board = ?, language = ? WHERE id = ?", updates)
+        conn.execute(SCHOOL_INDEX)
+
+    @contextmanager
+    def _connection(self):
+        """
+        A connection that commits on success, rolls back on error and is always closed.
+        """
+        conn = self._connect()
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def add_questions(self, questions: List[dict], exam: str, subject: Optional[str] = None,
+                      chapter: Optional[str] = None, difficulty: Optional[str] = None,
+                      source_path: Optional[str] = None, grade: Optional[str] = None,
+                      board: Optional[str] = None, language: Optional[str] = None) -> int:
+        """
+        Adds questions to the bank, skipping ones already present. School
+        questions should carry their grade, board and language, which
+        assemble() filters on.
+
+        Returns:
+            int: Number of new questions stored.
+        """
+        now = time.time()
+        rows = []
+        for q in questions:
+            if not q.get('question') or q.get('answer') is None:
+                continue
+            rows.append((
+                question_hash(q),
+                exam.upper(),
+                str(q.get('subject') or subject or '').upper(),
+                chapter or '',
+                (difficulty or '').lower(),
+                str(grade or ''),
+                (board or '').upper(),
+                (language or '').upper(),
+                question_type(q),
+                q['question'],
+                json.dumps(q['options']) if q.get('options') else None,
+                str(q['answer']),
+                q.get('solution') or '',
+                source_path,
+                now,
+            ))
+        with self._connection() as conn:
+            cursor = conn.executemany(
+                "INSERT OR IGNORE INTO questions (content_hash, exam, subject, chapter, difficulty, grade, board, "
+                "language, qtype, question, options_json, answer, solution, source_path, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            return max(cursor.rowcount, 0)
+
+    def ingest_paper(self, path: str, exam: Optional[str] = None, subject: Optional[str] = None,
+                     chapters: Optional[List[str]] = None, difficulty: Optional[str] = None,
+                     subject_plan=None, grade: Optional[str] = None, board: Optional[str] = None,
+                     language: Optional[str] = None) -> int:
+        """
+        Indexes every question of a generated paper JSON file.
+
+        Missing metadata is recovered from the filename. A chapter is only
+        recorded when the paper was generated from a single chapter. Competitive
+        papers are assembled per subject, so their questions are labeled from
+        `subject_plan` (see label_subjects) and ones left without a subject are
+        not indexed.
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            questions = json.load(f)
+        meta = metadata_from_filename(path)
+        exam = exam or meta['exam']
+        if not exam.upper().startswith("SCHOOL") and not subject:
+            questions = [q for q in label_subjects(questions, subject_plan) if q.get('subject')]
+        chapter = chapters[0] if chapters and len(chapters) == 1 else None
+        added = self.add_questions(
+            questions,
+            exam=exam,
+            subject=subject or meta.get('subject'),
+            chapter=chapter,
+            difficulty=difficulty or meta.get('difficulty'),
+            source_path=path,
+            grade=grade or meta.get('grade'),
+            board=board or meta.get('board'),
+            language=language or meta.get('language'),
+        )
+        with self._connection() as conn:
+            conn.execute("INSERT OR REPLACE INTO ingested_files (path, mtime) VALUES (?, ?)",
+                         (path, os.path.getmtime(path)))
+        return added
+
+    def ingest_directory(self, directory: str, subject_plans: Optional[dict] = None) -> int:
+        """
+        Indexes every paper under `directory` that is new or changed since the last run.
+        `subject_plans` maps exam names to their section plans (see ingest_paper).
+        """
+        with self._connection() as conn:
+            seen = {row['path']: row['mtime'] for row in conn.execute("SELECT path, mtime FROM ingested_files")}
+        added = 0
+        for root, _, files in os.walk(directory):
+            for filename in files:
+                if not filename.endswith(".json"):
+                    continue
+                path = os.path.join(root, filename)
+                if seen.get(path) == os.path.getmtime(path):
+                    continue
+                try:
+                    exam = metadata_from_filename(path)['exam']
+                    added += self.ingest_paper(path, subject_plan=(subject_plans or {}).get(exam))
+                except Exception as e:
+                    print(f"Error ingesting {path}: {e}")
+        print(f"Question bank: {added} new questions from {directory}")
+        return added
+
+    def search(self, text: str, exam: Optional[str] = None, limit: int = 20) -> List[dict]:
+        """
+        Full-text search over question and solution text.
+        """
+        sql = ("SELECT q.* FROM questions_fts f JOIN questions q ON q.id = f.rowid "
+               "WHERE questions_fts MATCH ?")
+        params = [text]
+        if exam:
+            sql += " AND q.exam = ?"
+            params.append(exam.upper())
+        sql += " ORDER BY rank LIMIT ?"
+        params.append(limit)
+        with self._connection() as conn:
+            return [self._to_question(row) for row in conn.execute(sql, params)]
+
+    def count(self, exam: str, subject: Optional[str] = None, chapter: Optional[str] = None,
+              difficulty: Optional[str] = None, student: Optional[str] = None, grade: Optional[str] = None,
+              board: Optional[str] = None, language: Optional[str] = None) -> int:
+        where, params = self._bucket_filter(exam, subject, chapter, difficulty, student, grade, board, language)
+        with self._connection() as conn:
+            return conn.execute(f"SELECT COUNT(*) FROM questions WHERE {where}", params).fetchone()[0]
+
+    @staticmethod
+    def _bucket_filter(exam, subject=None, chapter=None, difficulty=None, student=None,
+                       grade=None, board=None, language=None):
+        where = ["exam = ?"]
+        params = [exam.upper()]
+        if subject:
+            where.append("subject = ?")
+            params.append(subject.upper())
+        if chapter:
+            where.append("chapter = ?")
+            params.append(chapter)
+        if difficulty:
+            where.append("difficulty = ?")
+            params.append(difficulty.lower())
+        if grade:
+            where.append("grade = ?")
+            params.append(str(grade))
+        if board:
+            where.append("board = ?")
+            params.append(board.upper())
+        if language:
+            where.append("language = ?")
+            params.append(language.upper())
+        if student:
+            where.append("id NOT IN (SELECT question_id FROM served WHERE student = ?)")
+            params.append(student)
+        return " AND ".join(where), params
+
+    def assemble(self, exam: str, buckets: List[dict], difficulty: Optional[str] = None,
+                 student: Optional[str] = None, grade: Optional[str] = None, board: Optional[str] = None,
+                 language: Optional[str] = None):
+        """
+        Assembles a paper from the bank without calling the model.
+
+        Args:
+            exam (str): Exam name, e.g. NEET_UG or SCHOOL_QUIZ.
+            buckets (list): Dicts with 'count' and optional 'subject'/'chapter' keys.
+            difficulty (str): Optional difficulty filter.
+            student (str): When given, questions this student has seen are skipped
+                and the chosen ones are recorded as served.
+            grade, board, language (str): Filters for school papers, so one
+                paper never mixes grades, boards or languages.
+
+        Returns:
+            tuple: (questions, shortfall) where shortfall lists the buckets that
+            could not be filled and how many questions each is missing.
+        """
+        paper = []
+        shortfall = []
+        with self._connection() as conn:
+            for bucket in buckets:
+                where, params = self._bucket_filter(exam, bucket.get('subject'), bucket.get('chapter'), difficulty,
+                                                    student, grade, board, language)
+                rows = conn.execute(f"SELECT * FROM questions WHERE {where} ORDER BY random() LIMIT ?",
+                                    params + [bucket['count']]).fetchall()
+                if len(rows) < bucket['count']:
+                    shortfall.append(dict(bucket, missing=bucket['count'] - len(rows)))
+                for row in rows:
+                    question = self._to_question(row)
+                    question['question_number'] = len(paper) + 1
+                    paper.append(question)
+            if student and not shortfall:
+                now = time.time()
+                conn.executemany("INSERT OR IGNORE INTO served (student, question_id, served_at) VALUES (?, ?, ?)",
+                                 [(student, q['id'], now) for q in paper])
+        for question in paper:
+            question.pop('id')
+        return paper, shortfall
+
+    def claim(self, questions: List[dict], student: str) -> bool:
+        """
+        Records a ready-made paper's questions as served to `student`, unless
+        they have already seen one of them. Questions not in the bank are ignored.
+
+        Returns:
+            bool: False (and nothing recorded) when the paper would repeat a question.
+        """
+        hashes = [question_hash(q) for q in questions]
+        if not hashes:
+            return True
+        with self._connection() as conn:
+            ids = [row['id'] for row in conn.execute(
+                f"SELECT id FROM questions WHERE content_hash IN ({','.join('?' * len(hashes))})", hashes)]
+            if not ids:
+                return True
+            marks = ','.join('?' * len(ids))
+            seen = conn.execute(f"SELECT 1 FROM served WHERE student = ? AND question_id IN ({marks}) LIMIT 1",
+                                [student] + ids).fetchone()
+            if seen:
+                return False
+            now = time.time()
+            conn.executemany("INSERT OR IGNORE INTO served (student, question_id, served_at) VALUES (?, ?, ?)",
+                             [(student, question_id, now) for question_id in ids])
+        return True
+
+    @staticmethod
+    def _to_question(row) -> dict:
+        question = {
+            'id': row['id'],
+            'question_number': row['id'],
+            'question': row['question'],
+            'answer': row['answer'],
+            'solution': row['solution'],
+        }
+        if row['options_json']:
+            question['options'] = json.loads(row['options_json'])
+        if row['subject'] and not row['exam'].startswith("SCHOOL"):
+            # Competitive papers span several subjects; extract_and_convert groups sections by it
+            question['subject'] = row['subject'].title()
+        return question
+
+
+question_bank = QuestionBank()
+
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) > 2 and sys.argv[1] == "ingest":
+        from src.generate_paper import SHARD_PLANS
+        question_bank.ingest_directory(sys.argv[2], subject_plans=SHARD_PLANS)
+    elif len(sys.argv) > 2 and sys.argv[1] == "search":
+        for q in question_bank.search(" ".join(sys.argv[2:])):
+            print(f"- {q['question']}")
+    else:
+        print("Usage: python -m src.question_bank ingest <dir> | search <text>")
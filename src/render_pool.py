@@ -0,0 +1,230 @@
+import os
+import json
+import time
+import shutil
+import zipfile
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout, FIRST_COMPLETED, wait
+from src.pdf_cache import pdf_cache, RENDERERS
+from src.variants import apply_variant
+
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Worker processes are spawned rather than forked: the web process runs threads (job queue, paper pool)
+RENDER_START_METHOD = os.getenv("RENDER_START_METHOD", "spawn")
+# How long a download waits on a queued render before rendering inline itself
+RENDER_WAIT_SECONDS = float(os.getenv("RENDER_WAIT_SECONDS", "60"))
+RENDER_PREFETCH = os.getenv("RENDER_PREFETCH", "1") == "1"
+# Print pack renders queued at once; a class-sized pack is fed in as they finish so pre-renders are not stuck behind it
+PRINT_PACK_WINDOW = int(os.getenv("PRINT_PACK_WINDOW", str(RENDER_WORKERS)))
+
+
+def render_document(json_path, kind, output_path):
+    """
+    Renders one document in a worker process; written to a temporary file and
+    moved into place so the cache never sees a partial PDF.
+
+    Returns:
+        tuple: (output_path, render seconds, size in bytes).
+    """
+    started = time.perf_counter()
+    with open(json_path, 'r', encoding='utf-8') as f:
+        questions = json.load(f)
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    RENDERERS[kind](questions, tmp_path)
+    os.replace(tmp_path, output_path)
+    return output_path, time.perf_counter() - started, os.path.getsize(output_path)
+
+
+def render_student_paper(json_path, kind, output_path, header, variant):
+    """
+    Renders one student's copy of a paper (their variant, their name in the header) in a worker process.
+    """
+    with open(json_path, 'r', encoding='utf-8') as f:
+        questions = apply_variant(json.load(f), variant)
+    RENDERERS[kind](questions, output_path, header=header)
+    return output_path
+
+
+class _ZipChunks:
+    """
+    Write-only sink for zipfile: written bytes are collected until the
+    response generator drains them, so the archive is never held whole.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class RenderPool:
+    """
+    Pre-renders offline papers into the PDF cache on worker processes as soon
+    as they are generated, so a download finds the PDF ready (or waits on the
+    render already in flight) instead of rendering in the request thread.
+    The same workers render classroom print packs.
+    """
+
+    def __init__(self, workers=RENDER_WORKERS, enabled=RENDER_PREFETCH):
+        self.workers = workers
+        self.enabled = enabled
+        self._executor = None
+        self._executor_pid = None
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.render_seconds = 0.0
+        self.max_render_seconds = 0.0
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                context = multiprocessing.get_context(RENDER_START_METHOD)
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    def submit(self, json_path, kinds=('questions', 'answers')):
+        """
+        Queues the paper's documents that are not cached or already being rendered.
+        """
+        if not self.enabled or not json_path or not os.path.exists(json_path):
+            return
+        digest = pdf_cache.content_hash(json_path)
+        for kind in kinds:
+            key = (digest, kind)
+            output_path = pdf_cache.artifact_path(digest, kind)
+            with self._lock:
+                if key in self._in_flight or os.path.exists(output_path):
+                    continue
+            future = self._get_executor().submit(render_document, os.path.abspath(json_path), kind, output_path)
+            with self._lock:
+                self._in_flight[key] = future
+                self.submitted += 1
+            future.add_done_callback(lambda f, key=key: self._done(key, f))
+
+    def _done(self, key, future):
+        with self._lock:
+            self._in_flight.pop(key, None)
+            try:
+                _, elapsed, size = future.result()
+            except Exception as e:
+                self.failed += 1
+                print(f"Pre-render of {key[1]} PDF {key[0][:12]} failed: {e}")
+                return
+            self.completed += 1
+            self.render_seconds += elapsed
+            self.max_render_seconds = max(self.max_render_seconds, elapsed)
+        pdf_cache.account(size)
+
+    def wait(self, json_path, kind, timeout=RENDER_WAIT_SECONDS):
+        """
+        Blocks until an in-flight render of the document finishes (or `timeout`
+        passes). Returns immediately when nothing is queued for it.
+        """
+        with self._lock:
+            future = self._in_flight.get((pdf_cache.content_hash(json_path), kind))
+        if future is None:
+            return
+        try:
+            future.result(timeout=timeout)
+        except FutureTimeout:
+            print(f"Pre-render of {kind} PDF still queued after {timeout}s; rendering inline")
+        except Exception:
+            pass
+
+    def print_pack(self, json_path, students, include_answers=False, window=PRINT_PACK_WINDOW):
+        """
+        Renders every student's paper on the worker processes and streams them
+        into a zip as they finish. Each PDF is written to a temporary file,
+        copied into the archive and deleted, so memory holds one chunk at a time.
+        Only `window` renders are queued at once, so pre-renders submitted
+        meanwhile wait behind a few of them rather than the whole pack.
+
+        Renders that fail are listed in a FAILED.txt at the end of the archive;
+        the response is already streaming by then, so it cannot be failed instead.
+
+        Args:
+            json_path (str): The assignment's paper.
+            students (list): (filename, header, variant) per student; variant may be None.
+            include_answers (bool): Also add each student's answer sheet (answers follow their variant).
+            window (int): Most renders queued on the workers at once.
+
+        Yields:
+            bytes: Pieces of the zip archive.
+        """
+        json_path = os.path.abspath(json_path)
+        kinds = ('questions', 'answers') if include_answers else ('questions',)
+        work_dir = tempfile.mkdtemp(prefix="print_pack_")
+        sink = _ZipChunks()
+        renders = enumerate([
+            (f"{filename}.pdf" if kind == 'questions' else f"answers/{filename}_answers.pdf", kind, header, variant)
+            for filename, header, variant in students for kind in kinds
+        ])
+        futures = {}
+        failed = []
+        try:
+            with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+                while True:
+                    for index, (arcname, kind, header, variant) in renders:
+                        output_path = os.path.join(work_dir, f"{index}.pdf")
+                        future = self._get_executor().submit(render_student_paper, json_path, kind, output_path, header, variant)
+                        futures[future] = arcname
+                        if len(futures) >= max(1, window):
+                            break
+                    if not futures:
+                        break
+                    done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        arcname = futures.pop(future)
+                        try:
+                            output_path = future.result()
+                        except Exception as e:
+                            print(f"Print pack render of {arcname} failed: {e}")
+                            failed.append(f"{arcname}: {' '.join(str(e).split())}")
+                            continue
+                        archive.write(output_path, arcname)
+                        os.remove(output_path)
+                    yield sink.drain()
+                if failed:
+                    archive.writestr("FAILED.txt", "These papers could not be rendered; download the pack again "
+                                                   "or print them separately:\n" + "\n".join(failed) + "\n")
+            yield sink.drain()
+        finally:
+            # A client that disconnects mid-download leaves renders queued; drop them
+            for future in futures:
+                future.cancel()
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    def stats(self):
+        with self._lock:
+            queued = sum(1 for f in self._in_flight.values() if not f.running())
+            return {
+                'queue_depth': queued,
+                'in_flight': len(self._in_flight),
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'failed': self.failed,
+                'render_seconds': self.render_seconds,
+                'avg_render_seconds': self.render_seconds / self.completed if self.completed else 0.0,
+                'max_render_seconds': self.max_render_seconds,
+                'workers': self.workers,
+            }
+
+
+render_pool = RenderPool()
@@ -3,7 +3,6 @@ import re
 import io
 import json
 from typing import List
-from google import genai
 from pydantic import BaseModel
 from datetime import datetime
 from fpdf import FPDF
@@ -12,6 +11,7 @@ from google.genai import types
 import httpx
 import pathlib
 from dotenv import load_dotenv
+from src.llm_backend import get_backend
 
 load_dotenv()
 
@@ -29,11 +29,6 @@ class SchoolTestFormat(BaseModel):
 
 model = "gemini-2.5-flash-lite"
 
-api_key = os.getenv("GEMINI_API_KEY")
-
-client = genai.Client(api_key=api_key)
-print("API KEY LOADED")
-
 SUBJECTS = ['BIOLOGY', 'CHEMISTRY', 'ENGLISH', 'MATHEMATICS', 'PHYSICS', 'SOCIAL_SCIENCE']
 GRADE = ['9', '10', '11', '12']
 BOARD = ['CBSE', 'ICSE', 'STATE','TSBIE']
@@ -69,11 +64,11 @@ def generate_school_quiz(subject: str, grade: str, board: str, chapters: List[st
             print(f"Resolved PDF path: {pdf_path}")
             if os.path.exists(pdf_path):
                 chapter_file = pathlib.Path(pdf_path)
-                uploaded_file = client.files.upload(file=chapter_file)
+                uploaded_file = get_backend().upload(chapter_file)
                 content = content + [uploaded_file]
             else:
                 print(f"File not found: {pdf_path}")
-        response = client.models.generate_content(
+        response = get_backend().generate(
                 model=model,
                 contents= content,
                 config={
@@ -109,11 +104,11 @@ def generate_school_test(subject: str, grade: str, board: str, chapters: List[st
             print(f"Resolved PDF path: {pdf_path}")
             if os.path.exists(pdf_path):
                 chapter_file = pathlib.Path(pdf_path)
-                uploaded_file = client.files.upload(file=chapter_file)
+                uploaded_file = get_backend().upload(chapter_file)
                 content = content + [uploaded_file]
             else:
                 print(f"File not found: {pdf_path}")
-        response = client.models.generate_content(
+        response = get_backend().generate(
                 model=model,
                 contents= content,
                 config={
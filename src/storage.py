@@ -0,0 +1,199 @@
+import os
+import sys
+import time
+import sqlite3
+import hashlib
+import argparse
+from datetime import datetime
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Kept relative (as before) so stored Assignment.json_path values stay valid
+GENERATED_JSON_DIR = os.getenv("GENERATED_JSON_DIR", os.path.join("GENERATED_PAPERS", "JSON"))
+PAPERS_DIR = os.getenv("PAPERS_DIR", "PAPERS")
+USERS_DB_PATH = os.getenv("USERS_DB_PATH", os.path.join(BASE_DIR, "instance", "users.db"))
+# Unreferenced papers older than this are removed by the retention sweep
+PAPER_RETENTION_DAYS = float(os.getenv("PAPER_RETENTION_DAYS", "30"))
+
+EXAM_DIRS = {
+    "JEE_MAINS": "MAINS",
+    "JEE_ADVANCED": "ADVANCED",
+    "NEET_UG": "NEET",
+    "SCHOOL_QUIZ": os.path.join("SCHOOL", "QUIZ"),
+    "SCHOOL_TEST": os.path.join("SCHOOL", "TEST"),
+}
+PDF_SUFFIXES = ("_questions.pdf", "_answers.pdf")
+
+
+def shard_path(root: str, exam_dir: str, filename: str, when: datetime = None) -> str:
+    """
+    Returns <root>/<exam_dir>/<YYYY-MM>/<2 hex chars>/<filename>, creating the directory.
+
+    A month directory holds at most 256 shards, so no directory grows without
+    bound and a month can be backed up or dropped as a unit.
+    """
+    month = (when or datetime.now()).strftime("%Y-%m")
+    shard = hashlib.sha1(filename.encode('utf-8')).hexdigest()[:2]
+    directory = os.path.join(root, exam_dir, month, shard)
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, filename)
+
+
+def paper_json_path(exam_upper: str, filename: str) -> str:
+    return shard_path(GENERATED_JSON_DIR, EXAM_DIRS.get(exam_upper, "MISC"), filename)
+
+
+def pdf_dir_for(json_path: str) -> str:
+    """
+    PDFs mirror their JSON's place in the layout, e.g. GENERATED_PAPERS/JSON/NEET/2025-01/ab/x.json
+    renders into PAPERS/NEET/2025-01/ab/. Papers outside the JSON root go by exam directory name.
+    """
+    relative = os.path.relpath(os.path.dirname(os.path.abspath(json_path)), os.path.abspath(GENERATED_JSON_DIR))
+    if not relative.startswith(os.pardir):
+        directory = os.path.join(PAPERS_DIR, relative)
+    else:
+        parts = os.path.normpath(json_path).split(os.sep)
+        exam_dir = next((c for c in ("MAINS", "ADVANCED", "NEET") if c in parts), "MISC")
+        directory = os.path.join(PAPERS_DIR, exam_dir)
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def exam_of(path: str, root: str) -> str:
+    relative = os.path.relpath(path, root).split(os.sep)
+    if relative[0] == "SCHOOL" and len(relative) > 2:
+        return os.path.join(*relative[:2])
+    return relative[0] if len(relative) > 1 else "MISC"
+
+
+def walk_files(root: str, suffixes):
+    if not os.path.isdir(root):
+        return
+    for directory, _, files in os.walk(root):
+        for filename in files:
+            if filename.endswith(suffixes):
+                yield os.path.join(directory, filename)
+
+
+class SweepAborted(RuntimeError):
+    """The assignments could not be read, so nothing can safely be deleted."""
+
+
+def referenced_papers(db_path: str = USERS_DB_PATH) -> set:
+    """
+    Absolute paths of every paper an assignment points at; these are never aged out.
+
+    Raises:
+        SweepAborted: The database is missing or has no readable assignment table.
+            An empty set would let the sweep delete papers that are still assigned.
+    """
+    if not os.path.exists(db_path):
+        raise SweepAborted(f"Users database {db_path} not found (set USERS_DB_PATH)")
+    try:
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        try:
+            rows = conn.execute("SELECT json_path FROM assignment").fetchall()
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        raise SweepAborted(f"Could not read assignments from {db_path}: {e}") from e
+    # Stored paths are relative to the app's working directory, like GENERATED_JSON_DIR
+    return {os.path.abspath(path) for (path,) in rows if path}
+
+
+def _remove(path: str, dry_run: bool) -> int:
+    try:
+        size = os.path.getsize(path)
+        if not dry_run:
+            os.remove(path)
+        return size
+    except OSError as e:
+        print(f"Could not remove {path}: {e}")
+        return 0
+
+
+def _prune_empty_dirs(root: str):
+    for directory, _, _ in sorted(os.walk(root), key=lambda entry: -len(entry[0])):
+        if directory != root and not os.listdir(directory):
+            os.rmdir(directory)
+
+
+def sweep(max_age_days: float = PAPER_RETENTION_DAYS, dry_run: bool = False, db_path: str = USERS_DB_PATH) -> dict:
+    """
+    Deletes generated papers (and their PDFs) older than `max_age_days` that no
+    assignment references, then PDFs whose JSON is gone. Nothing is deleted
+    when the assignments cannot be read (see referenced_papers).
+
+    Returns:
+        dict: Counts of removed papers and PDFs and the bytes freed.
+    """
+    cutoff = time.time() - max_age_days * 86400
+    keep = referenced_papers(db_path)
+    removed = {'papers': 0, 'pdfs': 0, 'bytes': 0, 'kept_referenced': 0}
+    live_names = set()
+
+    for path in walk_files(GENERATED_JSON_DIR, (".json",)):
+        base_name = os.path.splitext(os.path.basename(path))[0]
+        if os.path.abspath(path) in keep:
+            removed['kept_referenced'] += 1
+            live_names.add(base_name)
+        elif os.path.getmtime(path) < cutoff:
+            removed['bytes'] += _remove(path, dry_run)
+            removed['papers'] += 1
+        else:
+            live_names.add(base_name)
+
+    for path in walk_files(PAPERS_DIR, PDF_SUFFIXES):
+        filename = os.path.basename(path)
+        base_name = next(filename[:-len(s)] for s in PDF_SUFFIXES if filename.endswith(s))
+        if base_name not in live_names and os.path.getmtime(path) < cutoff:
+            removed['bytes'] += _remove(path, dry_run)
+            removed['pdfs'] += 1
+
+    if not dry_run:
+        for root in (GENERATED_JSON_DIR, PAPERS_DIR):
+            if os.path.isdir(root):
+                _prune_empty_dirs(root)
+    print(f"{'Would remove' if dry_run else 'Removed'} {removed['papers']} paper(s) and {removed['pdfs']} PDF(s), "
+          f"{removed['bytes'] / 1e6:.1f} MB; kept {removed['kept_referenced']} assigned paper(s)")
+    return removed
+
+
+def usage_report() -> dict:
+    """
+    Returns {exam: {'papers', 'paper_bytes', 'pdfs', 'pdf_bytes'}} for everything on disk.
+    """
+    report = {}
+    empty = {'papers': 0, 'paper_bytes': 0, 'pdfs': 0, 'pdf_bytes': 0}
+    for root, suffixes, count, size in ((GENERATED_JSON_DIR, (".json",), 'papers', 'paper_bytes'),
+                                        (PAPERS_DIR, PDF_SUFFIXES, 'pdfs', 'pdf_bytes')):
+        for path in walk_files(root, suffixes):
+            entry = report.setdefault(exam_of(path, root), dict(empty))
+            entry[count] += 1
+            entry[size] += os.path.getsize(path)
+    return report
+
+
+def print_report(report: dict):
+    print(f"{'exam':<16}{'papers':>8}{'JSON MB':>10}{'PDFs':>8}{'PDF MB':>10}")
+    for exam, entry in sorted(report.items()):
+        print(f"{exam:<16}{entry['papers']:>8}{entry['paper_bytes'] / 1e6:>10.1f}"
+              f"{entry['pdfs']:>8}{entry['pdf_bytes'] / 1e6:>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Disk usage and retention for generated papers.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("report", help="Disk usage by exam type")
+    sweep_parser = commands.add_parser("sweep", help="Delete unassigned papers past the retention age")
+    sweep_parser.add_argument("--days", type=float, default=PAPER_RETENTION_DAYS)
+    sweep_parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    if args.command == "report":
+        print_report(usage_report())
+    else:
+        try:
+            sweep(args.days, dry_run=args.dry_run)
+        except SweepAborted as e:
+            print(f"Sweep aborted, nothing was deleted: {e}")
+            sys.exit(1)
+    sys.exit(0)
@@ -0,0 +1,133 @@
+import os
+import sqlite3
+import threading
+from typing import Iterator, Optional
+from src.upload_cache import file_sha256
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEXT_STORE_PATH = os.getenv("TEXT_STORE_PATH", os.path.join(BASE_DIR, "instance", "text_store.db"))
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS documents (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    page_count INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS pages (
+    sha256 TEXT NOT NULL,
+    page_no INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    PRIMARY KEY (sha256, page_no)
+);
+'''
+
+
+class TextStore:
+    """
+    Persistent page-level store of text extracted from PDFs.
+
+    Pages are keyed by the file's content hash and extracted on first use, so
+    callers only pay for the pages they read. A changed file (new mtime/size)
+    is re-hashed; if its content really changed, every page is extracted
+    again under the new hash as it is read, and the old hash's pages are
+    dropped once no other path uses them.
+    """
+
+    def __init__(self, path=TEXT_STORE_PATH):
+        self.path = path
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # The database is created on first use, not when the module is imported
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def document(self, pdf_path: str):
+        """
+        Returns (sha256, page_count) for a PDF, re-hashing only when its mtime or size changed.
+        """
+        pdf_path = os.path.abspath(pdf_path)
+        stat = os.stat(pdf_path)
+        conn = self._connect()
+        row = conn.execute("SELECT mtime_ns, size, sha256, page_count FROM documents WHERE path = ?",
+                           (pdf_path,)).fetchone()
+        if row and row[0] == stat.st_mtime_ns and row[1] == stat.st_size:
+            return row[2], row[3]
+
+        digest = file_sha256(pdf_path)
+        if row and row[2] == digest:
+            page_count = row[3]
+        else:
+            from PyPDF2 import PdfReader
+            page_count = len(PdfReader(pdf_path).pages)
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO documents (path, mtime_ns, size, sha256, page_count) "
+                         "VALUES (?, ?, ?, ?, ?)", (pdf_path, stat.st_mtime_ns, stat.st_size, digest, page_count))
+            if row and row[2] != digest:
+                still_used = conn.execute("SELECT 1 FROM documents WHERE sha256 = ?", (row[2],)).fetchone()
+                if not still_used:
+                    conn.execute("DELETE FROM pages WHERE sha256 = ?", (row[2],))
+        return digest, page_count
+
+    def store_pages(self, digest: str, pages):
+        """
+        Stores already-extracted (page_no, text) pairs for a document hash.
+        """
+        conn = self._connect()
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO pages (sha256, page_no, text) VALUES (?, ?, ?)",
+                             ((digest, page_no, text) for page_no, text in pages))
+
+    def missing_pages(self, digest: str, page_count: int) -> list:
+        """
+        Page numbers of a document that have not been extracted yet.
+        """
+        conn = self._connect()
+        stored = {row[0] for row in conn.execute("SELECT page_no FROM pages WHERE sha256 = ?", (digest,))}
+        return [page_no for page_no in range(page_count) if page_no not in stored]
+
+    def iter_pages(self, pdf_path: str, start: int = 0, stop: Optional[int] = None) -> Iterator[str]:
+        """
+        Lazily yields the text of pages [start, stop) of a PDF.
+
+        Stored pages are read from the store; missing pages are extracted with
+        PyPDF2 (opening the PDF only if needed) and stored as they are read.
+        """
+        digest, page_count = self.document(pdf_path)
+        stop = page_count if stop is None else min(stop, page_count)
+        conn = self._connect()
+        reader = None
+        for page_no in range(start, stop):
+            row = conn.execute("SELECT text FROM pages WHERE sha256 = ? AND page_no = ?",
+                               (digest, page_no)).fetchone()
+            if row is not None:
+                yield row[0]
+                continue
+            if reader is None:
+                from PyPDF2 import PdfReader
+                reader = PdfReader(pdf_path)
+            try:
+                text = reader.pages[page_no].extract_text() or ""
+            except Exception as e:
+                print(f"Error extracting page {page_no} of {pdf_path}: {e}")
+                text = ""
+            self.store_pages(digest, [(page_no, text)])
+            yield text
+
+    def get_page(self, pdf_path: str, page_no: int) -> str:
+        return next(self.iter_pages(pdf_path, page_no, page_no + 1), "")
+
+    def get_text(self, pdf_path: str) -> str:
+        return "".join(self.iter_pages(pdf_path))
+
+
+text_store = TextStore()
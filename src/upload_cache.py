@@ -0,0 +1,207 @@
+import os
+import json
+import uuid
+import hashlib
+import threading
+import weakref
+from datetime import datetime, timedelta, timezone
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+UPLOAD_CACHE_PATH = os.getenv("UPLOAD_CACHE_PATH", os.path.join(BASE_DIR, "instance", "upload_cache.json"))
+
+# Gemini keeps uploaded files for 48 hours; re-upload a while before that so a
+# handle never expires in the middle of a generation request.
+DEFAULT_FILE_TTL = timedelta(hours=48)
+UPLOAD_REFRESH_MARGIN = timedelta(minutes=int(os.getenv("UPLOAD_REFRESH_MARGIN_MINUTES", "360")))
+
+
+def _utcnow():
+    return datetime.now(timezone.utc)
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    """
+    Returns the hex SHA-256 digest of a file's content, read in chunks.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class LocalFileAPI:
+    """
+    In-memory stand-in for `client.files` used in tests and offline runs.
+    Mirrors the parts of the Gemini file API the upload cache relies on.
+
+    Its handles only exist in this process, so unless `persistent` is set
+    the upload cache keeps them out of the registry on disk.
+    """
+
+    def __init__(self, ttl=DEFAULT_FILE_TTL, persistent=False):
+        self.ttl = ttl
+        self.persistent = persistent
+        self.files = {}
+        self.upload_calls = 0
+
+    def upload(self, file, config=None):
+        from google.genai import types
+        self.upload_calls += 1
+        path = str(file)
+        name = f"files/{uuid.uuid4().hex[:12]}"
+        uploaded = types.File(
+            name=name,
+            uri=f"local://{name}",
+            mime_type="application/pdf" if path.lower().endswith(".pdf") else "application/octet-stream",
+            size_bytes=os.path.getsize(path),
+            expiration_time=_utcnow() + self.ttl,
+        )
+        self.files[name] = uploaded
+        return uploaded
+
+    def get(self, name, config=None):
+        if name not in self.files:
+            raise KeyError(f"File {name} not found")
+        return self.files[name]
+
+    def delete(self, name, config=None):
+        self.files.pop(name, None)
+
+
+class UploadCache:
+    """
+    Persistent registry of uploaded files keyed by content hash.
+
+    A file is only uploaded again when its content changes or the remote
+    handle is about to expire, so repeated generations from the same textbook
+    reuse one upload. Handles from a non-persistent file API (the stub
+    backend's) are kept in memory per API and never written to the registry.
+    """
+
+    def __init__(self, registry_path=UPLOAD_CACHE_PATH, refresh_margin=UPLOAD_REFRESH_MARGIN):
+        self.registry_path = registry_path
+        self.refresh_margin = refresh_margin
+        self._lock = threading.Lock()
+        self._digest_locks = {}
+        self._digests = {}
+        self._entries = self._load()
+        self._local = weakref.WeakKeyDictionary()
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.bytes_uploaded = 0
+        self.bytes_saved = 0
+
+    def _load(self):
+        try:
+            with open(self.registry_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.registry_path) or ".", exist_ok=True)
+        tmp_path = f"{self.registry_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._entries, f, indent=2)
+        os.replace(tmp_path, self.registry_path)
+
+    def _registry(self, files_api):
+        if getattr(files_api, 'persistent', True):
+            return self._entries
+        return self._local.setdefault(files_api, {})
+
+    def _digest(self, path):
+        # Hashing a whole textbook is cheap next to uploading it, but still
+        # worth skipping while the file on disk is unchanged.
+        stat = os.stat(path)
+        key = (path, stat.st_mtime_ns, stat.st_size)
+        digest = self._digests.get(key)
+        if digest is None:
+            digest = file_sha256(path)
+            self._digests[key] = digest
+        return digest
+
+    def _is_fresh(self, entry):
+        expires_at = datetime.fromisoformat(entry['expiration_time'])
+        return expires_at - self.refresh_margin > _utcnow()
+
+    @staticmethod
+    def _to_file(entry):
+        from google.genai import types
+        return types.File(
+            name=entry['name'],
+            uri=entry['uri'],
+            mime_type=entry['mime_type'],
+            size_bytes=entry['size_bytes'],
+            expiration_time=datetime.fromisoformat(entry['expiration_time']),
+        )
+
+    def upload(self, files_api, path):
+        """
+        Returns a remote file handle for `path`, uploading only on a cache miss.
+
+        Args:
+            files_api: The file API to upload with (`client.files` or LocalFileAPI).
+            path (str | pathlib.Path): Local file to upload.
+
+        Returns:
+            types.File: Handle usable directly in `generate_content` contents.
+        """
+        path = os.path.abspath(str(path))
+        digest = self._digest(path)
+        with self._lock:
+            digest_lock = self._digest_locks.setdefault(digest, threading.Lock())
+            entries = self._registry(files_api)
+
+        with digest_lock:
+            with self._lock:
+                entry = entries.get(digest)
+                if entry and self._is_fresh(entry):
+                    self.hits += 1
+                    self.bytes_saved += entry['size_bytes']
+                    entry['path'] = path
+                    self._report("hit", path)
+                    return self._to_file(entry)
+                if entry:
+                    self.refreshes += 1
+
+            uploaded = files_api.upload(file=path)
+            size_bytes = uploaded.size_bytes or os.path.getsize(path)
+            expiration_time = uploaded.expiration_time or (_utcnow() + DEFAULT_FILE_TTL)
+            with self._lock:
+                self.misses += 1
+                self.bytes_uploaded += size_bytes
+                entries[digest] = {
+                    'name': uploaded.name,
+                    'uri': uploaded.uri,
+                    'mime_type': uploaded.mime_type,
+                    'size_bytes': size_bytes,
+                    'expiration_time': expiration_time.isoformat(),
+                    'path': path,
+                }
+                if entries is self._entries:
+                    self._save()
+                self._report("miss", path)
+            return uploaded
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'refreshes': self.refreshes,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'bytes_uploaded': self.bytes_uploaded,
+            'bytes_saved': self.bytes_saved,
+            'entries': len(self._entries) + sum(len(entries) for entries in self._local.values()),
+        }
+
+    def _report(self, outcome, path):
+        stats = self.stats()
+        print(f"Upload cache {outcome} for {os.path.basename(path)} "
+              f"(hit rate {stats['hit_rate']:.1%}, {stats['bytes_saved'] / 1e6:.1f} MB saved)")
+
+
+upload_cache = UploadCache()
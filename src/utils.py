@@ -2,8 +2,10 @@ import os
 import re
 import json
 from typing import List
-from fpdf import FPDF
-from PyPDF2 import PdfReader
+from src.text_store import text_store
+from src.answer_key import AnswerKey
+from src.storage import pdf_dir_for
+from src.pdf_fonts import new_document, register_fonts, family_for
 
 def load_papers(directory: str) -> List[str]:
     papers = []
@@ -18,12 +20,8 @@ def load_papers(directory: str) -> List[str]:
                     print(f"Error reading text file {filename}: {e}")
             elif filename.endswith(".pdf"):
                 try:
-                    reader = PdfReader(file_path)
-                    text = ""
-                    for page in reader.pages:
-                        page_text = page.extract_text() or ""
-                        text += page_text
-                    papers.append(text)
+                    # Page text comes from the persistent store; only new or changed PDFs are parsed
+                    papers.append(text_store.get_text(file_path))
                 except Exception as e:
                     print(f"Error reading PDF {filename}: {e}")
         print(f"Loaded {len(papers)} papers")
@@ -347,7 +345,7 @@ def check_online_paper(generated_paper_filepath: str, submitted_answer_sheet_fil
             ...
         }
     Keys can be either strings or integers representing question_number.
-    Values are the submitted answers (option letter or numerical value).
+    Values are the submitted answers (option letter or text, or numerical value).
     """
     # Check if generated paper file exists
     if not os.path.exists(generated_paper_filepath):
@@ -366,23 +364,8 @@ def check_online_paper(generated_paper_filepath: str, submitted_answer_sheet_fil
     with open(generated_paper_filepath, 'r') as f:
         generated_paper = json.load(f)
 
-    score = 0
-    results = []
-
-    # Compare answers for each question
-    for question in generated_paper:
-        q_num = question.get('question_number')
-        correct_answer = question.get('answer')
-        submitted_answer = submitted_answers.get(str(q_num)) or submitted_answers.get(q_num)
-        is_correct = (str(submitted_answer).strip().lower() == str(correct_answer).strip().lower())
-        results.append({
-            'question_number': q_num,
-            'correct_answer': correct_answer,
-            'submitted_answer': submitted_answer,
-            'is_correct': is_correct
-        })
-        if is_correct:
-            score += 1
+    graded = AnswerKey(generated_paper).grade(submitted_answers)
+    score, results = graded['score'], graded['results']
 
     # Print summary
     print(f"Total Questions: {len(generated_paper)}")
@@ -392,22 +375,21 @@ def check_online_paper(generated_paper_filepath: str, submitted_answer_sheet_fil
         print(
             f"Q{res['question_number']}: Submitted: {res['submitted_answer']} | Correct: {res['correct_answer']} | {'Correct' if res['is_correct'] else 'Incorrect'}")
 
-    return {
-        'score': score,
-        'total': len(generated_paper),
-        'results': results
-    }
+    return graded
 
-def clean_text(text):
+def clean_text(text, keep_unicode=False):
         """
         Cleans and replaces special characters in the text for better readability.
 
         Args:
             text (str): Input text.
+            keep_unicode (bool): Keep non-ASCII text as is, for PDFs rendered with Unicode fonts.
 
         Returns:
             str: Cleaned text.
         """
+        if keep_unicode:
+            return text
         replacements = {
             '√': 'sqrt', '±': '+/-', '°': ' degrees', '×': 'x', '÷': '/',
             '≠': '!=', '≤': '<=', '≥': '>=', '∞': 'infinity', 'π': 'pi',
@@ -419,10 +401,98 @@ def clean_text(text):
         text = re.sub(r'[^\x00-\x7F]+', '', text)
         return text
 
+def group_by_subject(data: List[dict]) -> dict:
+    subjects = {}
+    for item in data:
+        subject = item.get('subject', 'General')
+        subjects.setdefault(subject, []).append(item)
+    return subjects
+
+def _set_font(pdf, unicode_fonts: bool, style: str, size: int, text: str = ''):
+    if unicode_fonts:
+        pdf.set_font(family_for(text, bold='B' in style), '', size)
+    else:
+        pdf.set_font("Arial", style, size)
+
+def _multi_cell(pdf, h: int, text: str):
+    # fpdf2 leaves x at the right edge after a multi_cell where fpdf 1.7 returns to the margin
+    pdf.multi_cell(0, h, text)
+    pdf.set_x(pdf.l_margin)
+
+def _new_pdf():
+    pdf = new_document()
+    unicode_fonts = register_fonts(pdf)
+    pdf.add_page()
+    return pdf, unicode_fonts
+
+def render_question_paper(data: List[dict], output_path: str, header: str = None) -> str:
+    """
+    Renders the question paper PDF for a list of questions to `output_path`,
+    with an optional line (e.g. the student's name) under the title.
+    Uses the Unicode fonts from src.pdf_fonts when available.
+    """
+    question_pdf, unicode_fonts = _new_pdf()
+    _set_font(question_pdf, unicode_fonts, 'B', 16)
+    question_pdf.cell(0, 12, txt="Question Paper", ln=True, align='C')
+    if header:
+        _set_font(question_pdf, unicode_fonts, '', 12, header)
+        question_pdf.cell(0, 8, txt=clean_text(header, unicode_fonts), ln=True, align='C')
+    question_pdf.ln(8)
+
+    # Add questions to PDF, grouped by subject
+    for subject, questions in group_by_subject(data).items():
+        _set_font(question_pdf, unicode_fonts, 'B', 14, subject)
+        question_pdf.cell(0, 10, txt=f"{clean_text(subject, unicode_fonts)} Section", ln=True)
+        question_pdf.ln(2)
+        for item in questions:
+            question_text = clean_text(item['question'], unicode_fonts)
+            _set_font(question_pdf, unicode_fonts, '', 12, question_text)
+            _multi_cell(question_pdf, 10, f"Q{item['question_number']}: {question_text}")
+            if 'options' in item and item['options']:
+                for idx, opt in enumerate(item['options']):
+                    option_text = clean_text(opt, unicode_fonts)
+                    _set_font(question_pdf, unicode_fonts, '', 12, option_text)
+                    _multi_cell(question_pdf, 8, f"    {chr(65 + idx)}. {option_text}")
+            question_pdf.ln(4)
+        question_pdf.ln(6)
+
+    question_pdf.output(output_path)
+    return output_path
+
+def render_answer_sheet(data: List[dict], output_path: str, header: str = None) -> str:
+    """
+    Renders the answer sheet PDF for a list of questions to `output_path`,
+    with an optional line under the title.
+    """
+    answer_pdf, unicode_fonts = _new_pdf()
+    _set_font(answer_pdf, unicode_fonts, 'B', 16)
+    answer_pdf.cell(0, 12, txt="Answer Sheet", ln=True, align='C')
+    if header:
+        _set_font(answer_pdf, unicode_fonts, '', 12, header)
+        answer_pdf.cell(0, 8, txt=clean_text(header, unicode_fonts), ln=True, align='C')
+    answer_pdf.ln(8)
+
+    # Add answers to PDF, grouped by subject
+    for subject, questions in group_by_subject(data).items():
+        _set_font(answer_pdf, unicode_fonts, 'B', 14, subject)
+        answer_pdf.cell(0, 10, txt=f"{clean_text(subject, unicode_fonts)} Section", ln=True)
+        answer_pdf.ln(2)
+        for item in questions:
+            answer_text = clean_text(str(item['answer']), unicode_fonts)
+            _set_font(answer_pdf, unicode_fonts, '', 12, answer_text)
+            answer_pdf.cell(0, 10, f"Q{item['question_number']}: {answer_text}", ln=True)
+        answer_pdf.ln(6)
+
+    answer_pdf.output(output_path)
+    return output_path
+
 def extract_and_convert(filepath):
         """
         Extracts questions and answers from the JSON file and generates PDFs for the question paper and answer sheet.
 
+        The download routes serve cached renders from src.pdf_cache instead; this
+        renders both documents next to the paper's shard under PAPERS/.
+
         Args:
             filepath (str): Path to the JSON file.
 
@@ -436,73 +506,13 @@ def extract_and_convert(filepath):
         with open(filepath, 'r') as f:
             data = json.load(f)
 
-        # Group questions by subject if available
-        subjects = {}
-        for item in data:
-            subject = item.get('subject', 'General')
-            subjects.setdefault(subject, []).append(item)
-
-        # Determine exam subdirectory from JSON path
-        exam_subdir = "MISC"
-        parts = os.path.normpath(filepath).split(os.sep)
-        for candidate in ("MAINS", "ADVANCED", "NEET"):
-            if candidate in parts:
-                exam_subdir = candidate
-                break
-
-        # Ensure papers output directory exists
-        papers_dir = os.path.join("PAPERS", exam_subdir)
-        os.makedirs(papers_dir, exist_ok=True)
+        # PDFs go into the shard mirroring the JSON's place in the layout
+        papers_dir = pdf_dir_for(filepath)
 
         # Base name for PDFs derived from JSON filename (already unique due to timestamp)
         base_name = os.path.splitext(os.path.basename(filepath))[0]
 
-        # Generate Question Paper PDF
-        question_pdf = FPDF()
-        question_pdf.add_page()
-        question_pdf.set_font("Arial", 'B', 16)
-        question_pdf.cell(0, 12, txt="Question Paper", ln=True, align='C')
-        question_pdf.ln(8)
-
-        # Add questions to PDF, grouped by subject
-        for subject, questions in subjects.items():
-            question_pdf.set_font("Arial", 'B', 14)
-            question_pdf.cell(0, 10, txt=f"{subject} Section", ln=True)
-            question_pdf.set_font("Arial", size=12)
-            question_pdf.ln(2)
-            for item in questions:
-                question_text = clean_text(item['question'])
-                question_pdf.multi_cell(0, 10, f"Q{item['question_number']}: {question_text}")
-                if 'options' in item and item['options']:
-                    for idx, opt in enumerate(item['options']):
-                        option_text = clean_text(opt)
-                        question_pdf.multi_cell(0, 8, f"    {chr(65 + idx)}. {option_text}")
-                question_pdf.ln(4)
-            question_pdf.ln(6)
-
-        question_pdf_path = os.path.join(papers_dir, f"{base_name}_questions.pdf")
-        question_pdf.output(question_pdf_path)
-
-        # Generate Answer Sheet PDF
-        answer_pdf = FPDF()
-        answer_pdf.add_page()
-        answer_pdf.set_font("Arial", 'B', 16)
-        answer_pdf.cell(0, 12, txt="Answer Sheet", ln=True, align='C')
-        answer_pdf.ln(8)
-
-        # Add answers to PDF, grouped by subject
-        for subject, questions in subjects.items():
-            answer_pdf.set_font("Arial", 'B', 14)
-            answer_pdf.cell(0, 10, txt=f"{subject} Section", ln=True)
-            answer_pdf.set_font("Arial", size=12)
-            answer_pdf.ln(2)
-            for item in questions:
-                answer_text = clean_text(str(item['answer']))
-                answer_pdf.cell(0, 10, f"Q{item['question_number']}: {answer_text}", ln=True)
-            answer_pdf.ln(6)
-
-        answer_pdf_path = os.path.join(papers_dir, f"{base_name}_answers.pdf")
-        answer_pdf.output(answer_pdf_path)
+        question_pdf_path = render_question_paper(data, os.path.join(papers_dir, f"{base_name}_questions.pdf"))
+        answer_pdf_path = render_answer_sheet(data, os.path.join(papers_dir, f"{base_name}_answers.pdf"))
 
         return question_pdf_path, answer_pdf_path
-
@@ -0,0 +1,89 @@
+import re
+import random
+import hashlib
+from typing import List, Optional
+
+OPTION_LETTERS = "ABCDEFGHIJ"
+# "B", "(b)", "b.", "Option B"
+LETTER_ANSWER = re.compile(r'^\s*(?:option\s+)?\(?([A-Ja-j])\)?\.?\s*$', re.IGNORECASE)
+
+
+def variant_seed(*parts) -> int:
+    """
+    Stable seed for a student's variant, e.g. variant_seed(assignment_id, user_id).
+    """
+    digest = hashlib.sha256(":".join(str(p) for p in parts).encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big')
+
+
+def make_variant(seed: int, questions: List[dict]) -> dict:
+    """
+    The compact form kept in the session. The question order and option
+    permutations are fully determined by the seed and the paper, so nothing
+    else needs to be stored; `size` guards against applying it to another paper.
+    """
+    return {'seed': seed, 'size': len(questions)}
+
+
+def letter_index(answer, option_count: int) -> Optional[int]:
+    match = LETTER_ANSWER.match(str(answer))
+    if not match:
+        return None
+    index = OPTION_LETTERS.index(match.group(1).upper())
+    return index if index < option_count else None
+
+
+def permutations(variant: dict, questions: List[dict]):
+    """
+    Returns (order, option_orders): the new question order and, per original
+    question, the new order of its options.
+
+    Questions are only shuffled within their subject so sectioned papers
+    (Physics/Chemistry/...) keep their sections.
+    """
+    rng = random.Random(variant['seed'])
+    sections = {}
+    for index, question in enumerate(questions):
+        sections.setdefault(question.get('subject'), []).append(index)
+    order = []
+    for indexes in sections.values():
+        indexes = list(indexes)
+        rng.shuffle(indexes)
+        order.extend(indexes)
+    option_orders = []
+    for question in questions:
+        option_order = list(range(len(question.get('options') or [])))
+        rng.shuffle(option_order)
+        option_orders.append(option_order)
+    return order, option_orders
+
+
+def apply_variant(questions: List[dict], variant: Optional[dict]) -> List[dict]:
+    """
+    Returns the student's version of a paper: questions reordered and
+    renumbered, options shuffled and letter answers ("B", "(b)") remapped.
+    Answers given as option text move with their option. The original number
+    is kept in 'original_question_number'.
+    """
+    if not variant or variant.get('size') != len(questions):
+        return questions
+    order, option_orders = permutations(variant, questions)
+    shuffled = []
+    for position, index in enumerate(order, start=1):
+        question = dict(questions[index])
+        question['original_question_number'] = question.get('question_number')
+        question['question_number'] = str(position) if isinstance(question.get('question_number'), str) else position
+        options = question.get('options')
+        if options:
+            option_order = option_orders[index]
+            question['options'] = [options[i] for i in option_order]
+            answer_index = letter_index(question.get('answer', ''), len(options))
+            if answer_index is not None:
+                answer = str(question['answer'])
+                match = LETTER_ANSWER.match(answer)
+                new_letter = OPTION_LETTERS[option_order.index(answer_index)]
+                if match.group(1).islower():
+                    new_letter = new_letter.lower()
+                question['answer'] = answer[:match.start(1)] + new_letter + answer[match.end(1):]
+        shuffled.append(question)
+    return shuffled
@@ -0,0 +1,22 @@
+import os
+import sys
+
+import pytest
+
+# Tests import the app's modules as `src.<module>` from the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def flask_app(tmp_path_factory):
+    """The app configured once per test run, on a temporary database and the stub backend."""
+    import app as app_module
+    db_dir = tmp_path_factory.mktemp("db")
+    app_module.app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{db_dir / 'users.db'}"
+    app_module.app.config['TESTING'] = True
+    original = app_module.LLM_BACKEND
+    app_module.LLM_BACKEND = "stub"
+    try:
+        yield app_module.create_app(start_pool=False)
+    finally:
+        app_module.LLM_BACKEND = original
@@ -0,0 +1,76 @@
+from src.answer_key import AnswerKey, answer_key_for, stored_answers
+from src.variants import apply_variant, make_variant, variant_seed
+
+PAPER = [
+    {"question_number": 1, "question": "Pick beta", "options": ["alpha", "beta", "gamma", "delta"], "answer": "B"},
+    {"question_number": 2, "question": "Pick gamma", "options": ["alpha", "beta", "gamma", "delta"], "answer": "gamma"},
+    {"question_number": 3, "question": "g in m/s^2", "answer": "9.81"},
+    {"question_number": 4, "question": "Name the gas", "answer": "Carbon  Dioxide"},
+]
+
+
+def test_mcq_accepts_letter_forms_and_option_text():
+    key = AnswerKey(PAPER)
+    for answer in ("B", "b", "(b)", "b.", "Option B", "option (b)", "  Beta "):
+        assert key.is_correct(1, answer), answer
+    assert not key.is_correct(1, "A")
+    assert key.is_correct(2, "C")
+    assert key.is_correct(2, "gamma")
+
+
+def test_numeric_answers_use_the_tolerance():
+    key = AnswerKey(PAPER, tolerance=0.01)
+    assert key.is_correct(3, "9.81")
+    assert key.is_correct(3, "9.815")
+    assert key.is_correct(3, "9.8")
+    assert not key.is_correct(3, "9.7")
+    assert not key.is_correct(3, "nine")
+
+
+def test_text_answers_are_compared_normalized():
+    key = AnswerKey(PAPER)
+    assert key.is_correct(4, "carbon dioxide")
+    assert not key.is_correct(4, "")
+    assert not key.is_correct(99, "anything")
+
+
+def test_grade_accepts_string_and_int_keys():
+    graded = AnswerKey(PAPER).grade({"1": "b", 2: "gamma", "3": "1", "4": None})
+    assert graded['score'] == 2
+    assert graded['total'] == 4
+    assert [r['is_correct'] for r in graded['results']] == [True, True, False, False]
+
+
+def test_grade_batch_matches_grade():
+    key = AnswerKey(PAPER)
+    submissions = [{"1": "B", "2": "a", "3": "9.81"}, {"1": "A", "2": "gamma", "4": "carbon dioxide"}, {}]
+    batch = key.grade_batch(submissions)
+
+    assert batch['scores'] == [key.grade(s)['score'] for s in submissions]
+    assert batch['correct'][1] == [False, True, False, True]
+    assert batch['question_accuracy'] == [1 / 3, 1 / 3, 1 / 3, 1 / 3]
+
+
+def test_answer_key_is_compiled_once_per_paper():
+    class Paper:
+        questions = PAPER
+
+    paper = Paper()
+    assert answer_key_for(paper) is answer_key_for(paper)
+
+
+def test_stored_answers_undo_the_variant():
+    variant = make_variant(variant_seed(5, 5), PAPER)
+    shuffled = apply_variant(PAPER, variant)
+    # The student answers every question correctly, by letter, in their own option order
+    results = []
+    for question in shuffled:
+        answer = question['answer']
+        if question.get('options') and answer in question['options']:
+            answer = "ABCD"[question['options'].index(answer)]
+        results.append({'question_number': question['question_number'], 'user_answer': answer})
+
+    answers = stored_answers(PAPER, {'variant': variant, 'results': results})
+
+    assert set(answers) == {"1", "2", "3", "4"}
+    assert AnswerKey(PAPER).grade(answers)['score'] == 4
@@ -0,0 +1,32 @@
+import json
+
+import pytest
+
+import app as app_module
+from src.pdf_fonts import MissingFontError
+
+
+@pytest.fixture
+def client(flask_app, monkeypatch, tmp_path):
+    paper = tmp_path / "SCHOOL_QUIZ_MATHS_9_TSBIE_TEL_1.json"
+    paper.write_text(json.dumps([{"question_number": 1, "question": "కింది వాటిలో ఏది?", "answer": "A"}]))
+
+    def missing_font(json_path, kind):
+        raise MissingFontError("NotoSansTelugu-Regular.ttf is needed to render Telugu text")
+    monkeypatch.setattr(app_module.pdf_cache, 'get', missing_font)
+    client = flask_app.test_client()
+    with client.session_transaction() as session:
+        session['username'] = "student1"
+        session['json_path'] = str(paper)
+        session['answers_uploaded'] = True
+    return client
+
+
+@pytest.mark.parametrize("route", ["/download_question_paper", "/download_answer_sheet"])
+def test_missing_fonts_redirect_with_a_message(client, route):
+    response = client.get(route)
+
+    assert response.status_code == 302
+    assert response.headers['Location'].endswith("/offline_exam")
+    with client.session_transaction() as session:
+        assert any("fonts that are not installed" in message for _, message in session['_flashes'])
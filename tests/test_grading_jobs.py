@@ -0,0 +1,105 @@
+import io
+import json
+import os
+
+import pytest
+
+import app as app_module
+from app import GradingJob, User, db, ensure_grading_job_table, run_grading_job
+from src import llm_backend
+
+PAPER = [
+    {"question_number": i, "question": f"Question {i}", "options": ["a", "b", "c", "d"], "answer": "A"}
+    for i in range(1, 4)
+]
+SHEET = b"\x89PNG\r\n\x1a\n answer sheet"
+
+
+class RecordingQueue:
+    """Stands in for grading_jobs so the test decides when each job runs."""
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, kind, fn, *args, owner=None, meta=None, **kwargs):
+        self.submitted.append((fn, args))
+
+
+@pytest.fixture
+def env(flask_app, monkeypatch, tmp_path):
+    upload_dir = tmp_path / "uploads"
+    monkeypatch.setattr(app_module, 'GRADING_UPLOAD_DIR', str(upload_dir))
+    queue = RecordingQueue()
+    monkeypatch.setattr(app_module, 'grading_jobs', queue)
+    monkeypatch.setattr(llm_backend, '_backend', llm_backend.StubBackend(latency="fixed:0"))
+    monkeypatch.setattr(llm_backend, '_backend_pid', os.getpid())
+    with flask_app.app_context():
+        db.session.query(GradingJob).delete()
+        db.session.query(User).delete()
+        user = User(username="student1", role="student")
+        user.set_password("secret")
+        db.session.add(user)
+        db.session.commit()
+    papers = []
+    for name in ("NEET_UG_easy_MCQ_1.json", "NEET_UG_hard_MCQ_2.json"):
+        path = tmp_path / name
+        path.write_text(json.dumps(PAPER))
+        papers.append(str(path))
+    return flask_app.test_client(), queue, upload_dir, papers
+
+
+def upload(client, json_path):
+    with client.session_transaction() as session:
+        session['username'] = "student1"
+        session['json_path'] = json_path
+    return client.post('/upload_answers', data={'answer_file': (io.BytesIO(SHEET), "sheet.png")},
+                       content_type='multipart/form-data')
+
+
+def test_same_sheet_for_two_papers_gets_a_file_per_job(env, flask_app):
+    client, queue, upload_dir, papers = env
+    upload(client, papers[0])
+    upload(client, papers[1])
+
+    (first, first_args), (second, second_args) = queue.submitted
+    assert first_args[1] != second_args[1]
+    first(*first_args)
+
+    # The first job deleting its sheet must not take the second job's with it
+    assert not os.path.exists(first_args[1])
+    assert os.path.exists(second_args[1])
+    second(*second_args)
+    with flask_app.app_context():
+        jobs = GradingJob.query.order_by(GradingJob.id).all()
+        assert [job.status for job in jobs] == ['finished', 'finished']
+        assert all(job.total is not None for job in jobs)
+    assert os.listdir(upload_dir) == []
+
+
+def test_reupload_of_a_graded_sheet_reuses_the_job(env, flask_app):
+    client, queue, _, papers = env
+    upload(client, papers[0])
+    fn, args = queue.submitted[0]
+    fn(*args)
+
+    response = upload(client, papers[0])
+
+    assert len(queue.submitted) == 1
+    assert response.headers['Location'].endswith(f"/grading/{args[0]}")
+
+
+def test_interrupted_jobs_are_failed_and_their_sheets_removed(env, flask_app):
+    client, queue, upload_dir, papers = env
+    upload(client, papers[0])
+    upload(client, papers[1])
+    (_, (job_id, path)), (fn, args) = queue.submitted
+    fn(*args)
+    stray = upload_dir / "stray.png"
+    stray.write_bytes(SHEET)
+
+    with flask_app.app_context():
+        ensure_grading_job_table()
+        assert db.session.get(GradingJob, job_id).status == 'failed'
+        assert db.session.get(GradingJob, args[0]).status == 'finished'
+    assert not os.path.exists(path)
+    assert stray.exists()
@@ -0,0 +1,14 @@
+import os
+import subprocess
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CHECK = os.path.join(BASE_DIR, "benchmarks", "check_importtime.py")
+
+
+def test_app_import_stays_within_budget_and_defers_heavy_modules():
+    # Uses the script's own budget (IMPORT_BUDGET_MS, 900 ms by default)
+    result = subprocess.run([sys.executable, CHECK, "--top", "5"], cwd=BASE_DIR,
+                            capture_output=True, text=True)
+
+    assert result.returncode == 0, result.stdout + result.stderr
@@ -0,0 +1,44 @@
+import json
+
+from src.json_stream import JSONArrayStreamParser
+
+QUESTIONS = [
+    {"question_number": 1, "question": "What is {x} in \"f(x) = [x]\"?", "options": ["1", "2"], "answer": "A"},
+    {"question_number": 2, "question": "Escapes: \\\" and \\\\ and ]}", "answer": "42"},
+    {"question_number": 3, "question": "Nested", "meta": {"tags": ["a", {"b": []}]}, "answer": "B"},
+]
+
+
+def feed_in_chunks(text, size):
+    parser = JSONArrayStreamParser()
+    parsed = []
+    for start in range(0, len(text), size):
+        parsed.extend(parser.feed(text[start:start + size]))
+    return parsed
+
+
+def test_whole_document_in_one_chunk():
+    assert JSONArrayStreamParser().feed(json.dumps(QUESTIONS)) == QUESTIONS
+
+
+def test_objects_split_at_every_possible_boundary():
+    text = json.dumps(QUESTIONS, indent=2)
+    for size in (1, 2, 3, 7, 64):
+        assert feed_in_chunks(text, size) == QUESTIONS
+
+
+def test_each_object_is_returned_once_its_brace_closes():
+    text = json.dumps(QUESTIONS)
+    cut = text.index('}, {') + 1
+    parser = JSONArrayStreamParser()
+
+    assert parser.feed(text[:cut]) == QUESTIONS[:1]
+    assert parser.feed(text[cut:]) == QUESTIONS[1:]
+
+
+def test_text_before_the_array_is_ignored():
+    assert JSONArrayStreamParser().feed("```json\n" + json.dumps(QUESTIONS[:1]) + "\n```") == QUESTIONS[:1]
+
+
+def test_empty_array():
+    assert JSONArrayStreamParser().feed("[]") == []
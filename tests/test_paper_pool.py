@@ -0,0 +1,41 @@
+from src.paper_pool import PaperPool
+
+ARGS = {"name_of_the_exam": "NEET_UG", "difficulty_level": "easy", "format_of_the_exam": "MCQ"}
+
+
+def make_pool(tmp_path, seen):
+    def claim(path, student):
+        if (path, student) in seen:
+            return False
+        seen.add((path, student))
+        return True
+
+    pool = PaperPool(generate=None, size=2, claim=claim)
+    paths = []
+    for name in ("a.json", "b.json"):
+        path = tmp_path / name
+        path.write_text("[]")
+        paths.append(str(path))
+        pool.add(str(path), **ARGS)
+    return pool, paths
+
+
+def test_take_skips_papers_the_student_cannot_claim(tmp_path):
+    seen = set()
+    pool, paths = make_pool(tmp_path, seen)
+    seen.add((paths[0], "alice"))
+
+    assert pool.take(student="alice", **ARGS) == paths[1]
+    # The paper alice could not take is still there for someone else
+    assert pool.take(student="bob", **ARGS) == paths[0]
+    assert pool.take(student="bob", **ARGS) is None
+
+
+def test_take_misses_when_no_pooled_paper_can_be_claimed(tmp_path):
+    seen = set()
+    pool, paths = make_pool(tmp_path, seen)
+    seen.update((path, "alice") for path in paths)
+
+    assert pool.take(student="alice", **ARGS) is None
+    assert (pool.hits, pool.misses) == (0, 1)
+    assert pool.take(**ARGS) == paths[0]
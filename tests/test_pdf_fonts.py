@@ -0,0 +1,37 @@
+import pytest
+
+from src import pdf_fonts
+from src.pdf_fonts import MissingFontError, family_for
+
+
+@pytest.fixture
+def fonts(monkeypatch):
+    def install(families, shaping=True):
+        monkeypatch.setattr(pdf_fonts, '_font_paths', {family: f"/fonts/{family}.ttf" for family in families})
+        monkeypatch.setattr(pdf_fonts, 'shaping_available', lambda: shaping)
+    return install
+
+
+def test_latin_greek_and_math_use_sans(fonts):
+    fonts(['sans', 'sansb'])
+    assert family_for("Find Δx when α ≥ π/2") == 'sans'
+    assert family_for("Physics", bold=True) == 'sansb'
+
+
+def test_mixed_telugu_line_keeps_sans_for_its_latin_and_math(fonts):
+    fonts(['sans', 'sansb', 'telugu'])
+    assert family_for("x² + 1 = 0 అయితే x విలువ ఎంత?") == 'sans'
+
+
+def test_missing_script_font_fails_loudly(fonts):
+    fonts(['sans', 'sansb'])
+    with pytest.raises(MissingFontError, match="NotoSansTelugu"):
+        family_for("కింది వాటిలో ఏది?")
+    with pytest.raises(MissingFontError, match="NotoSansDevanagari"):
+        family_for("निम्नलिखित में से कौन?")
+
+
+def test_indic_text_without_shaping_fails_loudly(fonts):
+    fonts(['sans', 'telugu'], shaping=False)
+    with pytest.raises(MissingFontError, match="uharfbuzz"):
+        family_for("కింది వాటిలో ఏది?")
@@ -0,0 +1,91 @@
+import io
+import json
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src import pdf_fonts
+from src.render_pool import RenderPool
+from src.variants import make_variant, variant_seed
+
+PAPER = [
+    {"question_number": i, "subject": "Physics", "question": f"Question {i}",
+     "options": ["alpha", "beta", "gamma", "delta"], "answer": "A"}
+    for i in range(1, 4)
+]
+
+
+class CountingExecutor:
+    """Runs renders on threads and records how many were queued at once."""
+
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(max_workers=2)
+        self._lock = threading.Lock()
+        self.outstanding = 0
+        self.max_outstanding = 0
+
+    def submit(self, fn, *args):
+        with self._lock:
+            self.outstanding += 1
+            self.max_outstanding = max(self.max_outstanding, self.outstanding)
+        future = self._executor.submit(fn, *args)
+        future.add_done_callback(self._finished)
+        return future
+
+    def _finished(self, future):
+        with self._lock:
+            self.outstanding -= 1
+
+
+@pytest.fixture
+def pool(monkeypatch, tmp_path):
+    monkeypatch.setattr(pdf_fonts, 'PDF_FONT_CACHE_DIR', str(tmp_path / "font_cache"))
+    pool = RenderPool(workers=2)
+    executor = CountingExecutor()
+    monkeypatch.setattr(pool, '_get_executor', lambda: executor)
+    return pool, executor
+
+
+@pytest.fixture
+def paper(tmp_path):
+    path = tmp_path / "paper.json"
+    path.write_text(json.dumps(PAPER))
+    return str(path)
+
+
+def open_pack(chunks):
+    return zipfile.ZipFile(io.BytesIO(b"".join(chunks)))
+
+
+def test_pack_has_every_students_papers(pool, paper):
+    pool, _ = pool
+    students = [(f"{i}_student", f"Test - Name: student {i}", make_variant(variant_seed(1, i), PAPER)) for i in range(3)]
+
+    pack = open_pack(pool.print_pack(paper, students, include_answers=True))
+
+    assert sorted(pack.namelist()) == sorted(
+        [f"{i}_student.pdf" for i in range(3)] + [f"answers/{i}_student_answers.pdf" for i in range(3)])
+    assert all(pack.read(name).startswith(b"%PDF") for name in pack.namelist())
+
+
+def test_failed_renders_are_listed_in_the_pack(pool, paper):
+    pool, _ = pool
+    # A malformed variant makes that student's render fail
+    students = [("1_ok", "ok", None), ("2_broken", "broken", {"size": len(PAPER), "seed": []})]
+
+    pack = open_pack(pool.print_pack(paper, students))
+
+    assert sorted(pack.namelist()) == ["1_ok.pdf", "FAILED.txt"]
+    assert "2_broken.pdf" in pack.read("FAILED.txt").decode()
+
+
+def test_renders_in_flight_are_bounded_by_the_window(pool, paper):
+    pool, executor = pool
+    students = [(f"{i}_student", "header", None) for i in range(8)]
+
+    pack = open_pack(pool.print_pack(paper, students, window=3))
+
+    assert len(pack.namelist()) == 8
+    assert executor.max_outstanding <= 3
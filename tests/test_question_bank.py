@@ -0,0 +1,148 @@
+import json
+
+import pytest
+
+from src.question_bank import QuestionBank, label_subjects, metadata_from_filename, question_type
+
+NEET_PLAN = [("Physics", 2), ("Chemistry", 2)]
+
+
+@pytest.fixture
+def bank(tmp_path):
+    return QuestionBank(path=str(tmp_path / "bank.db"))
+
+
+def mcq(number, text, subject=None):
+    question = {"question_number": number, "question": text, "options": ["a", "b", "c", "d"], "answer": "a"}
+    if subject:
+        question["subject"] = subject
+    return question
+
+
+def test_metadata_from_filename():
+    assert metadata_from_filename("SCHOOL_QUIZ_SOCIAL_SCIENCE_9_TSBIE_TEL_20250101_120000_1.json") == \
+        {'exam': 'SCHOOL_QUIZ', 'subject': 'SOCIAL_SCIENCE', 'grade': '9', 'board': 'TSBIE', 'language': 'TEL'}
+    # Named before the language was part of the filename
+    assert metadata_from_filename("SCHOOL_QUIZ_SOCIAL_SCIENCE_9_TSBIE_20250101_120000_1.json") == \
+        {'exam': 'SCHOOL_QUIZ', 'subject': 'SOCIAL_SCIENCE', 'grade': '9', 'board': 'TSBIE', 'language': ''}
+    assert metadata_from_filename("x/NEET_UG_medium_MCQ_20250101.json") == {'exam': 'NEET_UG', 'difficulty': 'medium'}
+    assert metadata_from_filename("notes.json") == {'exam': 'MISC'}
+
+
+def test_question_type():
+    assert question_type(mcq(1, "q")) == 'mcq'
+    assert question_type({"question": "q", "answer": " 4.5 "}) == 'numerical'
+    assert question_type({"question": "q", "answer": "Because"}) == 'subjective'
+
+
+def test_label_subjects_by_section_plan():
+    questions = [mcq(i, f"q{i}") for i in range(1, 5)]
+    assert [q['subject'] for q in label_subjects(questions, NEET_PLAN)] == ["Physics", "Physics", "Chemistry", "Chemistry"]
+    # A paper that does not match the plan is not guessed at
+    assert label_subjects(questions[:3], NEET_PLAN) == questions[:3]
+
+
+def test_duplicates_are_stored_once(bank):
+    assert bank.add_questions([mcq(1, "Same  question"), mcq(2, "same question")], "NEET_UG", subject="Physics") == 1
+    assert bank.add_questions([mcq(3, "SAME QUESTION")], "NEET_UG", subject="Physics") == 0
+
+
+def test_assemble_fills_buckets_and_reports_shortfall(bank):
+    bank.add_questions([mcq(i, f"physics {i}") for i in range(3)], "NEET_UG", subject="Physics", difficulty="medium")
+    bank.add_questions([mcq(i, f"chemistry {i}") for i in range(1)], "NEET_UG", subject="Chemistry", difficulty="medium")
+
+    paper, shortfall = bank.assemble("NEET_UG", [{'subject': 'Physics', 'count': 2}, {'subject': 'Chemistry', 'count': 2}],
+                                     difficulty="medium")
+
+    assert [q['question_number'] for q in paper] == [1, 2, 3]
+    assert [q['subject'] for q in paper] == ["Physics", "Physics", "Chemistry"]
+    assert shortfall == [{'subject': 'Chemistry', 'count': 2, 'missing': 1}]
+
+
+def test_assemble_does_not_repeat_questions_for_a_student(bank):
+    bank.add_questions([mcq(i, f"physics {i}") for i in range(4)], "NEET_UG", subject="Physics")
+    buckets = [{'subject': 'Physics', 'count': 2}]
+
+    first, _ = bank.assemble("NEET_UG", buckets, student="asha")
+    second, _ = bank.assemble("NEET_UG", buckets, student="asha")
+    third, shortfall = bank.assemble("NEET_UG", buckets, student="asha")
+
+    assert {q['question'] for q in first}.isdisjoint(q['question'] for q in second)
+    assert shortfall and shortfall[0]['missing'] == 2
+    assert bank.count("NEET_UG", "Physics", student="ravi") == 4
+
+
+def test_ingest_labels_unlabeled_competitive_papers(bank, tmp_path):
+    path = tmp_path / "NEET_UG_medium_MCQ_1.json"
+    path.write_text(json.dumps([mcq(i, f"q{i}") for i in range(1, 5)]))
+
+    assert bank.ingest_paper(str(path), subject_plan=NEET_PLAN) == 4
+    assert bank.count("NEET_UG", "Chemistry", difficulty="medium") == 2
+
+
+def test_ingest_skips_competitive_questions_without_a_subject(bank, tmp_path):
+    path = tmp_path / "NEET_UG_medium_MCQ_2.json"
+    path.write_text(json.dumps([mcq(1, "labeled", subject="Physics"), mcq(2, "unlabeled")]))
+
+    assert bank.ingest_paper(str(path)) == 1
+    assert bank.count("NEET_UG") == 1
+
+
+def test_search(bank):
+    bank.add_questions([mcq(1, "Newton's second law of motion"), mcq(2, "Ideal gas equation")], "NEET_UG", subject="Physics")
+    assert [q['question'] for q in bank.search("newton")] == ["Newton's second law of motion"]
+
+
+def test_school_papers_only_draw_from_their_grade_board_and_language(bank):
+    bank.add_questions([mcq(i, f"grade 9 english {i}") for i in range(3)], "SCHOOL_QUIZ", subject="Maths",
+                       grade="9", board="TSBIE", language="ENG")
+    bank.add_questions([mcq(i, f"grade 10 english {i}") for i in range(3)], "SCHOOL_QUIZ", subject="Maths",
+                       grade="10", board="TSBIE", language="ENG")
+    bank.add_questions([mcq(i, f"grade 9 telugu {i}") for i in range(3)], "SCHOOL_QUIZ", subject="Maths",
+                       grade="9", board="TSBIE", language="TEL")
+
+    paper, shortfall = bank.assemble("SCHOOL_QUIZ", [{'subject': 'Maths', 'count': 3}],
+                                     grade="9", board="tsbie", language="eng")
+
+    assert not shortfall
+    assert sorted(q['question'] for q in paper) == [f"grade 9 english {i}" for i in range(3)]
+    _, shortfall = bank.assemble("SCHOOL_QUIZ", [{'subject': 'Maths', 'count': 4}], grade="9", board="TSBIE", language="ENG")
+    assert shortfall[0]['missing'] == 1
+
+
+def test_ingested_school_paper_is_labeled_from_its_filename(bank, tmp_path):
+    path = tmp_path / "SCHOOL_TEST_BIOLOGY_9_TSBIE_TEL_20250101_120000_1.json"
+    path.write_text(json.dumps([mcq(1, "cell"), mcq(2, "tissue")]))
+
+    assert bank.ingest_paper(str(path)) == 2
+    assert bank.count("SCHOOL_TEST", "Biology", grade="9", board="TSBIE", language="TEL") == 2
+    assert bank.count("SCHOOL_TEST", "Biology", language="ENG") == 0
+
+
+def test_older_bank_gains_the_school_columns(tmp_path):
+    import sqlite3
+    path = tmp_path / "old.db"
+    conn = sqlite3.connect(path)
+    conn.executescript('''
+        CREATE TABLE questions (id INTEGER PRIMARY KEY, content_hash TEXT UNIQUE NOT NULL, exam TEXT NOT NULL,
+            subject TEXT NOT NULL DEFAULT '', chapter TEXT NOT NULL DEFAULT '', difficulty TEXT NOT NULL DEFAULT '',
+            qtype TEXT NOT NULL, question TEXT NOT NULL, options_json TEXT, answer TEXT NOT NULL,
+            solution TEXT NOT NULL DEFAULT '', source_path TEXT, created_at REAL NOT NULL);
+        INSERT INTO questions (content_hash, exam, subject, qtype, question, answer, source_path, created_at)
+            VALUES ('h', 'SCHOOL_QUIZ', 'MATHS', 'mcq', 'q', 'a', 'SCHOOL_QUIZ_MATHS_7_CBSE_20250101_120000_1.json', 0);
+    ''')
+    conn.commit()
+    conn.close()
+
+    assert QuestionBank(path=str(path)).count("SCHOOL_QUIZ", "Maths", grade="7", board="CBSE") == 1
+
+
+def test_claim_refuses_a_paper_with_questions_the_student_has_seen(bank):
+    questions = [mcq(i, f"physics {i}") for i in range(4)]
+    bank.add_questions(questions, "NEET_UG", subject="Physics")
+
+    assert bank.claim(questions[:2], "asha")
+    assert not bank.claim(questions[1:3], "asha")
+    assert bank.claim(questions[2:], "asha")
+    assert bank.claim(questions[:2], "ravi")
+    assert bank.count("NEET_UG", student="asha") == 0
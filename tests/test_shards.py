@@ -0,0 +1,32 @@
+import pytest
+
+from src.generate_paper import check_shard, plan_shards
+
+SHARD = {'index': 1, 'subject': 'Physics', 'count': 3, 'first': 4, 'last': 6}
+
+
+def questions(numbers):
+    return [{"question_number": n, "question": f"q{n}"} for n in numbers]
+
+
+def test_plan_covers_the_paper_without_gaps():
+    shards = plan_shards("NEET_UG")
+    assert shards[0]['first'] == 1
+    assert all(a['last'] + 1 == b['first'] for a, b in zip(shards, shards[1:]))
+    assert sum(s['count'] for s in shards) == shards[-1]['last']
+
+
+@pytest.mark.parametrize("numbers", [[4, 5, 6], [6, 4, 5], [1, 2, 3]])
+def test_well_numbered_shard_passes(numbers):
+    check_shard(SHARD, questions(numbers))
+
+
+@pytest.mark.parametrize("numbers", [[4, 5], [4, 5, 6, 7], [4, 4, 6], [5, 6, 7], ["x", 5, 6]])
+def test_wrong_count_or_numbering_is_rejected(numbers):
+    with pytest.raises(ValueError):
+        check_shard(SHARD, questions(numbers))
+
+
+def test_missing_question_numbers_are_rejected():
+    with pytest.raises(ValueError):
+        check_shard(SHARD, [{"question": "q"}] * 3)
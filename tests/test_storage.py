@@ -0,0 +1,115 @@
+import os
+import sqlite3
+import time
+
+import pytest
+
+from src import storage
+
+OLD = time.time() - 90 * 86400
+
+
+@pytest.fixture
+def layout(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, 'GENERATED_JSON_DIR', str(tmp_path / "JSON"))
+    monkeypatch.setattr(storage, 'PAPERS_DIR', str(tmp_path / "PAPERS"))
+    return tmp_path
+
+
+def make_paper(name, age=None, pdfs=True):
+    json_path = storage.paper_json_path("NEET_UG", f"{name}.json")
+    with open(json_path, 'w') as f:
+        f.write("[]")
+    paths = [json_path]
+    if pdfs:
+        pdf_dir = storage.pdf_dir_for(json_path)
+        for suffix in storage.PDF_SUFFIXES:
+            paths.append(os.path.join(pdf_dir, name + suffix))
+            with open(paths[-1], 'wb') as f:
+                f.write(b"%PDF")
+    if age is not None:
+        for path in paths:
+            os.utime(path, (age, age))
+    return paths
+
+
+def make_users_db(path, *json_paths):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE assignment (id INTEGER PRIMARY KEY, json_path TEXT)")
+    conn.executemany("INSERT INTO assignment (json_path) VALUES (?)", [(p,) for p in json_paths])
+    conn.commit()
+    conn.close()
+    return str(path)
+
+
+def test_papers_are_sharded_by_exam_month_and_hash(layout):
+    path = storage.paper_json_path("NEET_UG", "NEET_UG_medium_MCQ_1.json")
+    exam_dir, month, shard, _ = os.path.relpath(path, storage.GENERATED_JSON_DIR).split(os.sep)
+
+    assert exam_dir == "NEET"
+    assert len(month) == 7 and month[4] == "-"
+    assert len(shard) == 2
+    assert storage.pdf_dir_for(path).endswith(os.path.join("NEET", month, shard))
+
+
+def test_sweep_removes_old_unreferenced_papers_and_their_pdfs(layout):
+    old = make_paper("old", age=OLD)
+    fresh = make_paper("fresh")
+    db = make_users_db(layout / "users.db")
+
+    removed = storage.sweep(max_age_days=30, db_path=db)
+
+    assert removed['papers'] == 1 and removed['pdfs'] == 2
+    assert not any(os.path.exists(p) for p in old)
+    assert all(os.path.exists(p) for p in fresh)
+
+
+def test_sweep_keeps_papers_an_assignment_references(layout):
+    assigned = make_paper("assigned", age=OLD)
+    db = make_users_db(layout / "users.db", assigned[0])
+
+    removed = storage.sweep(max_age_days=30, db_path=db)
+
+    assert removed['kept_referenced'] == 1
+    assert removed['papers'] == 0 and removed['pdfs'] == 0
+    assert all(os.path.exists(p) for p in assigned)
+
+
+def test_sweep_removes_old_pdfs_whose_paper_is_gone(layout):
+    orphan = make_paper("orphan", age=OLD)
+    os.remove(orphan[0])
+
+    removed = storage.sweep(max_age_days=30, db_path=make_users_db(layout / "users.db"))
+
+    assert removed['pdfs'] == 2
+    assert not any(os.path.exists(p) for p in orphan[1:])
+
+
+def test_dry_run_removes_nothing(layout):
+    old = make_paper("old", age=OLD)
+
+    removed = storage.sweep(max_age_days=30, dry_run=True, db_path=make_users_db(layout / "users.db"))
+
+    assert removed['papers'] == 1 and removed['bytes'] > 0
+    assert all(os.path.exists(p) for p in old)
+
+
+@pytest.mark.parametrize("db", ["missing.db", "no_table.db"])
+def test_sweep_deletes_nothing_when_assignments_cannot_be_read(layout, db):
+    old = make_paper("old", age=OLD)
+    sqlite3.connect(layout / "no_table.db").close()
+
+    with pytest.raises(storage.SweepAborted):
+        storage.sweep(max_age_days=30, db_path=str(layout / db))
+
+    assert all(os.path.exists(p) for p in old)
+
+
+def test_usage_report_counts_by_exam(layout):
+    make_paper("a")
+    make_paper("b", pdfs=False)
+
+    report = storage.usage_report()
+
+    assert report["NEET"]['papers'] == 2
+    assert report["NEET"]['pdfs'] == 2
@@ -0,0 +1,106 @@
+from datetime import timedelta
+
+from src.upload_cache import LocalFileAPI, UploadCache
+
+
+def make_book(tmp_path, content=b"%PDF-1.4 chapter one"):
+    path = tmp_path / "book.pdf"
+    path.write_bytes(content)
+    return path
+
+
+def test_second_upload_of_same_content_is_a_hit(tmp_path):
+    files = LocalFileAPI()
+    cache = UploadCache(registry_path=str(tmp_path / "registry.json"))
+    book = make_book(tmp_path)
+
+    first = cache.upload(files, book)
+    second = cache.upload(files, book)
+
+    assert files.upload_calls == 1
+    assert second.name == first.name
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+    assert cache.stats()['bytes_saved'] == book.stat().st_size
+
+
+def test_changed_content_is_uploaded_again(tmp_path):
+    files = LocalFileAPI()
+    cache = UploadCache(registry_path=str(tmp_path / "registry.json"))
+    book = make_book(tmp_path)
+    first = cache.upload(files, book)
+
+    book.write_bytes(b"%PDF-1.4 chapter one, revised")
+    second = cache.upload(files, book)
+
+    assert files.upload_calls == 2
+    assert second.name != first.name
+    assert cache.stats()['misses'] == 2
+
+
+def test_same_content_at_another_path_is_a_hit(tmp_path):
+    files = LocalFileAPI()
+    cache = UploadCache(registry_path=str(tmp_path / "registry.json"))
+    cache.upload(files, make_book(tmp_path))
+    copy = tmp_path / "copy.pdf"
+    copy.write_bytes(make_book(tmp_path).read_bytes())
+
+    cache.upload(files, copy)
+
+    assert files.upload_calls == 1
+
+
+def test_handle_close_to_expiry_is_refreshed(tmp_path):
+    # Handles live one hour but are refreshed six hours before expiry, so every lookup re-uploads
+    files = LocalFileAPI(ttl=timedelta(hours=1))
+    cache = UploadCache(registry_path=str(tmp_path / "registry.json"), refresh_margin=timedelta(hours=6))
+    book = make_book(tmp_path)
+
+    first = cache.upload(files, book)
+    second = cache.upload(files, book)
+
+    assert files.upload_calls == 2
+    assert second.name != first.name
+    assert cache.stats()['refreshes'] == 1
+    assert cache.stats()['hits'] == 0
+
+
+def test_registry_survives_a_restart(tmp_path):
+    # Persistent, like the Gemini file API whose handles outlive the process
+    files = LocalFileAPI(persistent=True)
+    registry = str(tmp_path / "registry.json")
+    book = make_book(tmp_path)
+    first = UploadCache(registry_path=registry).upload(files, book)
+
+    restarted = UploadCache(registry_path=registry)
+    again = restarted.upload(files, book)
+
+    assert files.upload_calls == 1
+    assert again.name == first.name
+    assert again.uri == first.uri
+    assert restarted.stats()['hits'] == 1
+
+
+def test_corrupt_registry_starts_empty(tmp_path):
+    registry = tmp_path / "registry.json"
+    registry.write_text("{not json")
+
+    assert UploadCache(registry_path=str(registry)).stats()['entries'] == 0
+
+
+def test_in_process_handles_are_not_persisted(tmp_path):
+    files = LocalFileAPI()
+    registry = tmp_path / "registry.json"
+    book = make_book(tmp_path)
+    cache = UploadCache(registry_path=str(registry))
+    cache.upload(files, book)
+    again = cache.upload(files, book)
+
+    assert files.upload_calls == 1
+    assert cache.stats()['hits'] == 1
+    assert not registry.exists()
+    # Another backend in the same process never sees this one's handles
+    other = LocalFileAPI()
+    cache.upload(other, book)
+    assert other.upload_calls == 1
+    assert again.name not in other.files
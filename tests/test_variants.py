@@ -0,0 +1,60 @@
+from src.variants import apply_variant, make_variant, variant_seed, letter_index
+
+PAPER = [
+    {"question_number": i, "subject": subject, "question": f"{subject} question {i}",
+     "options": ["alpha", "beta", "gamma", "delta"], "answer": answer}
+    for i, (subject, answer) in enumerate(
+        [("Physics", "A"), ("Physics", "(b)"), ("Physics", "gamma"), ("Chemistry", "Option D"),
+         ("Chemistry", "c."), ("Chemistry", "B")], start=1)
+]
+
+
+def correct_text(question):
+    index = letter_index(question['answer'], len(question['options']))
+    return question['options'][index] if index is not None else question['answer']
+
+
+def test_seed_is_stable_and_student_specific():
+    assert variant_seed(7, 3) == variant_seed(7, 3)
+    assert variant_seed(7, 3) != variant_seed(7, 4)
+
+
+def test_same_seed_gives_the_same_variant():
+    variant = make_variant(variant_seed(1, 1), PAPER)
+    assert apply_variant(PAPER, variant) == apply_variant(PAPER, variant)
+
+
+def test_questions_are_renumbered_and_keep_their_original_number():
+    shuffled = apply_variant(PAPER, make_variant(variant_seed(1, 2), PAPER))
+
+    assert [q['question_number'] for q in shuffled] == list(range(1, len(PAPER) + 1))
+    assert sorted(q['original_question_number'] for q in shuffled) == [q['question_number'] for q in PAPER]
+
+
+def test_questions_stay_in_their_subject_section():
+    shuffled = apply_variant(PAPER, make_variant(variant_seed(1, 3), PAPER))
+    assert [q['subject'] for q in shuffled] == [q['subject'] for q in PAPER]
+
+
+def test_answers_follow_their_option():
+    originals = {q['question_number']: q for q in PAPER}
+    for student in range(20):
+        for question in apply_variant(PAPER, make_variant(variant_seed(9, student), PAPER)):
+            original = originals[question['original_question_number']]
+            assert sorted(question['options']) == sorted(original['options'])
+            assert correct_text(question) == correct_text(original)
+
+
+def test_letter_answer_keeps_its_format():
+    shuffled = apply_variant(PAPER, make_variant(variant_seed(4, 4), PAPER))
+    by_original = {q['original_question_number']: q['answer'] for q in shuffled}
+
+    assert by_original[2].startswith("(") and by_original[2].endswith(")") and by_original[2][1].islower()
+    assert by_original[4].startswith("Option ")
+    assert by_original[3] == "gamma"
+
+
+def test_variant_for_another_paper_is_ignored():
+    variant = make_variant(variant_seed(1, 1), PAPER[:3])
+    assert apply_variant(PAPER, variant) is PAPER
+    assert apply_variant(PAPER, None) is PAPER